@@ -1,22 +1,267 @@
-from flask import Flask, render_template, redirect, url_for, current_app
+from flask import Flask, Request, render_template, redirect, url_for, current_app, request, g, Response
 from backend.config import Config
 from flask_login import LoginManager, current_user
-from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from backend.models.indexes import ensure_indexes, check_indexes
+from backend.utils.user_cache import UserCache, USER_LOADER_FIELDS
+from backend.utils.stats import reconcile_stats
+from backend.utils.rollups import refresh_revenue_rollups
+from backend.utils.slots import backfill_reservations
+from backend.utils.availability import AvailabilityIndex, parse_hours
+from backend.utils.doctor_directory import DoctorDirectory, bump_doctor_directory
+from backend.utils.fanout import make_pool
+from backend.utils import passwords
+from backend.utils.mongo import MongoConnection, client_options
+from backend.utils.datagen import make_plan, generate, drop_generated
+from backend.utils.metrics import Metrics, current_trace, parse_networks, scrape_allowed
+from backend.utils.slow_queries import SlowQueryRecorder
+from backend.utils.fragment_cache import FragmentCache, release_id
+from backend.utils.assets import StaticAssets, build as build_assets
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.search import reindex_search_keys
+from backend.utils.report_storage import make_storages
+from backend.utils.entries import EntryWriter, ensure_entries_collection, parse_tokens
+import datetime
+import click
 from dotenv import load_dotenv
 import os
 
+class HospitalRequest(Request):
+    """Request whose body limit a view can tighten, e.g. `request.max_content_length = n` (as in Flask 3.1)."""
+    _max_content_length = None
+
+    @property
+    def max_content_length(self):
+        if self._max_content_length is not None:
+            return self._max_content_length
+        return super().max_content_length
+
+    @max_content_length.setter
+    def max_content_length(self, value):
+        self._max_content_length = value
+
+
+class HospitalApp(Flask):
+    """
+    Flask app whose `db` / `db_client` resolve through a fork-safe MongoConnection,
+    so each worker process lazily opens its own client.
+    """
+    mongo = None
+    request_class = HospitalRequest
+
+    @property
+    def db_client(self):
+        return self.mongo.client
+
+    @property
+    def db(self):
+        return self.mongo.db
+
+    def shutdown(self):
+        """Release per-process resources once in-flight requests are done."""
+        pool = getattr(self, 'query_pool', None)
+        if pool is not None:
+            pool.shutdown(wait=True)
+        passwords.shutdown()
+        recorder = getattr(self, 'slow_queries', None)
+        if recorder is not None:
+            recorder.stop()
+        writer = getattr(self, 'entry_writer', None)
+        if writer is not None:
+            writer.stop()
+        cache = getattr(self, 'user_cache', None)
+        if cache is not None:
+            cache.stop()
+        availability = getattr(self, 'availability', None)
+        if availability is not None:
+            availability.stop()
+        self.mongo.close()
+
+    def send_static_file(self, filename):
+        # fingerprinted build outputs get precompression and immutable caching
+        assets = getattr(self, 'assets', None)
+        if assets is not None and assets.serves(filename):
+            return assets.send(filename)
+        return super().send_static_file(filename)
+
+
 # Blueprints will import db object from app context via current_app
-def create_app():
-    app = Flask(__name__, template_folder="templates", static_folder="../frontend/static")
+def create_app(config_overrides=None):
+    app = HospitalApp(__name__, template_folder="templates", static_folder="../frontend/static")
     app.config.from_object(Config)
+    app.config.update(config_overrides or {})
+
+    # MongoDB client is created lazily per process (see backend/utils/mongo.py);
+    # command/pool listeners feed per-request tracing and the slow-query recorder
+    app.metrics = Metrics() if app.config.get('METRICS_ENABLED') else None
+    app.slow_queries = None
+    if app.config.get('SLOW_QUERY_MS', 0) > 0:
+        app.slow_queries = SlowQueryRecorder(
+            lambda: app.db,
+            threshold_ms=app.config['SLOW_QUERY_MS'],
+            explain_sample=app.config['SLOW_QUERY_EXPLAIN_SAMPLE'],
+            explain_interval=app.config['SLOW_QUERY_EXPLAIN_INTERVAL'],
+            cap_bytes=app.config['SLOW_QUERY_CAP_BYTES'],
+            logger=app.logger
+        )
+    listeners = (app.metrics.listeners() if app.metrics else []) + ([app.slow_queries] if app.slow_queries else [])
+    options = client_options(app.config)
+    if listeners:
+        options['event_listeners'] = listeners
+    app.mongo = MongoConnection(app.config['MONGO_URI'], **options)
+
+    # Indexes backing the blueprint queries (idempotent); `entries` is created first so it
+    # becomes a time-series collection rather than a plain one
+    def bootstrap_indexes(db):
+        ensure_entries_collection(db, app.config['ENTRY_TTL_SECONDS'], app.logger)
+        return ensure_indexes(db, app.logger)
+
+    if app.config.get('ENSURE_INDEXES'):
+        try:
+            bootstrap_indexes(app.db)
+        except PyMongoError as e:
+            app.logger.warning("Skipping index bootstrap: %s", e)
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """Create all registered indexes (run on each deploy)."""
+        failures = bootstrap_indexes(app.db)
+        for name, error in failures:
+            click.echo(f"FAILED {name}: {error}")
+        if failures:
+            raise SystemExit(1)
+        click.echo("Indexes up to date.")
+
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Fail if any registered query shape is answered by a COLLSCAN."""
+        offenders = check_indexes(app.db)
+        for name, query, sort in offenders:
+            click.echo(f"COLLSCAN {name} filter={sorted(query)} sort={sort}")
+        if offenders:
+            raise SystemExit(1)
+        click.echo("All registered query shapes use an index.")
+
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats_command():
+        """Recompute the materialized dashboard counters (run periodically, e.g. from cron)."""
+        fresh = reconcile_stats(app.db)
+        click.echo(f"roles={fresh['roles']} appointments={fresh['appointments']}")
+
+    @app.cli.command('rollup-revenue')
+    def rollup_revenue_command():
+        """Fold newly paid or changed bills into the revenue_monthly rollups (run periodically, e.g. from cron)."""
+        regrouped = refresh_revenue_rollups(app.db)
+        click.echo("Full rebuild done." if regrouped is None else f"Regrouped {regrouped} month(s).")
 
-    # Setup MongoDB client and attach to app
-    client = MongoClient(app.config['MONGO_URI'])
-    app.db_client = client
-    app.db = client.get_default_database()
-    print("✅ Connected to MongoDB Atlas successfully!")
+    @app.cli.command('backfill-slots')
+    def backfill_slots_command():
+        """Reserve slots for active appointments booked before slot reservations existed."""
+        reserved, conflicts = backfill_reservations(app.db, app.config['APPOINTMENT_SLOT_MINUTES'])
+        click.echo(f"Reserved {reserved} slot(s); {conflicts} conflicting appointment(s) left unreserved.")
+
+    @app.cli.command('reindex-search')
+    def reindex_search_command():
+        """Recompute every user's normalized search keys (after upgrading or bulk imports)."""
+        click.echo(f"Reindexed {reindex_search_keys(app.db)} user(s).")
+
+    @app.cli.command('generate-data')
+    @click.option('--doctors', default=200, show_default=True)
+    @click.option('--nurses', default=100, show_default=True)
+    @click.option('--receptionists', default=20, show_default=True)
+    @click.option('--patients', default=100000, show_default=True)
+    @click.option('--appointments', default=1000000, show_default=True)
+    @click.option('--schedules', default=50000, show_default=True)
+    @click.option('--nurse-shifts', default=20000, show_default=True)
+    @click.option('--call-logs', default=100000, show_default=True)
+    @click.option('--seed', default=0, show_default=True, help='Same seed and sizes give the same dataset.')
+    @click.option('--anchor', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help="Date treated as 'today' (default: today, UTC). Pin it for reproducible datasets.")
+    @click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Processes; 0 runs inline.')
+    @click.option('--batch-size', default=5000, show_default=True)
+    @click.option('--password', default='password123', show_default=True, help='Password of every generated account.')
+    @click.option('--bcrypt-rounds', default=None, type=int, help='Defaults to BCRYPT_ROUNDS.')
+    @click.option('--drop', is_flag=True, help='Drop the generated collections first.')
+    def generate_data_command(seed, anchor, workers, batch_size, password, bcrypt_rounds, drop, **counts):
+        """Bulk-generate a consistent synthetic hospital (users, appointments, bills, ...)."""
+        db = app.db
+        if drop:
+            drop_generated(db)
+        plan = make_plan(
+            counts, seed=seed, password=password, rounds=bcrypt_rounds or app.config['BCRYPT_ROUNDS'],
+            anchor=anchor, slot_minutes=app.config['APPOINTMENT_SLOT_MINUTES'],
+            hours=parse_hours(app.config['DOCTOR_WORKING_HOURS'], (datetime.time(9), datetime.time(17))),
+            batch_size=batch_size
+        )
+        started = datetime.datetime.utcnow()
+        totals = generate(db, plan, workers=workers, uri=app.config['MONGO_URI'],
+                          options=client_options(app.config),
+                          progress=lambda table, done: click.echo(f"{table}: {done}"))
+        for collection, (inserted, duplicates) in sorted(totals.items()):
+            click.echo(f"{collection}: {inserted} inserted, {duplicates} already present")
+
+        # indexes are cheaper to build once after the bulk load; then derived data
+        failures = bootstrap_indexes(db)
+        for name, error in failures:
+            click.echo(f"FAILED index {name}: {error}")
+        reconcile_stats(db)
+        refresh_revenue_rollups(db)
+        bump_doctor_directory(db)
+        click.echo(f"Done in {(datetime.datetime.utcnow() - started).total_seconds():.1f}s.")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint, precompress and resize frontend/static into ASSET_BUILD_DIR."""
+        manifest = build_assets(app.static_folder, app.config['ASSET_BUILD_DIR'],
+                                widths=app.config['ASSET_IMAGE_WIDTHS'], keep=app.config['ASSET_KEEP_BUILDS'])
+        for name, entry in sorted(manifest.items()):
+            extras = entry['encodings'] + [f"{v['width']}w {v['type'].split('/')[1]}" for v in entry['variants']]
+            click.echo(f"{name} -> {entry['path']}" + (f" ({', '.join(extras)})" if extras else ''))
+        app.assets.reload()
+
+    # Per-process availability index for the booking page
+    app.availability = AvailabilityIndex(
+        app.config['APPOINTMENT_SLOT_MINUTES'],
+        parse_hours(app.config['DOCTOR_WORKING_HOURS'], (datetime.time(9), datetime.time(17))),
+        horizon_days=app.config['AVAILABILITY_HORIZON_DAYS'],
+        refresh_seconds=app.config['AVAILABILITY_REFRESH_SECONDS'],
+        get_db=lambda: app.db,
+        check_seconds=app.config['AVAILABILITY_CHECK_SECONDS'],
+        logger=app.logger
+    )
+
+    app.doctor_directory = DoctorDirectory(app.config['DOCTOR_DIRECTORY_CHECK_SECONDS'])
+    app.query_pool = make_pool(app.config['QUERY_FANOUT_WORKERS'])
+    passwords.configure(
+        workers=app.config['PASSWORD_POOL_WORKERS'],
+        queue=app.config['PASSWORD_POOL_QUEUE'],
+        rounds=app.config['BCRYPT_ROUNDS'],
+        timeout=app.config['PASSWORD_TIMEOUT']
+    )
+
+    app.fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_BYTES'], app.config['FRAGMENT_CACHE_TTL'])
+    app.config['CACHE_RELEASE'] = app.config.get('CACHE_RELEASE') or release_id(os.path.dirname(__file__))
+
+    # Hashed static URLs and precompressed serving once `build-assets` has run
+    StaticAssets(app.config['ASSET_BUILD_DIR']).init_app(app)
+
+    # Report files: new uploads go to REPORT_STORAGE, downloads use whichever backend holds the file
+    app.report_storages = make_storages(app)
+    app.report_storage = app.report_storages[app.config['REPORT_STORAGE']]
+
+    # Terminal entry ingestion: buffered per process, written in unordered batches
+    app.entry_tokens = parse_tokens(app.config['ENTRY_INGEST_TOKENS'])
+    app.entry_writer = EntryWriter(
+        lambda: app.db,
+        batch_size=app.config['ENTRY_BATCH_SIZE'],
+        max_pending=app.config['ENTRY_BUFFER_SIZE'],
+        flush_interval=app.config['ENTRY_FLUSH_INTERVAL'],
+        logger=app.logger
+    )
 
     # Flask-Login
+    app.user_cache = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'], lambda: app.db,
+                               check_seconds=app.config['USER_CACHE_CHECK_SECONDS'], logger=app.logger)
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
@@ -27,6 +272,9 @@ def create_app():
     from backend.blueprints.patient import patient_bp
     from backend.blueprints.nurse import nurse_bp
     from backend.blueprints.receptionist import receptionist_bp
+    from backend.blueprints.search import search_bp
+    from backend.blueprints.reports import reports_bp
+    from backend.blueprints.entries import entries_bp
     from bson.objectid import ObjectId
 
 
@@ -36,12 +284,20 @@ def create_app():
     app.register_blueprint(patient_bp, url_prefix='/patient')
     app.register_blueprint(nurse_bp, url_prefix='/nurse')
     app.register_blueprint(receptionist_bp, url_prefix='/receptionist')
+    app.register_blueprint(search_bp, url_prefix='/search')
+    app.register_blueprint(reports_bp, url_prefix='/reports')
+    app.register_blueprint(entries_bp, url_prefix='/entries')
 
     @login_manager.user_loader
     def load_user(user_id):
-        u = current_app.db.users.find_one({"_id": ObjectId(user_id)})
+        cached = current_app.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        u = current_app.db.users.find_one({"_id": ObjectId(user_id)}, USER_LOADER_FIELDS)
         if u:
-            return User.from_mongo(u)
+            user = User.from_mongo(u)
+            current_app.user_cache.put(user_id, user)
+            return user
         return None
 
 
@@ -56,10 +312,57 @@ def create_app():
         }
         return render_template('index.html', hospital=hospital)
 
+    if app.metrics is not None:
+        @app.before_request
+        def start_trace():
+            g.metrics_token = app.metrics.start_request()
+
+        @app.after_request
+        def add_server_timing(response):
+            trace = current_trace()
+            if trace is not None:
+                response.headers['Server-Timing'] = trace.server_timing()
+            return response
+
+        @app.teardown_request
+        def finish_trace(exc):
+            token = g.pop('metrics_token', None)
+            if token is not None:
+                app.metrics.finish_request(token, request.endpoint or 'unmatched', request.method)
+
+    # Streamed gzip/brotli for large text responses (outermost, so it sees the final body)
+    if app.config.get('COMPRESSION_ENABLED'):
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            level=app.config['COMPRESSION_LEVEL'],
+            brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY'],
+            mimetypes=app.config['COMPRESSION_MIMETYPES']
+        )
+
     # simple health route
     @app.route('/health')
     def health():
-        return {"status":"ok"}
+        return {"status":"ok", "user_cache": app.user_cache.stats(), "entry_writer": app.entry_writer.stats()}
+
+    metrics_networks = parse_networks(app.config['METRICS_ALLOWED_NETWORKS'])
+
+    @app.route('/metrics')
+    def metrics():
+        if app.metrics is None:
+            return Response("metrics disabled\n", status=404, mimetype='text/plain')
+        if not scrape_allowed(metrics_networks, app.config['METRICS_TOKEN'], request.remote_addr,
+                              request.headers.get('Authorization')):
+            return Response("forbidden\n", status=403, mimetype='text/plain')
+        caches = {'user_cache': app.user_cache.stats(), 'doctor_directory': app.doctor_directory.stats(),
+                  'fragment_cache': app.fragment_cache.stats()}
+        text = app.metrics.render(gauges=[
+            ('cache_hit_ratio', 'Hit ratio of per-process caches.',
+             {(('cache', name),): s['hit_rate'] for name, s in caches.items()}),
+            ('cache_entries', 'Entries held by per-process caches.',
+             {(('cache', name),): s['size'] for name, s in caches.items()}),
+        ])
+        return Response(text, mimetype='text/plain; version=0.0.4')
 
     return app
 
@@ -1,11 +1,23 @@
-from flask import Blueprint, render_template, current_app, request, redirect, url_for, flash
+from flask import Blueprint, render_template, current_app, request, redirect, url_for, flash, Response, abort
 from flask_login import login_required, current_user
-from ..utils.decorators import roles_required
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.user_cache import invalidate_user
+from ..utils.pagination import paginate
+from ..utils.stats import bump_role, get_dashboard_stats
+from ..utils.rollups import revenue_series, revenue_breakdown, rollup_watermark
+from ..utils.doctor_directory import bump_doctor_directory
+from ..utils.slow_queries import worst_shapes
+from ..utils.exports import EXPORTS, FORMATS, export_query, stream_export
+from ..utils.search import search_page, user_search_keys, set_user_fields, RESULT_FIELDS
 from bson.objectid import ObjectId
 import datetime
 
 admin_bp = Blueprint('admin', __name__, template_folder='../templates/admin')
 
+# Sortable / filterable columns of the paginated user listings
+USER_SORT_FIELDS = ('username', 'email', 'role', '_id')
+USER_FILTER_FIELDS = ('role',)
+
 def _get_current_user_oid():
     """
     Safely obtain the ObjectId for the logged-in user.
@@ -27,58 +39,56 @@ def _get_current_user_oid():
 
 # ------------------ Dashboard ------------------ #
 @admin_bp.route('/')
+@mongo_budget(9)
 @login_required
 @roles_required('admin')
 def dashboard():
     db = current_app.db
-    users = list(db.users.find({}, {"password": 0}))
+    page = paginate(db.users, projection={"password": 0}, sort_fields=USER_SORT_FIELDS,
+                    default_sort='username', filter_fields=USER_FILTER_FIELDS, per_page=25)
+    stats = get_dashboard_stats(db, current_app.config['STATS_MAX_AGE'])
     counts = {
-        'doctors': db.users.count_documents({'role': 'doctor'}),
-        'patients': db.users.count_documents({'role': 'patient'}),
-        'nurses': db.users.count_documents({'role': 'nurse'}),
-        'receptionists': db.users.count_documents({'role': 'receptionist'}),
-        'appointments': db.appointments.count_documents({})
+        'doctors': stats['roles']['doctor'],
+        'patients': stats['roles']['patient'],
+        'nurses': stats['roles']['nurse'],
+        'receptionists': stats['roles']['receptionist'],
+        'appointments': stats['appointments']
     }
 
-    # Revenue aggregation (safe)
+    # Revenue from the pre-aggregated monthly rollups, refreshed out of band by
+    # `flask rollup-revenue`; the page shows how old they are
     try:
-        raw_revenue = list(db.payments.aggregate([
-            {"$group": {
-                "_id": {"year": {"$year": "$date"}, "month": {"$month": "$date"}},
-                "total": {"$sum": "$amount"}
-            }},
-            {"$sort": {"_id.year": 1, "_id.month": 1}}
-        ]))
+        # simple [{label: "YYYY-MM", total: number}]
+        revenue = revenue_series(db)
+        revenue_by_specialty = revenue_breakdown(db, 'specialty')
+        revenue_as_of = rollup_watermark(db)
     except Exception as e:
-        raw_revenue = []
-        current_app.logger.warning("Revenue aggregation error: %s", e)
-
-    # Convert aggregation output to simple {label: "YYYY-MM", total: number}
-    revenue = []
-    for r in raw_revenue:
-        try:
-            y = r['_id'].get('year')
-            m = r['_id'].get('month')
-            label = f"{int(y)}-{int(m):02d}"
-        except Exception:
-            label = str(r.get('_id'))
-        revenue.append({"label": label, "total": r.get('total', 0)})
+        revenue, revenue_by_specialty, revenue_as_of = [], [], None
+        current_app.logger.warning("Revenue rollup read error: %s", e)
+    revenue_age = (datetime.datetime.utcnow() - revenue_as_of) if revenue_as_of else None
 
-    # Doctor salaries: include username & salary
-    salaries = list(db.users.find({"role": "doctor"}, {"salary": 1, "username": 1}))
+    # Doctor salaries: include username & salary (already loaded if the stats were recomputed)
+    salaries = stats['salaries']
+    if salaries is None:
+        salaries = list(db.users.find({"role": "doctor"}, {"salary": 1, "username": 1}))
 
     return render_template(
         'admin/dashboard.html',
         title="Admin Dashboard",
-        users=users,
+        users=page.items,
+        page=page,
         counts=counts,
         revenue=revenue,
+        revenue_by_specialty=revenue_by_specialty,
+        revenue_as_of=revenue_as_of,
+        revenue_age_minutes=int(revenue_age.total_seconds() // 60) if revenue_age else None,
         salaries=salaries
     )
 
 
 # ------------------ Manage Users ------------------ #
 @admin_bp.route('/manage_users', methods=['GET', 'POST'])
+@mongo_budget(7)
 @login_required
 @roles_required('admin')
 def manage_users():
@@ -89,46 +99,71 @@ def manage_users():
         try:
             if action == "create":
                 # Optional: accept password field (if provided) — omitted here for admin convenience
-                db.users.insert_one({
+                new_user = {
                     "username": request.form["username"],
                     "email": request.form["email"],
                     "role": request.form["role"],
                     "salary": float(request.form.get("salary", 0)),
                     "created_at": datetime.datetime.utcnow()
-                })
+                }
+                new_user["search_keys"] = user_search_keys(new_user)
+                db.users.insert_one(new_user)
+                bump_role(db, request.form["role"], 1)
+                if new_user["role"] == "doctor":
+                    bump_doctor_directory(db)
                 flash("User created successfully", "success")
 
             elif action == "delete":
-                db.users.delete_one({"_id": ObjectId(request.form["user_id"])})
+                deleted = db.users.find_one_and_delete(
+                    {"_id": ObjectId(request.form["user_id"])}, projection={"role": 1}
+                )
+                if deleted:
+                    bump_role(db, deleted.get("role"), -1)
+                    if deleted.get("role") == "doctor":
+                        bump_doctor_directory(db)
+                invalidate_user(request.form["user_id"])
                 flash("User deleted successfully", "info")
 
             elif action == "update":
-                db.users.update_one(
-                    {"_id": ObjectId(request.form["user_id"])},
-                    {"$set": {
-                        "username": request.form["username"],
-                        "email": request.form["email"],
-                        "role": request.form["role"],
-                        "salary": float(request.form.get("salary", 0)),
-                        "updated_at": datetime.datetime.utcnow()
-                    }}
-                )
+                changes = {
+                    "username": request.form["username"],
+                    "email": request.form["email"],
+                    "role": request.form["role"],
+                    "salary": float(request.form.get("salary", 0)),
+                    "updated_at": datetime.datetime.utcnow()
+                }
+                # the previous role is read with the other search key sources, and checked unchanged
+                previous = set_user_fields(db, ObjectId(request.form["user_id"]), changes, extra_fields=("role",))
+                if previous and previous.get("role") != request.form["role"]:
+                    bump_role(db, previous.get("role"), -1)
+                    bump_role(db, request.form["role"], 1)
+                # the directory lists doctors only: bump when the user is or was one
+                if previous and "doctor" in (previous.get("role"), request.form["role"]):
+                    bump_doctor_directory(db)
+                invalidate_user(request.form["user_id"])
                 flash("User updated successfully", "success")
         except Exception as e:
             current_app.logger.exception("Manage users action failed")
             flash("Operation failed: " + str(e), "danger")
         return redirect(url_for('admin.manage_users'))
 
-    users = list(db.users.find({}, {"password": 0}))
+    query = request.args.get("q", "").strip()
+    if query:
+        page = search_page(db, query, role=request.args.get("role") or None, projection=dict(RESULT_FIELDS, salary=1))
+    else:
+        page = paginate(db.users, projection={"password": 0}, sort_fields=USER_SORT_FIELDS,
+                        default_sort='username', filter_fields=USER_FILTER_FIELDS)
     return render_template(
         'admin/manage_users.html',
         title="Manage Users",
-        users=users
+        users=page.items,
+        page=page
     )
 
 
 # ------------------ Rulebook ------------------ #
 @admin_bp.route('/rules', methods=['GET', 'POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('admin')
 def rules():
@@ -153,21 +188,111 @@ def rules():
 
 
 # ------------------ Entries / Biometric ------------------ #
+ENTRY_WINDOW_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+def _window_arg(name):
+    try:
+        return datetime.datetime.strptime(request.args.get(name, ''), ENTRY_WINDOW_FORMAT)
+    except ValueError:
+        return None
+
+
 @admin_bp.route('/entries')
+@mongo_budget(2)
 @login_required
 @roles_required('admin')
 def entries():
+    """
+    Terminal entries in a time window, newest first: ?from=&to= (YYYY-MM-DDTHH:MM, UTC;
+    the last 24 hours by default), keyset-paginated on the (timestamp, _id) index.
+    """
     db = current_app.db
-    logs = list(db.entries.find().sort("timestamp", -1).limit(200))
+    start = _window_arg('from')
+    end = _window_arg('to')
+    if start is None and end is None:
+        start = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    window = {}
+    if start is not None:
+        window['$gte'] = start
+    if end is not None:
+        window['$lt'] = end
+    page = paginate(db.entries, query={'timestamp': window}, sort_fields=('timestamp',),
+                    default_sort='timestamp', default_order='desc', per_page=100)
     return render_template(
         'admin/entries.html',
         title="Admin Entries",
-        logs=logs
+        logs=page.items,
+        page=page,
+        start=start.strftime(ENTRY_WINDOW_FORMAT) if start else '',
+        end=end.strftime(ENTRY_WINDOW_FORMAT) if end else ''
+    )
+
+
+# ------------------ Exports ------------------ #
+@admin_bp.route('/exports')
+@mongo_budget(1)
+@login_required
+@roles_required('admin')
+def exports():
+    return render_template('admin/exports.html', title="Exports", collections=EXPORTS, formats=FORMATS)
+
+
+@admin_bp.route('/export/<collection>')
+@mongo_budget(2)
+@login_required
+@roles_required('admin')
+def export(collection):
+    """
+    Stream a whole collection as CSV or NDJSON in _id order, without holding it in memory.
+    Query args: format (csv | ndjson), from / to (YYYY-MM-DD, end exclusive), status (comma-separated),
+    after (last _id received, to resume), gzip (1 for a .gz file).
+    """
+    if collection not in EXPORTS:
+        abort(404)
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        abort(400)
+    try:
+        start = datetime.datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        end = datetime.datetime.strptime(request.args['to'], '%Y-%m-%d') if request.args.get('to') else None
+        after = ObjectId(request.args['after']) if request.args.get('after') else None
+    except Exception:
+        abort(400)
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    gzip = request.args.get('gzip') == '1'
+
+    query = export_query(collection, start=start, end=end, statuses=statuses, after=after)
+    mimetype, extension = FORMATS[fmt]
+    filename = f"{collection}-{datetime.datetime.utcnow():%Y%m%d%H%M%S}.{extension}" + ('.gz' if gzip else '')
+    return Response(
+        stream_export(current_app.db, collection, fmt, query, gzip=gzip),
+        mimetype='application/gzip' if gzip else mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'}
+    )
+
+
+# ------------------ Slow Queries ------------------ #
+@admin_bp.route('/slow_queries')
+@mongo_budget(2)
+@login_required
+@roles_required('admin')
+def slow_queries():
+    db = current_app.db
+    hours = request.args.get('hours', 24, type=int)
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours) if hours > 0 else None
+    return render_template(
+        'admin/slow_queries.html',
+        title="Slow Queries",
+        shapes=worst_shapes(db, since=since),
+        hours=hours,
+        threshold_ms=current_app.config.get('SLOW_QUERY_MS')
     )
 
 
 # ------------------ Admin Profile ------------------ #
 @admin_bp.route('/profile', methods=['GET', 'POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('admin')
 def profile():
@@ -177,14 +302,13 @@ def profile():
         try:
             user_oid = _get_current_user_oid()
             if user_oid:
-                db.users.update_one(
-                    {"_id": user_oid},
-                    {"$set": {
-                        "username": request.form.get("username"),
-                        "email": request.form.get("email"),
-                        "updated_at": datetime.datetime.utcnow()
-                    }}
-                )
+                changes = {
+                    "username": request.form.get("username"),
+                    "email": request.form.get("email"),
+                    "updated_at": datetime.datetime.utcnow()
+                }
+                set_user_fields(db, user_oid, changes, known=current_user.document)
+                invalidate_user(user_oid)
                 flash("Profile updated successfully", "success")
             else:
                 flash("Unable to determine current user id", "danger")
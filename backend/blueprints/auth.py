@@ -2,8 +2,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
-import bcrypt
+from pymongo.errors import DuplicateKeyError
 import datetime
+from ..utils.stats import bump_role
+from ..utils.decorators import mongo_budget
+from ..utils.doctor_directory import bump_doctor_directory
+from ..utils.passwords import hash_password, verify_password, needs_rehash, PasswordPoolBusy
+from ..utils.search import user_search_keys
 
 auth_bp = Blueprint('auth', __name__, template_folder='../templates')
 
@@ -35,6 +40,11 @@ class User(UserMixin):
     def get_id(self):
         return self._id
 
+    @property
+    def document(self):
+        """The Mongo document this user was loaded from (USER_LOADER_FIELDS when from the loader)."""
+        return self._user
+
     @classmethod
     def from_mongo(cls, user_dict, app=None):
         """
@@ -45,10 +55,17 @@ class User(UserMixin):
         return cls(user_dict, app=app)
 
 
+def _password_pool_busy(template, **context):
+    """503 + Retry-After re-rendering the form when hashing is overloaded or timed out."""
+    retry_after = current_app.config['PASSWORD_RETRY_AFTER']
+    return render_template(template, **context), 503, {'Retry-After': str(retry_after)}
+
+
 # --------------------
 # LOGIN (UPDATED)
 # --------------------
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@mongo_budget(2)
 def login():
     """
     Role-aware login — user can only log in from their own role page.
@@ -71,10 +88,11 @@ def login():
 
         stored_pw = user.get('password')
         try:
-            if isinstance(stored_pw, (bytes, bytearray)):
-                pw_ok = bcrypt.checkpw(password.encode('utf-8'), stored_pw)
-            else:
-                pw_ok = bcrypt.checkpw(password.encode('utf-8'), stored_pw.encode('utf-8'))
+            pw_ok = verify_password(password, stored_pw)
+        except PasswordPoolBusy:
+            # queue full or the hash timed out: the credentials were not checked
+            flash('Too many sign-ins in progress, please try again in a moment', 'warning')
+            return _password_pool_busy('login.html', role=expected_role)
         except Exception as e:
             pw_ok = False
             current_app.logger.exception("Password verification failed: %s", e)
@@ -89,6 +107,13 @@ def login():
             flash(f"Invalid credentials: You are a '{user_role}' trying to log in as '{expected_role}'.", 'danger')
             return redirect(request.referrer or url_for('auth.login'))
 
+        # ✅ Upgrade hashes made with a different cost factor (best effort)
+        if needs_rehash(stored_pw):
+            try:
+                db.users.update_one({'_id': user['_id']}, {'$set': {'password': hash_password(password)}})
+            except Exception:
+                current_app.logger.exception("Password rehash failed")
+
         # ✅ Login success
         user_obj = User.from_mongo(user, current_app)
         login_user(user_obj)
@@ -120,6 +145,7 @@ def logout():
 # REGISTER
 # --------------------
 @auth_bp.route('/register', methods=['GET','POST'])
+@mongo_budget(5)
 def register():
     if request.method == 'POST':
         db = current_app.db
@@ -131,7 +157,11 @@ def register():
         if db.users.find_one({'username': username}):
             flash("Username already exists", "danger")
         else:
-            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            try:
+                hashed = hash_password(password)
+            except PasswordPoolBusy:
+                flash("Server is busy, please try again in a moment", "warning")
+                return _password_pool_busy('register.html')
             user_doc = {
                 'username': username,
                 'email': email,
@@ -141,7 +171,14 @@ def register():
                 'salary': 0,
                 'created_at': datetime.datetime.utcnow()
             }
-            result = db.users.insert_one(user_doc)
+            user_doc['search_keys'] = user_search_keys(user_doc)
+            try:
+                result = db.users.insert_one(user_doc)
+            except DuplicateKeyError:
+                # registered concurrently since the check above (username_unique index)
+                flash("Username already exists", "danger")
+                return render_template('register.html')
+            bump_role(db, role, 1)
 
             # Create linked profile in role-specific collections
             if role == 'patient':
@@ -154,6 +191,7 @@ def register():
                     'created_at': datetime.datetime.utcnow()
                 })
             elif role == 'doctor':
+                bump_doctor_directory(db)
                 db.doctors.insert_one({
                     'user_id': result.inserted_id,
                     'name': username,
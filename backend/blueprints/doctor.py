@@ -2,7 +2,14 @@ from flask import Blueprint, render_template, current_app, request, redirect, ur
 from flask_login import login_required, current_user, logout_user
 from bson.objectid import ObjectId
 from datetime import datetime
-from ..utils.decorators import roles_required
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.fragment_cache import cached_per_user, bump_user_versions
+from ..utils.joins import as_oid, lookup_map
+from ..utils.user_cache import invalidate_user
+from ..utils.slots import release_slot
+from ..utils.doctor_directory import bump_doctor_directory
+from ..utils.search import set_user_fields
+from pymongo import ReturnDocument
 
 # ---------------- Blueprint ---------------- #
 doctor_bp = Blueprint('doctor', __name__, template_folder='../templates/doctor')
@@ -10,6 +17,7 @@ doctor_bp = Blueprint('doctor', __name__, template_folder='../templates/doctor')
 
 # ---------------- Dashboard ---------------- #
 @doctor_bp.route('/', endpoint='dashboard')
+@mongo_budget(3)
 @login_required
 @roles_required('doctor')
 def dashboard():
@@ -17,9 +25,10 @@ def dashboard():
     doctor_id = ObjectId(current_user.get_id())
 
     appts = list(db.appointments.find({'doctor_id': doctor_id}).sort('datetime', 1))
+    patient_docs = lookup_map(db.patients, (a.get('patient_id') for a in appts), fields=['name'])
     for a in appts:
         a['_id'] = str(a['_id'])
-        patient_doc = db.patients.find_one({'_id': ObjectId(a['patient_id'])}) if a.get('patient_id') else None
+        patient_doc = patient_docs.get(as_oid(a.get('patient_id')))
         a['patient_name'] = patient_doc.get('name') if patient_doc else 'Unknown'
         a['status'] = a.get('status', 'pending').capitalize()
 
@@ -28,15 +37,17 @@ def dashboard():
 
 # ---------------- Appointments ---------------- #
 @doctor_bp.route('/appointments')
+@mongo_budget(3)
 @login_required
 @roles_required('doctor')
 def doctor_appointments():
     db = current_app.db
     doctor_id = ObjectId(current_user.get_id())
     appointments = list(db.appointments.find({'doctor_id': doctor_id}))
+    patient_docs = lookup_map(db.users, (a.get('patient_id') for a in appointments), fields=['name'])
 
     for appt in appointments:
-        patient = db.users.find_one({'_id': appt.get('patient_id')})
+        patient = patient_docs.get(as_oid(appt.get('patient_id')))
         appt['_id'] = str(appt['_id'])
         appt['patient_name'] = patient.get('name') if patient else 'Unknown'
         appt['status'] = appt.get('status', 'Pending').capitalize()
@@ -51,6 +62,7 @@ def doctor_appointments():
 
 
 @doctor_bp.route('/appointments/<appt_id>/status', methods=['POST'])
+@mongo_budget(4)
 @login_required
 @roles_required('doctor')
 def doctor_update_status(appt_id):
@@ -61,16 +73,27 @@ def doctor_update_status(appt_id):
         flash('Invalid status ❌', 'danger')
         return redirect(url_for('doctor.doctor_appointments'))
 
-    db.appointments.update_one(
-        {'_id': ObjectId(appt_id), 'doctor_id': ObjectId(current_user.get_id())},
-        {'$set': {'status': new_status.lower()}}
+    # only a pending appointment still holds its slot; a cancelled one may have been rebooked
+    appt = db.appointments.find_one_and_update(
+        {'_id': ObjectId(appt_id), 'doctor_id': ObjectId(current_user.get_id()), 'status': 'pending'},
+        {'$set': {'status': new_status.lower()}},
+        projection={'doctor_id': 1, 'slot_start': 1},
+        return_document=ReturnDocument.AFTER
     )
+    if appt is None:
+        flash('This appointment is no longer pending.', 'warning')
+        return redirect(url_for('doctor.doctor_appointments'))
+    if new_status == 'Rejected':
+        release_slot(db, appt)
+        if appt.get('slot_start'):
+            current_app.availability.release(appt['doctor_id'], appt['slot_start'])
     flash(f'Appointment marked as {new_status}', 'success')
     return redirect(url_for('doctor.doctor_appointments'))
 
 
 # ---------------- Patients (Accepted Only) ---------------- #
 @doctor_bp.route('/patients')
+@mongo_budget(3)
 @login_required
 @roles_required('doctor')
 def patients():
@@ -85,27 +108,27 @@ def patients():
     if not accepted_appts:
         return render_template('doctor/patients.html', patients=[])
 
-    patient_ids = [appt['patient_id'] for appt in accepted_appts]
-    patients = list(db.users.find({"_id": {"$in": patient_ids}}))
+    patients = lookup_map(db.users, (appt['patient_id'] for appt in accepted_appts), fields=['name', 'email'])
 
     combined_data = []
     for appt in accepted_appts:
-        for patient in patients:
-            if patient["_id"] == appt["patient_id"]:
-                combined_data.append({
-                    "id": str(patient["_id"]),
-                    "name": patient.get("name"),
-                    "email": patient.get("email"),
-                    "problem": appt.get("problem", "N/A"),
-                    "datetime": appt.get("datetime"),
-                    "status": appt.get("status", "unknown")
-                })
+        patient = patients.get(as_oid(appt["patient_id"]))
+        if patient:
+            combined_data.append({
+                "id": str(patient["_id"]),
+                "name": patient.get("name"),
+                "email": patient.get("email"),
+                "problem": appt.get("problem", "N/A"),
+                "datetime": appt.get("datetime"),
+                "status": appt.get("status", "unknown")
+            })
 
     return render_template('doctor/patients.html', patients=combined_data)
 
 
 # ---------------- Add Prescription ---------------- #
 @doctor_bp.route('/add_prescription/<patient_id>')
+@mongo_budget(2)
 @login_required
 @roles_required('doctor')
 def add_prescription(patient_id):
@@ -120,6 +143,7 @@ def add_prescription(patient_id):
 # ---------------- Save Prescription ---------------- #
 
 @doctor_bp.route('/save_prescription/<patient_id>', methods=['POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('doctor')
 def save_prescription(patient_id):
@@ -152,6 +176,7 @@ def save_prescription(patient_id):
 
     # ✅ Insert into DB
     db.prescriptions.insert_one(prescription)
+    bump_user_versions(db, prescription['doctor_id'], prescription['patient_id'])
 
     flash('Prescription added successfully!', 'success')
     return redirect(url_for('doctor.patients'))
@@ -159,18 +184,21 @@ def save_prescription(patient_id):
 
 # ---------------- View Prescriptions ---------------- #
 @doctor_bp.route('/view_prescriptions')
+@mongo_budget(4)
 @login_required
 @roles_required('doctor')
+@cached_per_user
 def view_prescriptions():
     db = current_app.db
     doctor_id = ObjectId(current_user.get_id())
 
     prescriptions = list(db.prescriptions.find({"doctor_id": doctor_id}).sort("created_at", -1))
+    patient_docs = lookup_map(db.users, (p.get("patient_id") for p in prescriptions), fields=["name"])
     for p in prescriptions:
         p["_id"] = str(p["_id"])
-        
-        # Fetch patient name safely
-        patient = db.users.find_one({"_id": p["patient_id"]})
+
+        # Patient names resolved in one batched query above
+        patient = patient_docs.get(as_oid(p.get("patient_id")))
         p["patient_name"] = patient.get("name", "Unknown") if patient else "Unknown"
 
         # Handle both datetime and string date
@@ -186,13 +214,16 @@ def view_prescriptions():
 
 # ---------------- Profile ---------------- #
 @doctor_bp.route('/profile', methods=['GET', 'POST'])
+@mongo_budget(5)
 @login_required
 @roles_required('doctor')
 def profile():
     db = current_app.db
     if request.method == 'POST':
         profile_data = dict(request.form)
-        db.users.update_one({'_id': ObjectId(current_user.get_id())}, {'$set': {'profile': profile_data}})
+        set_user_fields(db, ObjectId(current_user.get_id()), {'profile': profile_data}, known=current_user.document)
+        invalidate_user(current_user.get_id())
+        bump_doctor_directory(db)
         flash('Profile updated ✅', 'success')
 
     user = db.users.find_one({'_id': ObjectId(current_user.get_id())}, {'password': 0})
@@ -201,6 +232,7 @@ def profile():
 
 # ---------------- Salary ---------------- #
 @doctor_bp.route('/salary')
+@mongo_budget(2)
 @login_required
 @roles_required('doctor')
 def salary():
@@ -0,0 +1,55 @@
+import datetime
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from ..utils.decorators import mongo_budget
+from ..utils.entries import terminal_for, read_events, entry_doc
+
+entries_bp = Blueprint('entries', __name__)
+
+# invalid events reported back per request; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+# ---------------- Ingest ---------------- #
+@entries_bp.route('/ingest', methods=['POST'])
+@mongo_budget(0)
+def ingest():
+    """
+    Batched events from door / biometric terminals, authenticated with `Authorization: Bearer <token>`
+    (ENTRY_INGEST_TOKENS). Body: NDJSON, a JSON array or {"entries": [...]}, each event
+    {user, action, timestamp (ISO 8601 or epoch seconds, default now), door}.
+    202 once queued for writing; 503 with Retry-After when the write buffer is full, in which case
+    nothing was queued and the whole batch should be resent.
+    Delivery is at least once, and a 202 is not a durable write (see utils/entries.py for the
+    loss window). No Mongo commands here; the background flush has its own budget.
+    """
+    terminal = terminal_for(current_app.entry_tokens, request.headers.get('Authorization'))
+    if terminal is None:
+        return jsonify({'error': 'invalid or missing terminal token'}), 401, {'WWW-Authenticate': 'Bearer'}
+    # enforced on Content-Length and, for chunked bodies, while the stream is read
+    request.max_content_length = current_app.config['ENTRY_MAX_BYTES']
+    try:
+        events = read_events(request, current_app.config['ENTRY_MAX_BATCH'])
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"body exceeds {current_app.config['ENTRY_MAX_BYTES']} bytes"}), 413
+    except OverflowError:
+        return jsonify({'error': f"at most {current_app.config['ENTRY_MAX_BATCH']} events per request"}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    now = datetime.datetime.utcnow()
+    docs, errors = [], []
+    for index, event in enumerate(events):
+        try:
+            docs.append(entry_doc(event, terminal, now))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    result = {'accepted': len(docs), 'rejected': len(errors), 'errors': errors[:MAX_REPORTED_ERRORS]}
+    if not docs:
+        return jsonify(result), 400 if errors else 202
+
+    if not current_app.entry_writer.submit(docs):
+        retry_after = current_app.config['ENTRY_RETRY_AFTER']
+        return (jsonify({'error': 'ingest buffer full, retry later', 'retry_after': retry_after}), 503,
+                {'Retry-After': str(retry_after)})
+    return jsonify(result), 202
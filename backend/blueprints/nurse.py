@@ -1,33 +1,43 @@
 from flask import Blueprint, render_template, current_app, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from ..utils.decorators import roles_required
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.fragment_cache import cached_per_user, bump_user_versions
+from ..utils.user_cache import invalidate_user
+from ..utils.search import set_user_fields
+from ..utils.fanout import fan_out
 from bson.objectid import ObjectId
 
 nurse_bp = Blueprint('nurse', __name__, template_folder='../templates/nurse')
 
 # Dashboard
 @nurse_bp.route('/')
+@mongo_budget(4)
 @login_required
 @roles_required('nurse')
 def dashboard():
     db = current_app.db
+    nurse_id = str(current_user.get_id())
 
-    assignments = list(db.nurse_assignments.find({'nurse_id': str(current_user.get_id())}))
-    schedule = list(db.nurse_schedule.find({'nurse_id': str(current_user.get_id())}))
-    salary = db.salaries.find_one({'nurse_id': str(current_user.get_id())})
+    data = fan_out({
+        'assignments': lambda: list(db.nurse_assignments.find({'nurse_id': nurse_id})),
+        'schedule': lambda: list(db.nurse_schedule.find({'nurse_id': nurse_id})),
+        'salary': lambda: db.salaries.find_one({'nurse_id': nurse_id}),
+    }, default={'assignments': [], 'schedule': [], 'salary': None})
 
     return render_template(
         'nurse/dashboard.html',
-        assignments=assignments,
-        schedule=schedule,
-        salary=salary
+        assignments=data['assignments'],
+        schedule=data['schedule'],
+        salary=data['salary']
     )
 
 
 # Schedule management
 @nurse_bp.route('/schedule', methods=['GET', 'POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('nurse')
+@cached_per_user
 def schedule():
     db = current_app.db
     if request.method == 'POST':
@@ -38,6 +48,7 @@ def schedule():
             'date': shift_date,
             'time': shift_time
         })
+        bump_user_versions(db, current_user.get_id())
         flash("Shift added successfully!", "success")
         return redirect(url_for('nurse.schedule'))
 
@@ -46,6 +57,7 @@ def schedule():
 
 # Apply for leave
 @nurse_bp.route('/leave', methods=['GET', 'POST'])
+@mongo_budget(2)
 @login_required
 @roles_required('nurse')
 def leave():
@@ -67,6 +79,7 @@ def leave():
 
 # Salary details
 @nurse_bp.route('/salary')
+@mongo_budget(2)
 @login_required
 @roles_required('nurse')
 def salary():
@@ -82,6 +95,7 @@ def salary():
 from bson.objectid import ObjectId
 
 @nurse_bp.route('/profile', methods=['GET', 'POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('nurse')
 def profile():
@@ -96,10 +110,8 @@ def profile():
         }
 
         # ✅ update fields directly on user, not inside "profile"
-        db.users.update_one(
-            {"_id": ObjectId(current_user.get_id())},
-            {"$set": updated_data}
-        )
+        set_user_fields(db, ObjectId(current_user.get_id()), updated_data, known=current_user.document)
+        invalidate_user(current_user.get_id())
 
         flash("Profile updated successfully!", "success")
         return redirect(url_for("nurse.profile"))
@@ -1,41 +1,68 @@
-from flask import Blueprint, render_template, current_app, request, redirect, url_for, flash
+from flask import Blueprint, render_template, current_app, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from ..utils.decorators import roles_required
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.fragment_cache import cached_per_user, bump_user_versions
+from ..utils.user_cache import invalidate_user
+from ..utils.search import set_user_fields
+from ..utils.stats import bump_appointments
+from ..utils.slots import slot_start, reserve_slot, release_slot, ACTIVE_STATUSES
+from ..utils.fanout import fan_out
+from ..utils.timeline import patient_timeline
+from pymongo import ReturnDocument
 from bson.objectid import ObjectId
 import datetime
 
 patient_bp = Blueprint('patient', __name__, template_folder='../templates/patient')
 
+# Problem -> specialist suggested on the booking page (also used by the availability search)
+SPECIALIST_MAP = {
+    'Fever': 'General Physician', 'Cold & Cough': 'General Physician',
+    'Chest Pain': 'Cardiologist', 'Skin Rash': 'Dermatologist',
+    'Headache': 'Neurologist', 'Stomach Pain': 'Gastroenterologist',
+    'Joint Pain': 'Orthopedic', 'Vision Problem': 'Ophthalmologist',
+    'Toothache': 'Dentist', 'Ear Pain': 'ENT Specialist',
+    'Diabetes Checkup': 'Endocrinologist', 'Heart Checkup': 'Cardiologist',
+    'Allergy': 'Allergist', 'High Blood Pressure': 'Cardiologist',
+    'Back Pain': 'Orthopedic'
+}
+
 # ------------------ Dashboard ------------------
 @patient_bp.route('/')
+@mongo_budget(6)
 @login_required
 @roles_required('patient')
 def dashboard():
     db = current_app.db
-    patient = db.patients.find_one({'user_id': ObjectId(current_user.get_id())})
-    appts = list(db.appointments.find({'patient_id': ObjectId(current_user.get_id())}))
-    prescriptions = list(db.prescriptions.find({'patient_id': ObjectId(current_user.get_id())}))
-    bills = list(db.billing.find({'patient_id': ObjectId(current_user.get_id())}))
-    reports = list(db.reports.find({'patient_id': ObjectId(current_user.get_id())}))
+    user_id = ObjectId(current_user.get_id())
+    # independent reads run in parallel; page latency tracks the slowest one
+    data = fan_out({
+        'patient': lambda: db.patients.find_one({'user_id': user_id}),
+        'appointments': lambda: list(db.appointments.find({'patient_id': user_id})),
+        'prescriptions': lambda: list(db.prescriptions.find({'patient_id': user_id})),
+        'bills': lambda: list(db.billing.find({'patient_id': user_id})),
+        'reports': lambda: list(db.reports.find({'patient_id': user_id})),
+    }, default={'patient': None, 'appointments': [], 'prescriptions': [], 'bills': [], 'reports': []})
 
     return render_template(
         'patient/dashboard.html',
-        appointments=appts,
-        prescriptions=prescriptions,
-        bills=bills,
-        reports=reports,
-        patient=patient
+        appointments=data['appointments'],
+        prescriptions=data['prescriptions'],
+        bills=data['bills'],
+        reports=data['reports'],
+        patient=data['patient']
     )
 
 # ------------------ Book Appointment ------------------
 @patient_bp.route('/book', methods=['GET', 'POST'])
+@mongo_budget(9)
 @login_required
 @roles_required('patient')
 def book_appointment():
     db = current_app.db
 
-    # 🩺 Preload doctors and problems
-    doctors = list(db.users.find({'role': 'doctor'}, {'password': 0}))
+    # 🩺 Preload doctors (compact records from the process-local directory) and problems
+    directory = current_app.doctor_directory
+    doctors = directory.all(db)
     problems = [
         {'name': 'Fever'}, {'name': 'Cold & Cough'}, {'name': 'Chest Pain'}, {'name': 'Skin Rash'},
         {'name': 'Headache'}, {'name': 'Stomach Pain'}, {'name': 'Joint Pain'}, {'name': 'Vision Problem'},
@@ -43,16 +70,6 @@ def book_appointment():
         {'name': 'Allergy'}, {'name': 'High Blood Pressure'}, {'name': 'Back Pain'}
     ]
 
-    specialist_map = {
-        'Fever': 'General Physician', 'Cold & Cough': 'General Physician',
-        'Chest Pain': 'Cardiologist', 'Skin Rash': 'Dermatologist',
-        'Headache': 'Neurologist', 'Stomach Pain': 'Gastroenterologist',
-        'Joint Pain': 'Orthopedic', 'Vision Problem': 'Ophthalmologist',
-        'Toothache': 'Dentist', 'Ear Pain': 'ENT Specialist',
-        'Diabetes Checkup': 'Endocrinologist', 'Heart Checkup': 'Cardiologist',
-        'Allergy': 'Allergist', 'High Blood Pressure': 'Cardiologist',
-        'Back Pain': 'Orthopedic'
-    }
 
     if request.method == 'POST':
         problem = request.form.get('problem')
@@ -62,44 +79,59 @@ def book_appointment():
         doctor_id = request.form.get('doctor')
         date = request.form.get('date')
         time = request.form.get('time')
-        suggested_specialist = specialist_map.get(problem, 'General Physician')
+        suggested_specialist = SPECIALIST_MAP.get(problem, 'General Physician')
+        doctor = directory.get(db, doctor_id)
+        if not doctor:
+            flash("Please choose a valid doctor.", "warning")
+            return redirect(url_for("patient.book_appointment"))
 
         appointment_datetime = datetime.datetime.fromisoformat(f"{date}T{time}")
-        # 🕒 Check if the doctor already has an accepted appointment at this time
-        existing_appt = db.appointments.find_one({
-        "doctor_id": ObjectId(doctor_id),
-        "datetime": appointment_datetime,
-        "status": "accepted"
-       })
-        if existing_appt:
+        # 🕒 Atomically reserve the doctor's slot; fails if any pending/accepted booking holds it
+        slot_minutes = current_app.config['APPOINTMENT_SLOT_MINUTES']
+        start = slot_start(appointment_datetime, slot_minutes)
+        appt_id = ObjectId()
+        if not reserve_slot(db, ObjectId(doctor_id), start, slot_minutes,
+                            ObjectId(current_user.get_id()), appt_id):
             flash("❌ This time slot is already booked. Please choose another time.", "warning")
             return redirect(url_for("patient.book_appointment"))
         appt = {
+            '_id': appt_id,
             'problem': problem,
             'doctor_id': ObjectId(doctor_id),
             'patient_id': ObjectId(current_user.get_id()),
             'status': 'pending',
             'datetime': appointment_datetime,
+            'slot_start': start,
             'created_at': datetime.datetime.utcnow()
         }
 
-        db.appointments.insert_one(appt)
+        try:
+            db.appointments.insert_one(appt)
+        except Exception:
+            release_slot(db, appt)
+            raise
+        current_app.availability.book(appt['doctor_id'], start)
+        bump_appointments(db, 1)
 
         # 💰 Automatically create a billing record
-        doctor = db.users.find_one({'_id': ObjectId(doctor_id)}, {'username': 1})
         appointment_fee = 500  # default consultation fee
 
         db.billing.insert_one({
             'patient_id': ObjectId(current_user.get_id()),
             'doctor_id': ObjectId(doctor_id),
-            'doctor_name': doctor.get('username', 'Unknown Doctor') if doctor else 'Unknown Doctor',
+            'doctor_name': doctor.get('username') or 'Unknown Doctor',
             'amount': appointment_fee,
             'status': 'Unpaid',
             'description': f"Consultation for {problem}",
+            'problem': problem,
+            'specialty': doctor.get('specialty') or suggested_specialist,
             'date': datetime.datetime.utcnow(),
             'appointment_datetime': appointment_datetime,
-            'created_at': datetime.datetime.utcnow()
+            'created_at': datetime.datetime.utcnow(),
+            'updated_at': datetime.datetime.utcnow()
         })
+        # new bill on the patient's billing page
+        bump_user_versions(db, current_user.get_id(), doctor_id)
 
         flash(f"Appointment booked successfully! Based on your problem ('{problem}'), "
               f"you should meet a {suggested_specialist}. A bill of ₹{appointment_fee} has been generated.",
@@ -108,7 +140,7 @@ def book_appointment():
         return redirect(url_for('patient.book_appointment'))
 
     appointments = list(db.appointments.find({'patient_id': ObjectId(current_user.get_id())}))
-    doctor_map = {str(d['_id']): d for d in doctors}
+    doctor_map = {d['id']: d for d in doctors}
 
     for a in appointments:
         a['doctor_id'] = str(a['doctor_id'])
@@ -121,21 +153,67 @@ def book_appointment():
         doctor_map=doctor_map
     )
 
+# ------------------ Availability Search ------------------
+@patient_bp.route('/availability')
+@mongo_budget(4)
+@login_required
+@roles_required('patient')
+def availability():
+    """
+    JSON: earliest free slots for a specialty (or the specialist suggested for `problem`).
+    Query args: specialty | problem, after (ISO datetime, default now), n (default 5, max 50).
+    """
+    specialty = request.args.get('specialty') or SPECIALIST_MAP.get(request.args.get('problem', ''), '')
+    try:
+        after = datetime.datetime.fromisoformat(request.args['after']) if request.args.get('after') \
+            else datetime.datetime.now()
+        n = max(1, min(int(request.args.get('n', 5)), 50))
+    except ValueError:
+        return jsonify({'error': 'invalid after/n parameter'}), 400
+    if after.tzinfo is not None:
+        # slots are naive server-local times, like datetime.now()
+        after = after.astimezone().replace(tzinfo=None)
+
+    index = current_app.availability
+    index.ensure_fresh(current_app.db)
+    slots = index.next_free(specialty, after, n)
+    return jsonify({
+        'specialty': specialty,
+        'slots': [{
+            'doctor_id': str(cal.doctor_id),
+            'doctor_name': cal.name,
+            'specialty': cal.specialty,
+            'date': start.strftime('%Y-%m-%d'),
+            'time': start.strftime('%H:%M'),
+        } for start, cal in slots]
+    })
+
 # ------------------ Cancel Appointment ------------------
 @patient_bp.route('/cancel/<appt_id>', methods=['POST'])
+@mongo_budget(4)
 @login_required
 @roles_required('patient')
 def cancel_appointment(appt_id):
     db = current_app.db
-    db.appointments.update_one(
-        {'_id': ObjectId(appt_id), 'patient_id': ObjectId(current_user.get_id())},
-        {'$set': {'status': 'cancelled'}}
+    appt = db.appointments.find_one_and_update(
+        {'_id': ObjectId(appt_id), 'patient_id': ObjectId(current_user.get_id()),
+         'status': {'$in': list(ACTIVE_STATUSES)}},
+        {'$set': {'status': 'cancelled'}},
+        projection={'doctor_id': 1, 'slot_start': 1},
+        return_document=ReturnDocument.AFTER
     )
+    if appt is None:
+        flash('This appointment can no longer be cancelled.', 'warning')
+        return redirect(url_for('patient.dashboard'))
+    release_slot(db, appt)
+    if appt.get('slot_start'):
+        current_app.availability.release(appt['doctor_id'], appt['slot_start'])
     flash('Appointment cancelled.', 'info')
     return redirect(url_for('patient.dashboard'))
 
 # ------------------ Profile Update ------------------
 @patient_bp.route('/profile', methods=['GET', 'POST'])
+@mongo_budget(4)
 @login_required
 @roles_required('patient')
 def profile():
@@ -154,10 +232,9 @@ def profile():
             upsert=True
         )
 
-        db.users.update_one(
-            {'_id': user_id},
-            {'$set': {'email': email, 'name': name}}
-        )
+        # phone is mirrored onto the user so it is searchable
+        set_user_fields(db, user_id, {'email': email, 'name': name, 'phone': phone}, known=current_user.document)
+        invalidate_user(user_id)
 
         flash('Profile updated.', 'success')
         return redirect(url_for('patient.profile'))
@@ -167,8 +244,10 @@ def profile():
 
 # ------------------ View Prescriptions ------------------
 @patient_bp.route('/prescriptions')
+@mongo_budget(3)
 @login_required
 @roles_required('patient')
+@cached_per_user
 def prescriptions():
     db = current_app.db
     patient_id = current_user.get_id()
@@ -190,8 +269,35 @@ def prescriptions():
 
     return render_template('patient/prescriptions.html', prescriptions=prescriptions)
 
+# ------------------ Timeline ------------------
+@patient_bp.route('/timeline')
+@mongo_budget(5)
+@login_required
+@roles_required('patient')
+def timeline():
+    """
+    Appointments, prescriptions, bills and reports in one newest-first feed.
+    Query args: after (token from the previous page), n (default 20, max 100), format=json.
+    """
+    try:
+        n = max(1, min(int(request.args.get('n', 20)), 100))
+    except ValueError:
+        n = 20
+    events, next_token = patient_timeline(current_app.db, ObjectId(current_user.get_id()),
+                                          token=request.args.get('after'), limit=n)
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'events': [{'kind': e['kind'], 'time': e['time'].isoformat(), 'id': str(e['doc']['_id']),
+                        **{k: str(v) if isinstance(v, ObjectId) else v
+                           for k, v in e['doc'].items() if k != '_id' and not isinstance(v, datetime.datetime)}}
+                       for e in events],
+            'next': next_token,
+        })
+    return render_template('patient/timeline.html', events=events, next_token=next_token, n=n)
+
 # ------------------ View Reports ------------------
 @patient_bp.route('/reports')
+@mongo_budget(2)
 @login_required
 @roles_required('patient')
 def reports():
@@ -201,8 +307,10 @@ def reports():
 
 # ------------------ View Billing ------------------
 @patient_bp.route('/billing')
+@mongo_budget(3)
 @login_required
 @roles_required('patient')
+@cached_per_user
 def billing():
     db = current_app.db
     bills = list(db.billing.find({'patient_id': ObjectId(current_user.get_id())}))
@@ -215,13 +323,21 @@ def billing():
 
 # ------------------ Pay Bill ------------------
 @patient_bp.route('/billing/pay/<bill_id>', methods=['POST'])
+@mongo_budget(3)
 @login_required
 @roles_required('patient')
 def pay_bill(bill_id):
     db = current_app.db
-    db.billing.update_one(
-        {'_id': ObjectId(bill_id), 'patient_id': ObjectId(current_user.get_id())},
-        {'$set': {'status': 'Paid'}}
+    now = datetime.datetime.utcnow()
+    # paid_at/updated_at drive the incremental revenue rollups; re-stamping an already paid
+    # bill would move it to another month without regrouping the old one
+    result = db.billing.update_one(
+        {'_id': ObjectId(bill_id), 'patient_id': ObjectId(current_user.get_id()), 'status': 'Unpaid'},
+        {'$set': {'status': 'Paid', 'paid_at': now, 'updated_at': now}}
     )
+    if not result.matched_count:
+        flash('This bill is already paid.', 'info')
+        return redirect(url_for('patient.billing'))
+    bump_user_versions(db, current_user.get_id())
     flash('✅ Payment successful! Your bill is now marked as Paid.', 'success')
     return redirect(url_for('patient.billing'))
@@ -1,22 +1,31 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
 from flask_login import login_required, current_user
 from datetime import datetime
-from ..utils.decorators import roles_required
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.pagination import paginate
 
 receptionist_bp = Blueprint('receptionist', __name__)
 
+# each sort and filter column leads an index in backend/models/indexes.py
+SCHEDULE_SORT_FIELDS = ('date', 'doctor', 'patient', 'status', '_id')
+SCHEDULE_FILTER_FIELDS = ('status', 'doctor', 'date')
+CALL_LOG_SORT_FIELDS = ('_id', 'caller_name', 'phone')
+
 
 # ---------------- Dashboard ----------------
 @receptionist_bp.route('/dashboard')
+@mongo_budget(2)
 @login_required
 def dashboard():
     db = current_app.db
-    schedules = list(db.schedules.find())
-    return render_template('receptionist/dashboard.html', schedules=schedules)
+    page = paginate(db.schedules, sort_fields=SCHEDULE_SORT_FIELDS, default_sort='date',
+                    default_order='desc', filter_fields=SCHEDULE_FILTER_FIELDS, per_page=25)
+    return render_template('receptionist/dashboard.html', schedules=page.items, page=page)
 
 
 # ---------------- Profile ----------------
 @receptionist_bp.route('/profile')
+@mongo_budget(1)
 @login_required
 def profile():
     return render_template('receptionist/profile.html', user=current_user)
@@ -24,6 +33,7 @@ def profile():
 
 # ---------------- Schedule ----------------
 @receptionist_bp.route('/schedule', methods=['GET', 'POST'])
+@mongo_budget(2)
 @login_required
 @roles_required('receptionist')
 def schedule_page():
@@ -50,12 +60,14 @@ def schedule_page():
         return redirect(url_for('receptionist.schedule_page'))  # reload page after insert
 
     # 🟦 If it's a GET request (show the page)
-    schedules = list(db.schedules.find())
-    return render_template('receptionist/schedule.html', schedules=schedules)
+    page = paginate(db.schedules, sort_fields=SCHEDULE_SORT_FIELDS, default_sort='date',
+                    default_order='desc', filter_fields=SCHEDULE_FILTER_FIELDS)
+    return render_template('receptionist/schedule.html', schedules=page.items, page=page)
 
 
 # ---------------- Salary ----------------
 @receptionist_bp.route('/salary')
+@mongo_budget(2)
 @login_required
 def salary_page():   # renamed
     db = current_app.db
@@ -65,8 +77,10 @@ def salary_page():   # renamed
 
 # ---------------- Call Logs ----------------
 @receptionist_bp.route('/call_logs')
+@mongo_budget(2)
 @login_required
 def call_logs_page():   # renamed
     db = current_app.db
-    logs = list(db.calllogs.find())
-    return render_template('receptionist/call_logs.html', call_logs=logs)
+    # newest first; _id order doubles as insertion time
+    page = paginate(db.calllogs, sort_fields=CALL_LOG_SORT_FIELDS, default_sort='_id', default_order='desc')
+    return render_template('receptionist/call_logs.html', call_logs=page.items, logs=page.items, page=page)
@@ -0,0 +1,88 @@
+from flask import Blueprint, current_app, request, redirect, url_for, flash, jsonify, abort
+from flask_login import login_required, current_user
+from bson.objectid import ObjectId
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.report_storage import FileTooLarge, can_access_patient, new_report
+
+reports_bp = Blueprint('reports', __name__)
+
+
+def _oid(value):
+    try:
+        return ObjectId(value)
+    except Exception:
+        abort(404)
+
+
+# ---------------- Upload ---------------- #
+@reports_bp.route('/upload', methods=['POST'])
+@mongo_budget(3)
+@login_required
+@roles_required('patient', 'doctor', 'admin')
+def upload():
+    """
+    Store a report file for a patient, streamed in chunks.
+    Either a multipart form (file, type, notes, patient_id) or a raw request body with
+    ?patient_id=&type=&notes=&filename= and the file's Content-Type. Patients upload for themselves.
+    """
+    db = current_app.db
+    raw = request.mimetype != 'multipart/form-data'
+    fields = request.args if raw else request.form
+    if current_user.role.lower() == 'patient':
+        patient_id = ObjectId(current_user.get_id())
+    else:
+        patient_id = _oid(fields.get('patient_id'))
+
+    def fail(message, status):
+        if raw:
+            return jsonify({'error': message}), status
+        flash(message, 'danger')
+        return redirect(request.referrer or url_for('index'))
+
+    if not can_access_patient(db, current_user, patient_id):
+        return fail('You cannot add reports for this patient', 403)
+    if raw:
+        stream, filename, content_type = request.stream, fields.get('filename') or 'report', request.mimetype
+    else:
+        file = request.files.get('file')
+        if file is None or not file.filename:
+            return fail('Choose a file to upload', 400)
+        stream, filename, content_type = file.stream, file.filename, file.mimetype
+
+    storage = current_app.report_storage
+    try:
+        digest, size, deduplicated = storage.save(stream, current_app.config['REPORT_MAX_BYTES'])
+    except FileTooLarge as e:
+        return fail(str(e), 413)
+    report = new_report(patient_id, digest, size, storage.name, filename, content_type or 'application/octet-stream',
+                        fields.get('type') or 'Report', fields.get('notes', ''), ObjectId(current_user.get_id()))
+    report_id = db.reports.insert_one(report).inserted_id
+
+    if raw:
+        return jsonify({'id': str(report_id), 'file_ref': digest, 'size': size, 'deduplicated': deduplicated}), 201
+    flash('Report uploaded', 'success')
+    return redirect(request.referrer or url_for('index'))
+
+
+# ---------------- Download ---------------- #
+@reports_bp.route('/<report_id>/file')
+@mongo_budget(4)
+@login_required
+def download(report_id):
+    """
+    Stream a report's file (Range and conditional requests supported); ?download=1 saves it as an attachment.
+    Only PDFs and images open inline; see report_storage.served_as.
+    """
+    db = current_app.db
+    report = db.reports.find_one({'_id': _oid(report_id)})
+    if not report or not report.get('file_ref'):
+        abort(404)
+    if not can_access_patient(db, current_user, report['patient_id']):
+        abort(403)
+    storage = current_app.report_storages.get(report.get('storage'), current_app.report_storage)
+    try:
+        return storage.send(report['file_ref'], report.get('content_type') or 'application/octet-stream',
+                            report.get('filename') or report['file_ref'], request.args.get('download') == '1')
+    except FileNotFoundError:
+        current_app.logger.error("Report %s points at missing file %s", report_id, report['file_ref'])
+        abort(404)
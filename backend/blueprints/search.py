@@ -0,0 +1,122 @@
+from flask import Blueprint, current_app, request, jsonify
+from flask_login import login_required, current_user
+from bson.objectid import ObjectId
+from pymongo.errors import OperationFailure
+from ..utils.decorators import roles_required, mongo_budget
+from ..utils.pagination import encode_cursor, decode_cursor, DEFAULT_PER_PAGE, MAX_PER_PAGE
+from ..utils.search import search_users, search_records
+from ..utils.joins import as_oid, lookup_map
+
+search_bp = Blueprint('search', __name__)
+
+# Roles each kind of staff may look up; the first is the default. Only admins may search all roles at once.
+SEARCHABLE_ROLES = {
+    'admin': ('patient', 'doctor', 'nurse', 'receptionist', 'admin'),
+    'doctor': ('patient',),
+    'nurse': ('patient', 'doctor'),
+    'receptionist': ('patient', 'doctor'),
+}
+
+# Free-text scopes (collections with a text index): who may search each, and the fields returned
+RECORD_SCOPES = {
+    'appointments': {'roles': ('admin', 'doctor', 'receptionist'),
+                     'fields': {'problem': 1, 'status': 1, 'datetime': 1, 'doctor_id': 1, 'patient_id': 1}},
+    'prescriptions': {'roles': ('admin', 'doctor'),
+                      'fields': {'diagnosis': 1, 'medicines': 1, 'created_at': 1, 'doctor_id': 1, 'patient_id': 1}},
+}
+
+
+def _per_page():
+    try:
+        return max(1, min(int(request.args.get('per_page', DEFAULT_PER_PAGE)), MAX_PER_PAGE))
+    except ValueError:
+        return DEFAULT_PER_PAGE
+
+
+def _cursor():
+    token = request.args.get('after')
+    values = decode_cursor(token) if token else None
+    return values if values and len(values) == 2 else None
+
+
+def _display_name(user):
+    profile = user.get('profile') or {}
+    return user.get('name') or ' '.join(filter(None, (profile.get('first_name'), profile.get('last_name')))) or None
+
+
+# ---------------- Users ---------------- #
+@search_bp.route('/users')
+@mongo_budget(2)
+@login_required
+@roles_required(*SEARCHABLE_ROLES)
+def users():
+    """
+    JSON: users whose name, username, email or phone starts with `q` (every word of it).
+    Query args: q, role (defaults to patients; admins may leave it empty for all roles), after, per_page.
+    """
+    viewer = current_user.role.lower()
+    allowed = SEARCHABLE_ROLES[viewer]
+    role = request.args.get('role', '' if viewer == 'admin' else allowed[0])
+    if role not in allowed and not (role == '' and viewer == 'admin'):
+        return jsonify({'error': f"cannot search role '{role}'"}), 403
+
+    found, next_cursor = search_users(current_app.db, request.args.get('q', ''), role=role or None,
+                                      after=_cursor(), limit=_per_page())
+    return jsonify({
+        'query': request.args.get('q', ''),
+        'role': role or None,
+        'results': [{
+            'id': str(u['_id']),
+            'username': u.get('username'),
+            'email': u.get('email'),
+            'role': u.get('role'),
+            'name': _display_name(u),
+            'phone': u.get('phone'),
+        } for u in found],
+        'next': encode_cursor(next_cursor) if next_cursor else None,
+    })
+
+
+# ---------------- Appointment / prescription text ---------------- #
+@search_bp.route('/records')
+@mongo_budget(3)
+@login_required
+@roles_required('admin', 'doctor', 'receptionist')
+def records():
+    """
+    JSON: full-text search of appointment problems or prescription diagnoses, best match first.
+    Query args: scope (appointments | prescriptions), q, after, per_page. Doctors only see their own records.
+    """
+    scope = RECORD_SCOPES.get(request.args.get('scope', 'appointments'))
+    role = current_user.role.lower()
+    if scope is None or role not in scope['roles']:
+        return jsonify({'error': 'unknown or forbidden scope'}), 403
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'query': text, 'results': [], 'next': None})
+
+    query = {'doctor_id': ObjectId(current_user.get_id())} if role == 'doctor' else None
+    db = current_app.db
+    try:
+        found, next_cursor = search_records(db, request.args.get('scope', 'appointments'), text, query=query,
+                                            after=_cursor(), limit=_per_page(), projection=scope['fields'])
+    except OperationFailure as e:
+        # e.g. the text index has not been built yet
+        current_app.logger.warning("Text search failed: %s", e)
+        return jsonify({'error': 'search unavailable'}), 503
+
+    people = lookup_map(db.users, [d.get('patient_id') for d in found] + [d.get('doctor_id') for d in found],
+                        fields=['username', 'name'])
+
+    def person(oid):
+        doc = people.get(as_oid(oid)) or {}
+        return doc.get('name') or doc.get('username')
+
+    results = []
+    for d in found:
+        item = {k: d.get(k) for k in scope['fields'] if k not in ('doctor_id', 'patient_id')}
+        item.update(id=str(d['_id']), score=round(d['score'], 4),
+                    doctor=person(d.get('doctor_id')), patient=person(d.get('patient_id')))
+        results.append(item)
+    return jsonify({'query': text, 'results': results,
+                    'next': encode_cursor(next_cursor) if next_cursor else None})
@@ -13,9 +13,118 @@ class Config:
     # MongoDB URI (from your .env)
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/hospital_db')
 
+    # MongoClient pool, timeouts and wire compression (clients are created per worker process)
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zlib')
+    MONGO_APP_NAME = os.getenv('MONGO_APP_NAME', 'hospital-management')
+
     # Session lifetime
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
 
     # Flask environment and debug mode
     FLASK_ENV = os.getenv('FLASK_ENV', 'production')
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+
+    # Also create the indexes declared in backend/models/indexes.py when the app starts. Off by
+    # default: create_app then opens no connection, and deploys run `flask ensure-indexes`
+    ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', 'False').lower() == 'true'
+
+    # Flask-Login user_loader cache (per worker process)
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 4096))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+    # How often each worker checks for users written elsewhere (the most a role change lags)
+    USER_CACHE_CHECK_SECONDS = float(os.getenv('USER_CACHE_CHECK_SECONDS', 2))
+
+    # Seconds before the materialized admin dashboard counters are recomputed
+    STATS_MAX_AGE = int(os.getenv('STATS_MAX_AGE', 900))
+
+    # Length of a bookable appointment slot in minutes
+    APPOINTMENT_SLOT_MINUTES = int(os.getenv('APPOINTMENT_SLOT_MINUTES', 30))
+
+    # Availability search: default doctor hours ('HH:MM-HH:MM', overridable per doctor
+    # via profile.working_hours), how far ahead to search and how often workers reload
+    DOCTOR_WORKING_HOURS = os.getenv('DOCTOR_WORKING_HOURS', '09:00-17:00')
+    AVAILABILITY_HORIZON_DAYS = int(os.getenv('AVAILABILITY_HORIZON_DAYS', 14))
+    AVAILABILITY_REFRESH_SECONDS = int(os.getenv('AVAILABILITY_REFRESH_SECONDS', 60))
+    # How often a worker replays the bookings other workers published (see utils/slots.py)
+    AVAILABILITY_CHECK_SECONDS = float(os.getenv('AVAILABILITY_CHECK_SECONDS', 2))
+
+    # How often a worker checks the doctor directory version stamp
+    DOCTOR_DIRECTORY_CHECK_SECONDS = int(os.getenv('DOCTOR_DIRECTORY_CHECK_SECONDS', 5))
+
+    # Parallel dashboard reads: pool size per worker and per-request deadline (seconds).
+    # The pool defaults to request threads (GUNICORN_THREADS) x QUERY_FANOUT_WIDTH, the most reads
+    # one view fans out, so concurrent dashboards never wait for a pool thread
+    QUERY_FANOUT_WIDTH = int(os.getenv('QUERY_FANOUT_WIDTH', 5))
+    QUERY_FANOUT_WORKERS = int(os.getenv('QUERY_FANOUT_WORKERS',
+                                         int(os.getenv('GUNICORN_THREADS', 4)) * QUERY_FANOUT_WIDTH))
+    QUERY_FANOUT_TIMEOUT = float(os.getenv('QUERY_FANOUT_TIMEOUT', 5))
+
+    # bcrypt cost factor (existing hashes are upgraded on login) and the process pool
+    # that runs hashing off the request thread; 0 workers hashes inline
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS', 2))
+    PASSWORD_POOL_QUEUE = int(os.getenv('PASSWORD_POOL_QUEUE', 32))
+    PASSWORD_TIMEOUT = float(os.getenv('PASSWORD_TIMEOUT', 10))
+    # Retry-After (seconds) sent with the 503 when the password pool is busy or timed out
+    PASSWORD_RETRY_AFTER = int(os.getenv('PASSWORD_RETRY_AFTER', 2))
+
+    # Per-request Mongo tracing (Server-Timing header) and the Prometheus /metrics endpoint
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # Who may read /metrics: clients in these networks (comma-separated CIDRs, loopback by default;
+    # behind a proxy the client is the proxy) or presenting `Authorization: Bearer <METRICS_TOKEN>`
+    METRICS_ALLOWED_NETWORKS = os.getenv('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # Slow-query recorder: commands slower than SLOW_QUERY_MS (0 disables) go to the capped
+    # `slow_queries` collection; a sample of slow reads is explained, once per shape per interval
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE', 0.1))
+    SLOW_QUERY_EXPLAIN_INTERVAL = int(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL', 300))
+    SLOW_QUERY_CAP_BYTES = int(os.getenv('SLOW_QUERY_CAP_BYTES', 16 * 1024 * 1024))
+
+    # Per-user rendered page cache (per worker): memory bound, max entry age, and the release
+    # id mixed into ETags (derived from the source files' mtimes when unset)
+    FRAGMENT_CACHE_BYTES = int(os.getenv('FRAGMENT_CACHE_BYTES', 32 * 1024 * 1024))
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 300))
+    CACHE_RELEASE = os.getenv('CACHE_RELEASE')
+
+    # Output of `flask build-assets` (hashed, precompressed static files and image variants)
+    # and the widths rendered for responsive images
+    ASSET_BUILD_DIR = os.getenv('ASSET_BUILD_DIR', os.path.join(basedir, 'frontend', 'build'))
+    ASSET_IMAGE_WIDTHS = [int(w) for w in os.getenv('ASSET_IMAGE_WIDTHS', '480,960,1600').split(',') if w.strip()]
+    # Earlier builds whose hashed files each build keeps servable (for pages rendered before a deploy)
+    ASSET_KEEP_BUILDS = int(os.getenv('ASSET_KEEP_BUILDS', 2))
+
+    # Response compression middleware: bodies of these types from COMPRESSION_MIN_SIZE bytes
+    # up are gzipped at COMPRESSION_LEVEL (1-9), or brotli'd when the package is installed
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_LEVEL = int(os.getenv('COMPRESSION_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    COMPRESSION_MIMETYPES = [m.strip() for m in os.getenv(
+        'COMPRESSION_MIMETYPES',
+        'text/html,text/css,text/plain,text/csv,text/javascript,application/javascript,'
+        'application/json,application/x-ndjson,image/svg+xml'
+    ).split(',') if m.strip()]
+
+    # Report files: 'disk' (under REPORT_STORAGE_DIR, served with sendfile) or 'gridfs', and the upload size cap
+    REPORT_STORAGE = os.getenv('REPORT_STORAGE', 'disk')
+    REPORT_STORAGE_DIR = os.getenv('REPORT_STORAGE_DIR', os.path.join(basedir, 'instance', 'reports'))
+    REPORT_MAX_BYTES = int(os.getenv('REPORT_MAX_BYTES', 100 * 1024 * 1024))
+
+    # Terminal ingestion (/entries/ingest): 'name:token' pairs, how long entries are kept,
+    # per-request limits, and the per-worker write buffer (events) drained in BATCH_SIZE inserts
+    ENTRY_INGEST_TOKENS = os.getenv('ENTRY_INGEST_TOKENS', '')
+    ENTRY_TTL_SECONDS = int(os.getenv('ENTRY_TTL_SECONDS', 90 * 24 * 3600))
+    ENTRY_MAX_BATCH = int(os.getenv('ENTRY_MAX_BATCH', 5000))
+    ENTRY_MAX_BYTES = int(os.getenv('ENTRY_MAX_BYTES', 4 * 1024 * 1024))
+    ENTRY_BUFFER_SIZE = int(os.getenv('ENTRY_BUFFER_SIZE', 50000))
+    ENTRY_BATCH_SIZE = int(os.getenv('ENTRY_BATCH_SIZE', 1000))
+    ENTRY_FLUSH_INTERVAL = float(os.getenv('ENTRY_FLUSH_INTERVAL', 0.2))
+    ENTRY_RETRY_AFTER = int(os.getenv('ENTRY_RETRY_AFTER', 2))
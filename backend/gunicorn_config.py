@@ -1,5 +1,47 @@
-bind = "0.0.0.0:8000"
-workers = 4
-timeout = 120
+import multiprocessing
+import os
+
+# Worker model: "gthread" (default), "gevent" (needs the gevent package) or "sync".
+# Sizing follows the CPU count unless GUNICORN_WORKERS / GUNICORN_THREADS are set.
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+_cpus = multiprocessing.cpu_count()
+if worker_class == "sync":
+    _default_workers = _cpus * 2 + 1
+else:
+    # threads/greenlets provide the concurrency; one process per core
+    _default_workers = _cpus + 1
+workers = int(os.getenv("GUNICORN_WORKERS", _default_workers))
+threads = int(os.getenv("GUNICORN_THREADS", 4 if worker_class == "gthread" else 1))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))  # gevent only
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+# time given to in-flight requests after SIGTERM before the worker is killed
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
 accesslog = "-"
 errorlog = "-"
+
+
+def when_ready(server):
+    # With preload_app the master may have opened a MongoClient (e.g. index bootstrap);
+    # close it before workers fork so no sockets are shared.
+    from backend.utils.mongo import close_all
+    close_all()
+
+
+def post_fork(server, worker):
+    from backend.utils.mongo import reset_after_fork
+    reset_after_fork()
+
+
+def worker_exit(server, worker):
+    # Runs after the worker stopped accepting and finished in-flight requests.
+    app = getattr(worker, "wsgi", None)
+    shutdown = getattr(app, "shutdown", None)
+    if callable(shutdown):
+        shutdown()
@@ -0,0 +1,176 @@
+# Declarative index registry.
+# Every query shape the blueprints rely on is listed here together with the
+# index that serves it, so indexes can be (re)applied idempotently and verified.
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from bson.objectid import ObjectId
+import datetime
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        # keyset pagination sorts on (field, _id); role prefix also serves role counts
+        IndexModel([("username", ASCENDING), ("_id", ASCENDING)], name="username_id"),
+        IndexModel([("role", ASCENDING), ("username", ASCENDING), ("_id", ASCENDING)], name="role_username_id"),
+        IndexModel([("email", ASCENDING), ("_id", ASCENDING)], name="email_id"),
+        # prefix search over normalized keys (backend/utils/search.py), scanned in index order
+        IndexModel([("search_keys", ASCENDING), ("_id", ASCENDING)], name="search_keys"),
+        IndexModel([("role", ASCENDING), ("search_keys", ASCENDING), ("_id", ASCENDING)], name="role_search_keys"),
+    ],
+    "patients": [
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "appointments": [
+        IndexModel([("doctor_id", ASCENDING), ("status", ASCENDING)], name="doctor_status"),
+        IndexModel([("doctor_id", ASCENDING), ("datetime", ASCENDING)], name="doctor_datetime"),
+        # newest-first per patient for the timeline; the prefix serves plain patient_id lookups
+        IndexModel([("patient_id", ASCENDING), ("datetime", DESCENDING), ("_id", DESCENDING)], name="patient_datetime"),
+        IndexModel([("problem", TEXT)], name="problem_text"),
+    ],
+    "prescriptions": [
+        IndexModel([("patient_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="patient_created"),
+        IndexModel([("doctor_id", ASCENDING), ("created_at", DESCENDING)], name="doctor_created"),
+        IndexModel([("diagnosis", TEXT), ("medicines", TEXT)], name="diagnosis_text",
+                   weights={"diagnosis": 3, "medicines": 1}),
+    ],
+    "slot_reservations": [
+        # uniqueness comes from the compound _id; this serves per-doctor range scans
+        IndexModel([("doctor_id", ASCENDING), ("start", ASCENDING)], name="doctor_start"),
+    ],
+    "billing": [
+        IndexModel([("patient_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="patient_date"),
+        # watermark scan and month regrouping for the revenue rollups
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel([("status", ASCENDING), ("paid_at", ASCENDING)], name="status_paid_at"),
+    ],
+    "revenue_monthly": [
+        # required by the $merge `on` fields
+        IndexModel([("by", ASCENDING), ("key", ASCENDING), ("month", ASCENDING)], name="by_key_month", unique=True),
+    ],
+    "reports": [
+        IndexModel([("patient_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="patient_created"),
+    ],
+    "report_files.files": [
+        # one GridFS file per content hash (pending uploads have no hash yet)
+        IndexModel([("metadata.sha256", ASCENDING)], name="sha256_unique", unique=True,
+                   partialFilterExpression={"metadata.sha256": {"$exists": True}}),
+    ],
+    "nurse_schedule": [
+        IndexModel([("nurse_id", ASCENDING)], name="nurse_id"),
+    ],
+    "nurse_assignments": [
+        IndexModel([("nurse_id", ASCENDING)], name="nurse_id"),
+    ],
+    "leave_requests": [
+        IndexModel([("nurse_id", ASCENDING)], name="nurse_id"),
+    ],
+    "salaries": [
+        IndexModel([("nurse_id", ASCENDING)], name="nurse_id"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "schedules": [
+        # one (field, _id) index per sortable column of the receptionist pages, and
+        # (filter, date, _id) for the default date order under each filter
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="date"),
+        IndexModel([("doctor", ASCENDING), ("_id", ASCENDING)], name="doctor_id"),
+        IndexModel([("patient", ASCENDING), ("_id", ASCENDING)], name="patient_id"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="status_id"),
+        IndexModel([("status", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="status_date"),
+        IndexModel([("doctor", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="doctor_date"),
+    ],
+    "calllogs": [
+        IndexModel([("caller_name", ASCENDING), ("_id", ASCENDING)], name="caller_name"),
+        IndexModel([("phone", ASCENDING), ("_id", ASCENDING)], name="phone"),
+    ],
+    "entries": [
+        # time-window listing, newest first, keyset-paginated on (timestamp, _id)
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+    ],
+}
+
+# (collection, filter, sort) for the hot queries issued by the blueprints.
+# Values are placeholders; only the shape matters for explain().
+_OID = ObjectId("000000000000000000000000")
+_EPOCH = datetime.datetime(2000, 1, 1)
+QUERY_SHAPES = [
+    ("users", {"username": "x"}, None),
+    ("users", {"role": "doctor"}, None),
+    ("patients", {"user_id": _OID}, None),
+    ("appointments", {"doctor_id": _OID, "status": "accepted"}, None),
+    ("appointments", {"doctor_id": _OID}, [("datetime", ASCENDING)]),
+    ("appointments", {"patient_id": _OID}, None),
+    ("prescriptions", {"patient_id": _OID}, None),
+    ("prescriptions", {"doctor_id": _OID}, [("created_at", DESCENDING)]),
+    ("billing", {"patient_id": _OID}, None),
+    ("billing", {"updated_at": {"$gt": _EPOCH}}, None),
+    ("revenue_monthly", {"by": "total", "key": "all"}, [("month", ASCENDING)]),
+    ("reports", {"patient_id": _OID}, None),
+    ("nurse_schedule", {"nurse_id": "x"}, None),
+    ("nurse_assignments", {"nurse_id": "x"}, None),
+    ("leave_requests", {"nurse_id": "x"}, None),
+    ("users", {}, [("username", ASCENDING), ("_id", ASCENDING)]),
+    ("users", {"role": "doctor"}, [("username", ASCENDING), ("_id", ASCENDING)]),
+    ("schedules", {}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("schedules", {"status": "pending"}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("schedules", {"doctor": "x"}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("schedules", {}, [("doctor", ASCENDING), ("_id", ASCENDING)]),
+    ("schedules", {}, [("patient", ASCENDING), ("_id", ASCENDING)]),
+    ("schedules", {}, [("status", ASCENDING), ("_id", ASCENDING)]),
+    ("calllogs", {}, [("caller_name", ASCENDING), ("_id", ASCENDING)]),
+    ("calllogs", {}, [("phone", ASCENDING), ("_id", ASCENDING)]),
+    ("entries", {"timestamp": {"$gte": _EPOCH, "$lt": _EPOCH}}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("appointments", {"patient_id": _OID}, [("datetime", DESCENDING), ("_id", DESCENDING)]),
+    ("prescriptions", {"patient_id": _OID}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("billing", {"patient_id": _OID}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    ("reports", {"patient_id": _OID}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("users", {"search_keys": {"$elemMatch": {"$gte": "x", "$lt": "y"}}}, None),
+    ("users", {"role": "patient", "search_keys": {"$elemMatch": {"$gte": "x", "$lt": "y"}}}, None),
+    ("appointments", {"$text": {"$search": "x"}}, None),
+    ("prescriptions", {"$text": {"$search": "x"}}, None),
+]
+
+
+def ensure_indexes(db, logger=None):
+    """
+    Create every registered index. create_indexes is a no-op for indexes that already exist,
+    so this is safe to re-run.
+    Returns a list of (collection, error) for indexes that could not be built.
+    """
+    failures = []
+    for name, models in INDEXES.items():
+        try:
+            db[name].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate usernames blocking the unique index
+            failures.append((name, str(e)))
+            if logger:
+                logger.warning("Index creation failed on %s: %s", name, e)
+    return failures
+
+
+def _stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_indexes(db):
+    """
+    Run explain() on each registered query shape.
+    Returns a list of (collection, filter, sort) shapes whose winning plan is a COLLSCAN.
+    """
+    offenders = []
+    for name, query, sort in QUERY_SHAPES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _stages(plan):
+            offenders.append((name, query, sort))
+    return offenders
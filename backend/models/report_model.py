@@ -1,7 +1,12 @@
 REPORT_SCHEMA = {
     "patient_id": "ObjectId",
     "type": "string",
-    "file_ref": "string (path or url)",
+    "file_ref": "string (sha256 of the stored file, see backend/utils/report_storage.py)",
+    "storage": "string ('disk' or 'gridfs')",
+    "filename": "string",
+    "content_type": "string",
+    "size": "int",
+    "uploaded_by": "ObjectId",
     "created_at": "datetime",
     "notes": "string"
 }
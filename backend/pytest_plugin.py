@@ -0,0 +1,71 @@
+"""
+pytest plugin: Mongo round-trip budgets for the blueprint endpoints.
+
+Enable it with ``pytest -p backend.pytest_plugin`` or ``pytest_plugins = ['backend.pytest_plugin']``
+in a conftest. Tests then use the ``budget_client`` fixture, a Flask test client that fails the
+test (BudgetExceeded) as soon as a request issues more Mongo commands than its view's
+@mongo_budget allows. Runs against the mongomock stand-in by default, or against a throwaway
+database on a real server with ``--mongo-uri`` / ``TEST_MONGO_URI``.
+
+    def test_doctor_dashboard(budget_client, login):
+        login(budget_client, 'doctor0', 'doctor')
+        budget_client.get('/doctor/')
+"""
+import os
+import pytest
+from backend.utils.query_budget import build_app
+
+_observed = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('mongo-budget')
+    group.addoption('--mongo-uri', default=os.getenv('TEST_MONGO_URI'),
+                    help='run budget checks against this server instead of the mongomock stand-in')
+    group.addoption('--mongo-budget-report', action='store_true',
+                    help='print the most Mongo commands seen per endpoint')
+
+
+@pytest.fixture
+def mongo_budgets():
+    """Override or add per-endpoint budgets: {endpoint: max commands}."""
+    return {}
+
+
+@pytest.fixture
+def budget_app(request, mongo_budgets):
+    uri = request.config.getoption('mongo_uri')
+    if not uri:
+        pytest.importorskip('mongomock')
+    app = build_app(uri, observed=_observed, budgets=mongo_budgets)
+    yield app
+    if uri:
+        app.mongo.client.drop_database(app.mongo.db.name)
+    app.shutdown()
+
+
+@pytest.fixture
+def budget_db(budget_app):
+    """The app's database, for seeding (e.g. with backend.utils.datagen)."""
+    return budget_app.db
+
+
+@pytest.fixture
+def budget_client(budget_app):
+    return budget_app.test_client()
+
+
+@pytest.fixture
+def login():
+    def do_login(client, username, role, password='password123'):
+        resp = client.post('/login', data={'username': username, 'password': password, 'expected_role': role})
+        assert resp.status_code == 302, f'login failed for {username}'
+    return do_login
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not config.getoption('mongo_budget_report') or not _observed:
+        return
+    terminalreporter.section('Mongo commands per request (max seen)')
+    for endpoint, count in sorted(_observed.items()):
+        terminalreporter.write_line(f'{endpoint:45} {count}')
@@ -0,0 +1,297 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+from flask import request, send_file, url_for
+from markupsafe import Markup, escape
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is produced without it
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: no image variants without Pillow
+    Image = None
+
+# Static asset pipeline.
+# `build()` copies frontend/static into the build directory under content-hashed names
+# (css/main.css -> css/main.3f2a9c1b7d0e.css), writes .gz/.br siblings for text assets and
+# WebP/AVIF width variants for raster images, and records it all in manifest.json.
+# Stylesheets are built last, with their relative url() references rewritten to the hashed
+# names (so a stylesheet's hash also changes with the assets it references). The build is
+# written to a temporary sibling directory and swapped in by rename once complete, so the
+# server never sees a half-written build directory. The hashed files of the previous
+# `keep` builds are carried into each new build (listed in generations.json), so pages
+# rendered or cached before a deploy can still load what they reference; older ones are pruned.
+# At runtime `StaticAssets` rewrites url_for('static', ...) to the hashed name and serves
+# hashed files with a one-year immutable Cache-Control, picking the best precompressed
+# sibling the client accepts. Without a manifest everything falls back to plain static files.
+MANIFEST = 'manifest.json'
+GENERATIONS = 'generations.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+RASTER = ('.jpg', '.jpeg', '.png')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# (Accept-Encoding token, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(65536), b''):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _rewrite_css_urls(css, rel, manifest):
+    """Point relative url() references of stylesheet `rel` at their hashed names in `manifest`."""
+    base = posixpath.dirname(rel)
+
+    def hashed(match):
+        quote, target = match.group(1), match.group(2).strip()
+        if target.startswith(('/', '#', 'data:')) or '://' in target:
+            return match.group(0)
+        path, suffix = target, ''
+        cut = re.search(r'[?#]', target)
+        if cut:
+            path, suffix = target[:cut.start()], target[cut.start():]
+        entry = manifest.get(posixpath.normpath(posixpath.join(base, path)))
+        if entry is None:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(entry['path'], base or '.')}{suffix}{quote})"
+    return _CSS_URL.sub(hashed, css)
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return default
+
+
+def _servable(manifest):
+    """Every servable build file of `manifest` -> its encodings (variants are served as-is)."""
+    files = {}
+    for entry in manifest.values():
+        files[entry['path']] = entry['encodings']
+        for variant in entry['variants']:
+            files[variant['path']] = []
+    return files
+
+
+def _hashed_name(rel, digest, suffix=None):
+    stem, ext = os.path.splitext(rel)
+    return f'{stem}.{digest}{suffix or ext}'
+
+
+def _precompress(path):
+    """Write .gz (and .br) next to `path` when they are smaller; returns the encodings written."""
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    written = []
+    # mtime=0 keeps the output byte-identical across builds
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        with open(path + '.gz', 'wb') as fh:
+            fh.write(gz)
+        written.append('gzip')
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            with open(path + '.br', 'wb') as fh:
+                fh.write(br)
+            written.append('br')
+    return written
+
+
+def _image_variants(src, out_dir, rel, digest, widths, quality):
+    """WebP/AVIF renditions at each width below the original (plus the original width)."""
+    if Image is None:
+        return []
+    variants = []
+    try:
+        img = Image.open(src)
+        img.load()
+    except OSError:
+        return []  # not an image Pillow can decode
+    with img:
+        full = img.width
+        for width in sorted({w for w in widths if w < full} | {full}):
+            resized = img if width == full else img.resize((width, round(img.height * width / full)), Image.LANCZOS)
+            if resized.mode not in ('RGB', 'RGBA'):
+                resized = resized.convert('RGBA' if 'transparency' in img.info else 'RGB')
+            for fmt, ext in (('WEBP', '.webp'), ('AVIF', '.avif')):
+                name = _hashed_name(rel, digest, f'.{width}w{ext}')
+                try:
+                    resized.save(os.path.join(out_dir, name), fmt, quality=quality)
+                except (KeyError, OSError, ValueError):
+                    continue  # this Pillow build has no encoder for fmt
+                variants.append({'width': width, 'type': f'image/{ext[1:]}', 'path': name})
+    return variants
+
+
+def build(static_dir, out_dir, widths=(480, 960, 1600), quality=75, keep=2):
+    """
+    Build hashed, precompressed assets and image variants into `out_dir`; returns the manifest.
+    Files of the previous `keep` builds found in `out_dir` stay servable.
+    """
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.assets-', dir=parent)
+    try:
+        manifest = _build_into(static_dir, staging, widths, quality)
+        _carry_forward(out_dir, staging, manifest, keep)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    os.chmod(staging, 0o755)  # mkdtemp creates it private
+    _swap(staging, out_dir)
+    return manifest
+
+
+def _swap(staging, out_dir):
+    """Put the finished `staging` directory in place of `out_dir` by renames only."""
+    previous = None
+    if os.path.isdir(out_dir):
+        previous = tempfile.mkdtemp(prefix='.assets-old-', dir=os.path.dirname(os.path.abspath(out_dir)))
+        os.rename(out_dir, os.path.join(previous, 'build'))
+    os.rename(staging, out_dir)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def _carry_forward(out_dir, staging, manifest, keep):
+    """Copy the files of up to `keep` earlier builds from `out_dir` into `staging` and record them."""
+    earlier = _read_json(os.path.join(out_dir, GENERATIONS), None)
+    if earlier is None:  # built before generations were recorded: only its manifest is known
+        old = _read_json(os.path.join(out_dir, MANIFEST), {})
+        earlier = [_servable(old)] if old else []
+    generations = [_servable(manifest)]
+    for files in earlier[:keep]:
+        kept = {}
+        for path, encodings in files.items():
+            names = [path] + [path + suffix for token, suffix in ENCODINGS if token in encodings]
+            if not all(os.path.isfile(os.path.join(out_dir, name)) for name in names):
+                continue
+            for name in names:
+                dest = os.path.join(staging, name)
+                if not os.path.exists(dest):
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    shutil.copy2(os.path.join(out_dir, name), dest)
+            kept[path] = encodings
+        generations.append(kept)
+    with open(os.path.join(staging, GENERATIONS), 'w') as fh:
+        json.dump(generations, fh, indent=2, sort_keys=True)
+
+
+def _build_into(static_dir, out_dir, widths, quality):
+    sources = []
+    for dirpath, _, filenames in os.walk(static_dir):
+        for filename in sorted(filenames):
+            src = os.path.join(dirpath, filename)
+            sources.append((os.path.relpath(src, static_dir).replace(os.sep, '/'), src))
+    # stylesheets last, so the assets they reference already have hashed names
+    sources.sort(key=lambda item: (item[0].lower().endswith('.css'), item[0]))
+
+    manifest = {}
+    for rel, src in sources:
+        ext = os.path.splitext(rel)[1].lower()
+        if ext == '.css':
+            with open(src, encoding='utf-8') as fh:
+                data = _rewrite_css_urls(fh.read(), rel, manifest).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:12]
+        else:
+            data, digest = None, _digest(src)
+        hashed = _hashed_name(rel, digest)
+        dest = os.path.join(out_dir, hashed)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if data is None:
+            shutil.copy2(src, dest)
+        else:
+            with open(dest, 'wb') as fh:
+                fh.write(data)
+        entry = {'path': hashed, 'size': os.path.getsize(dest), 'encodings': [], 'variants': []}
+        if ext in COMPRESSIBLE:
+            entry['encodings'] = _precompress(dest)
+        elif ext in RASTER:
+            entry['variants'] = _image_variants(src, out_dir, rel, digest, widths, quality)
+        manifest[rel] = entry
+    with open(os.path.join(out_dir, MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.manifest = {}
+        self.digest = ''
+        self._built = {}
+        self.reload()
+
+    def reload(self):
+        self.manifest = _read_json(os.path.join(self.build_dir, MANIFEST), {})
+        # names the hashed URLs pages are rendered with, for their cache keys and ETags
+        self.digest = hashlib.sha1(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()[:8] \
+            if self.manifest else ''
+        # servable build files -> encodings, the current build's overriding the carried ones
+        self._built = {}
+        for files in reversed(_read_json(os.path.join(self.build_dir, GENERATIONS), [])):
+            self._built.update(files)
+        self._built.update(_servable(self.manifest))
+
+    def init_app(self, app):
+        app.assets = self
+
+        @app.url_defaults
+        def hashed_static_url(endpoint, values):
+            if endpoint == 'static' and 'filename' in values:
+                entry = self.manifest.get(values['filename'])
+                if entry:
+                    values['filename'] = entry['path']
+
+        app.add_template_global(self.picture, 'static_picture')
+
+    def serves(self, filename):
+        return filename in self._built
+
+    def send(self, filename):
+        """Serve a built file, precompressed when the client accepts it, cached for a year."""
+        path = os.path.join(self.build_dir, filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for token, suffix in ENCODINGS:
+            if token in self._built[filename] and token in request.accept_encodings:
+                path, encoding = path + suffix, token
+                break
+        response = send_file(path, mimetype=mimetype, max_age=31536000, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def picture(self, filename, alt='', sizes='100vw', **attrs):
+        """<picture> with AVIF/WebP srcsets for a raster image, falling back to the original."""
+        entry = self.manifest.get(filename) or {}
+        sources = []
+        for mime in ('image/avif', 'image/webp'):
+            srcset = ', '.join(f"{url_for('static', filename=v['path'])} {v['width']}w"
+                               for v in entry.get('variants', []) if v['type'] == mime)
+            if srcset:
+                sources.append(f'<source type="{mime}" srcset="{srcset}" sizes="{escape(sizes)}">')
+        # class_='x' -> class="x", data_id='1' -> data-id="1"
+        extra = ''.join(f' {escape(k.rstrip("_").replace("_", "-"))}="{escape(v)}"' for k, v in attrs.items())
+        img = f'<img src="{url_for("static", filename=filename)}" alt="{escape(alt)}"{extra}>'
+        return Markup(f'<picture>{"".join(sources)}{img}</picture>')
@@ -0,0 +1,235 @@
+import bisect
+import datetime
+import heapq
+import os
+import re
+import threading
+import time
+from .slots import VERSION_ID
+
+# In-memory availability index used to answer "next N free slots for a specialty".
+# Per process. The first request builds it from the doctors and slot_reservations
+# collections (concurrent first requests wait for that one build). After that, a background
+# thread keeps it current, and requests only read it:
+#  - every `check_seconds` it replays the reservation changes other workers published
+#    to `cache_versions` (see slots.record_slot_change). Bookings handled here are applied
+#    at once.
+#  - every `refresh_seconds`, or when it fell too far behind the change log, it rebuilds
+#    a new snapshot while requests keep reading the previous one.
+# Slot reservations stay the source of truth, so a stale index can at worst
+# suggest a slot that the atomic booking then rejects.
+
+
+def specialty_key(value):
+    """Normalize a specialty so 'Cardiologist', 'Cardiology' and 'cardiology ' compare equal."""
+    key = re.sub(r'[^a-z]', '', (value or '').lower())
+    for suffix in ('ist', 'y'):
+        if key.endswith(suffix):
+            return key[:-len(suffix)]
+    return key
+
+
+def parse_hours(value, default):
+    """Parse 'HH:MM-HH:MM' into a (start, end) pair of datetime.time."""
+    try:
+        start, end = (datetime.datetime.strptime(p.strip(), '%H:%M').time() for p in value.split('-'))
+        if start < end:
+            return start, end
+    except Exception:
+        pass
+    return default
+
+
+def doctor_display_name(doc):
+    profile = doc.get('profile') or {}
+    if profile.get('first_name'):
+        return f"{profile.get('first_name', '')} {profile.get('last_name', '')}".strip()
+    return doc.get('name') or doc.get('username') or 'Unknown Doctor'
+
+
+class DoctorCalendar:
+    """Working hours plus a sorted list of booked slot starts for one doctor."""
+    __slots__ = ('doctor_id', 'name', 'specialty', 'hours', 'booked')
+
+    def __init__(self, doctor_id, name, specialty, hours):
+        self.doctor_id = doctor_id
+        self.name = name
+        self.specialty = specialty
+        self.hours = hours
+        self.booked = []
+
+    def book(self, start):
+        i = bisect.bisect_left(self.booked, start)
+        if i == len(self.booked) or self.booked[i] != start:
+            self.booked.insert(i, start)
+
+    def release(self, start):
+        i = bisect.bisect_left(self.booked, start)
+        if i < len(self.booked) and self.booked[i] == start:
+            del self.booked[i]
+
+    def free_slots(self, after, slot, until):
+        """Yield free slot starts >= `after` within working hours, in order, up to `until`."""
+        day = after.date()
+        while True:
+            opens = datetime.datetime.combine(day, self.hours[0])
+            closes = datetime.datetime.combine(day, self.hours[1])
+            if opens > until:
+                return
+            # first slot at or after max(opens, after), aligned to midnight like slot_start()
+            midnight = datetime.datetime.combine(day, datetime.time())
+            t = midnight + -(-(max(opens, after) - midnight) // slot) * slot
+            i = bisect.bisect_left(self.booked, t)
+            while t + slot <= closes and t <= until:
+                if i < len(self.booked) and self.booked[i] == t:
+                    i += 1
+                else:
+                    yield t
+                t += slot
+                while i < len(self.booked) and self.booked[i] < t:
+                    i += 1
+            day += datetime.timedelta(days=1)
+
+
+def _tagged(slots, order, cal):
+    # (start, tiebreak, calendar) so heapq.merge never compares calendars
+    for start in slots:
+        yield start, order, cal
+
+
+class AvailabilityIndex:
+    def __init__(self, slot_minutes, default_hours, horizon_days=14, refresh_seconds=60,
+                 get_db=None, check_seconds=2, logger=None):
+        self.slot = datetime.timedelta(minutes=slot_minutes)
+        self.default_hours = default_hours
+        self.horizon = datetime.timedelta(days=horizon_days)
+        self.refresh_seconds = refresh_seconds
+        self.get_db = get_db
+        self.check_seconds = check_seconds
+        self.logger = logger
+        self._doctors = {}
+        self._by_specialty = {}
+        self._built_at = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    def rebuild(self, db, now=None):
+        """Reload doctors and every future reservation (three queries) into a new snapshot."""
+        # appointment datetimes are naive local times as entered on the booking form
+        now = now or datetime.datetime.now()
+        # version read first: changes racing with the load are replayed again, harmlessly
+        doc = db.cache_versions.find_one({'_id': VERSION_ID}, {'version': 1})
+        version = doc.get('version', 0) if doc else 0
+        doctors = {}
+        by_specialty = {}
+        for d in db.users.find({'role': 'doctor'}, {'username': 1, 'name': 1, 'profile': 1, 'specialization': 1}):
+            profile = d.get('profile') or {}
+            specialty = profile.get('specialty') or d.get('specialization') or ''
+            hours = parse_hours(profile.get('working_hours') or '', self.default_hours)
+            cal = DoctorCalendar(d['_id'], doctor_display_name(d), specialty, hours)
+            doctors[d['_id']] = cal
+            by_specialty.setdefault(specialty_key(specialty), []).append(cal)
+
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for r in db.slot_reservations.find({'start': {'$gte': today}}, {'doctor_id': 1, 'start': 1}).sort('start', 1):
+            cal = doctors.get(r.get('doctor_id'))
+            if cal is not None:
+                cal.booked.append(r['start'])
+
+        with self._lock:
+            self._doctors = doctors
+            self._by_specialty = by_specialty
+            self._built_at = time.monotonic()
+            self._version = version
+
+    def ensure_fresh(self, db):
+        """Build the first snapshot (once per process) and make sure the watcher keeps it current."""
+        if self._built_at is None:
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild(db)
+        self._ensure_watcher()
+
+    def apply_changes(self, doc):
+        """
+        Replay the reservation changes published since the last look.
+        False when they are no longer all in the log (or the counter was reset): rebuild instead.
+        """
+        version = doc.get('version', 0) if doc else 0
+        recent = doc.get('recent', []) if doc else []
+        with self._lock:
+            behind = version - self._version if self._version is not None else None
+            if behind is None or behind < 0 or behind > len(recent):
+                return False
+            for change in recent[len(recent) - behind:]:
+                cal = self._doctors.get(change.get('doctor_id'))
+                if cal is not None:
+                    (cal.book if change.get('booked') else cal.release)(change['start'])
+            self._version = version
+        return True
+
+    # ---- watcher (background thread) ----
+    def _ensure_watcher(self):
+        if self.get_db is None or (self._watcher is not None and self._watcher_pid == os.getpid()):
+            return
+        with self._build_lock:
+            if self._watcher is None or self._watcher_pid != os.getpid():
+                # a forked child inherits the snapshot but not the thread
+                self._stop = threading.Event()
+                self._watcher_pid = os.getpid()
+                self._watcher = threading.Thread(target=self._watch, name='availability-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                db = self.get_db()
+                stale = time.monotonic() - self._built_at > self.refresh_seconds
+                if stale or not self.apply_changes(db.cache_versions.find_one({'_id': VERSION_ID})):
+                    self.rebuild(db)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning("Availability index refresh failed: %s", e)
+
+    def stop(self, timeout=5):
+        watcher = self._watcher
+        if watcher is not None and self._watcher_pid == os.getpid():
+            self._stop.set()
+            watcher.join(timeout)
+        self._watcher = self._watcher_pid = None
+
+    def book(self, doctor_id, start):
+        with self._lock:
+            cal = self._doctors.get(doctor_id)
+            if cal is not None:
+                cal.book(start)
+
+    def release(self, doctor_id, start):
+        with self._lock:
+            cal = self._doctors.get(doctor_id)
+            if cal is not None:
+                cal.release(start)
+
+    def next_free(self, specialty, after, n=5):
+        """
+        Earliest `n` free slots across all doctors of `specialty` (any doctor if empty),
+        merged in time order: [(start, DoctorCalendar)].
+        """
+        with self._lock:
+            if specialty:
+                calendars = list(self._by_specialty.get(specialty_key(specialty), []))
+            else:
+                calendars = list(self._doctors.values())
+            until = after + self.horizon
+            streams = [_tagged(cal.free_slots(after, self.slot, until), i, cal)
+                       for i, cal in enumerate(calendars)]
+            result = []
+            for start, _, cal in heapq.merge(*streams):
+                result.append((start, cal))
+                if len(result) >= n:
+                    break
+            return result
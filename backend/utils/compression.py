@@ -0,0 +1,184 @@
+import itertools
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Streaming response compression (WSGI middleware).
+# Responses whose type is allow-listed and whose body reaches `min_size` bytes are
+# compressed chunk by chunk as the app yields them, with brotli when the client accepts
+# it and the package is installed, otherwise gzip. Bodies without a Content-Length are
+# buffered only until `min_size` is reached, so streamed exports stay streamed.
+# Responses already encoded, partial (206), bodiless, or marked no-transform pass through:
+# the app's iterable is returned as is, so file wrappers still reach the server's sendfile.
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml',
+)
+
+
+def accepted_encoding(header):
+    """'br' or 'gzip' when the Accept-Encoding header allows it (q=0 refuses), else None."""
+    accepted = {}
+    for part in (header or '').split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    for name in (('br',) if brotli is not None else ()) + ('gzip',):
+        if accepted.get(name, accepted.get('*', 0)) > 0:
+            return name
+    return None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._z = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._z.process(data)
+
+    def finish(self):
+        return self._z.finish()
+
+
+def encoder(encoding, level=6, brotli_quality=4):
+    return _Brotli(brotli_quality) if encoding == 'br' else _Gzip(level)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=1024, level=6, brotli_quality=4, mimetypes=DEFAULT_MIMETYPES):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+
+    def _compressible(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not status.startswith('200'):
+            return False
+        names = {k.lower(): v for k, v in headers}
+        mimetype = names.get('content-type', '').split(';')[0].strip().lower()
+        if mimetype not in self.mimetypes or 'content-encoding' in names:
+            return False
+        if 'no-transform' in names.get('cache-control', ''):
+            return False
+        length = names.get('content-length')
+        return length is None or not length.isdigit() or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = accepted_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+        state = {}
+
+        def capture(status, headers, exc_info=None):
+            if exc_info and state.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            state.update(status=status, headers=list(headers), exc_info=exc_info)
+            return state.setdefault('written', []).append
+
+        body = self.app(environ, capture)
+        try:
+            return self._respond(environ, start_response, encoding, state, body)
+        except BaseException:
+            _close(body)
+            raise
+
+    def _respond(self, environ, start_response, encoding, state, body):
+        pending = list(state.get('written', ()))
+        chunks = None
+        if 'status' not in state:  # start_response is allowed to wait for the first chunk
+            chunks = iter(body)
+            first = next(chunks, None)
+            if first is not None:
+                pending.append(first)
+        status, headers = state['status'], state['headers']
+        vary = [v for k, v in headers if k.lower() == 'vary']
+        typed = self._compressible(environ, status, headers)
+        if typed and not any('accept-encoding' in v.lower() or v.strip() == '*' for v in vary):
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        if encoding is None or not typed:
+            state['sent'] = True
+            start_response(status, headers, state['exc_info'])
+            if chunks is None and not pending:
+                # the app's own iterable, so wsgi.file_wrapper / sendfile keeps working
+                return body
+            return _Body(body, pending, chunks if chunks is not None else body)
+
+        # hold back output until we know the body is worth compressing
+        if chunks is None:
+            chunks = iter(body)
+        size = sum(len(c) for c in pending)
+        length = {k.lower(): v for k, v in headers}.get('content-length', '')
+        if length.isdigit():
+            size = int(length)  # _compressible already found it large enough
+        while size < self.min_size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                state['sent'] = True
+                start_response(status, headers, state['exc_info'])
+                return _Body(body, pending, ())
+            pending.append(chunk)
+            size += len(chunk)
+
+        headers = [(k, v) for k, v in headers if k.lower() != 'content-length']
+        headers = [(k, _weaken(v) if k.lower() == 'etag' else v) for k, v in headers]
+        headers.append(('Content-Encoding', encoding))
+        state['sent'] = True
+        start_response(status, headers, state['exc_info'])
+        return _Body(body, pending, chunks, encoder(encoding, self.level, self.brotli_quality))
+
+
+class _Body:
+    """
+    Response iterable for everything but a plain pass-through: the chunks already read,
+    then the rest of the app's body, compressed when given an encoder. close() reaches the
+    app's body even when the server never starts iterating.
+    """
+    def __init__(self, body, head, rest, z=None):
+        self._body = body
+        self._head = head
+        self._rest = rest
+        self._z = z
+
+    def __iter__(self):
+        chunks = itertools.chain(self._head, self._rest)
+        if self._z is None:
+            yield from chunks
+            return
+        for chunk in chunks:
+            out = self._z.compress(chunk)
+            if out:
+                yield out
+        yield self._z.finish()
+
+    def close(self):
+        _close(self._body)
+
+
+def _close(body):
+    close = getattr(body, 'close', None)
+    if close is not None:
+        close()
+
+
+def _weaken(etag):
+    # the compressed bytes differ from the identity representation the strong tag named
+    return etag if etag.startswith('W/') else 'W/' + etag
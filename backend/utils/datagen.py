@@ -0,0 +1,300 @@
+import datetime
+import math
+import random
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import bcrypt
+from bson.objectid import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+from backend.blueprints.patient import SPECIALIST_MAP
+from backend.utils.slots import ACTIVE_STATUSES
+from backend.utils.search import user_search_keys
+
+# Synthetic hospital data for staging and benchmarks.
+# Every _id is derived from (seed, kind, index) and every chunk draws from its own
+# RNG seeded by (seed, table, chunk), so a given plan always yields the same dataset
+# however many worker processes build it, and re-running it only reports duplicates.
+# Cross references (appointment -> doctor/patient, bill -> appointment, ...) are
+# computed from indexes, never looked up, so chunks are independent.
+KINDS = ('admin', 'doctor', 'nurse', 'receptionist', 'patient',
+         'patients', 'doctors', 'nurses', 'receptionists',
+         'appointments', 'billing', 'prescriptions', 'schedules', 'nurse_schedule', 'calllogs')
+STAFF_ROLES = ('doctor', 'nurse', 'receptionist')
+# ObjectId timestamps start here and advance one second per index, keeping _id order = index order
+BASE_TS = 1704067200  # 2024-01-01
+CHUNK_BATCHES = 10
+
+FIRST_NAMES = ['Aarav', 'Priya', 'John', 'Maria', 'Wei', 'Fatima', 'Carlos', 'Aisha', 'Liam', 'Sofia',
+               'Ravi', 'Emma', 'Kenji', 'Olivia', 'Mateo', 'Zara', 'Noah', 'Ananya', 'Lucas', 'Mei']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Chen', 'Khan', 'Silva', 'Brown', 'Patel', 'Nguyen', 'Rossi',
+              'Kim', 'Okafor', 'Müller', 'Reddy', 'Lopez', 'Ivanova', 'Haddad', 'Tanaka', 'Wilson', 'Das']
+MEDICINES = ['Paracetamol 500mg', 'Amoxicillin 250mg', 'Ibuprofen 400mg', 'Cetirizine 10mg',
+             'Metformin 500mg', 'Amlodipine 5mg', 'Omeprazole 20mg', 'Atorvastatin 10mg']
+SPECIALTIES = sorted(set(SPECIALIST_MAP.values()))
+PROBLEMS_BY_SPECIALTY = {s: sorted(p for p, sp in SPECIALIST_MAP.items() if sp == s) for s in SPECIALTIES}
+
+
+def oid(seed, kind, index):
+    """Deterministic ObjectId for the index-th document of a kind."""
+    return ObjectId(struct.pack('>IB3sI', BASE_TS + index, KINDS.index(kind),
+                                (seed & 0xFFFFFF).to_bytes(3, 'big'), index))
+
+
+def person_name(index):
+    return FIRST_NAMES[index % len(FIRST_NAMES)], LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+
+
+def make_plan(counts, seed=0, password='password123', rounds=12, anchor=None, slot_minutes=30,
+              hours=(datetime.time(9), datetime.time(17)), batch_size=5000, past_fraction=0.8):
+    """
+    Everything a worker needs to build any chunk. `counts` maps doctors, nurses, receptionists,
+    patients, appointments, schedules, nurse_shifts and call_logs to sizes. One bcrypt hash is
+    computed here and shared by every generated account.
+    """
+    anchor = anchor or datetime.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    counts = dict(counts)
+    counts['doctors'] = max(1, counts.get('doctors', 0))
+    counts['patients'] = max(1, counts.get('patients', 0))
+    working = (datetime.datetime.combine(anchor, hours[1]) - datetime.datetime.combine(anchor, hours[0]))
+    per_day = max(1, int(working.total_seconds() // 60) // slot_minutes)
+    # appointment i goes to doctor i % D in that doctor's (i // D)-th working slot, so no two
+    # active bookings ever share a slot; past_fraction of each calendar lies before the anchor
+    days = math.ceil(math.ceil(counts.get('appointments', 0) / counts['doctors']) / per_day)
+    return {
+        'seed': seed,
+        'counts': counts,
+        'password_hash': bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)),
+        'anchor': anchor,
+        'first_day': anchor - datetime.timedelta(days=int(days * past_fraction)),
+        'slot_minutes': slot_minutes,
+        'day_start': hours[0],
+        'slots_per_day': per_day,
+        'batch_size': batch_size,
+    }
+
+
+# ---------------- Document builders ---------------- #
+def _user(plan, role, i, rng):
+    first, last = person_name(i)
+    username = 'admin' if role == 'admin' else f'{role}{i}'
+    profile = {'first_name': first, 'last_name': last}
+    if role == 'doctor':
+        profile['specialty'] = SPECIALTIES[i % len(SPECIALTIES)]
+    salary = {'doctor': rng.randrange(80000, 200001, 1000), 'nurse': rng.randrange(30000, 70001, 1000),
+              'receptionist': rng.randrange(25000, 45001, 1000)}.get(role, 0)
+    return {
+        '_id': oid(plan['seed'], role, i),
+        'username': username,
+        'email': f'{username}@hospital.example',
+        'password': plan['password_hash'],
+        'role': role,
+        'profile': profile,
+        'salary': salary,
+        'created_at': plan['first_day'] - datetime.timedelta(days=rng.randint(1, 365)),
+    }
+
+
+def _accounts(role, collection):
+    def build(plan, i, rng):
+        user = _user(plan, role, i, rng)
+        linked = {'_id': oid(plan['seed'], collection, i), 'user_id': user['_id'],
+                  'name': user['username'], 'email': user['email'], 'created_at': user['created_at']}
+        if role == 'patient':
+            linked.update(phone=f'+1-555-{rng.randint(0, 9999):04d}', address=f'{rng.randint(1, 999)} Main Street')
+        elif role == 'doctor':
+            linked.update(specialty=user['profile']['specialty'], salary=user['salary'])
+        elif role == 'nurse':
+            linked.update(shift=rng.choice(['Morning', 'Evening', 'Night']), salary=user['salary'])
+        else:
+            linked.update(phone=f'+1-555-{rng.randint(0, 9999):04d}')
+        if linked.get('phone'):
+            user['phone'] = linked['phone']
+        user['search_keys'] = user_search_keys(user)
+        return {'users': [user], collection: [linked]}
+    return build
+
+
+def _appointment(plan, i, rng):
+    seed, doctors = plan['seed'], plan['counts']['doctors']
+    d, k = i % doctors, i // doctors
+    p = rng.randrange(plan['counts']['patients'])
+    doctor_id, patient_id = oid(seed, 'doctor', d), oid(seed, 'patient', p)
+    first, last = person_name(d)
+    specialty = SPECIALTIES[d % len(SPECIALTIES)]
+    problem = rng.choice(PROBLEMS_BY_SPECIALTY[specialty])
+    day, slot = divmod(k, plan['slots_per_day'])
+    when = (datetime.datetime.combine(plan['first_day'] + datetime.timedelta(days=day), plan['day_start'])
+            + datetime.timedelta(minutes=slot * plan['slot_minutes']))
+    booked = when - datetime.timedelta(days=rng.randint(1, 14), minutes=rng.randint(0, 600))
+    if when < plan['anchor']:
+        status = rng.choices(['accepted', 'rejected', 'cancelled'], [80, 8, 12])[0]
+    else:
+        status = rng.choices(['pending', 'accepted', 'cancelled'], [55, 40, 5])[0]
+
+    appt_id = oid(seed, 'appointments', i)
+    appt = {'_id': appt_id, 'problem': problem, 'doctor_id': doctor_id, 'patient_id': patient_id,
+            'status': status, 'datetime': when, 'created_at': booked}
+    docs = {'appointments': [appt]}
+    if status in ACTIVE_STATUSES:
+        appt['slot_start'] = when
+        docs['slot_reservations'] = [{
+            '_id': {'doctor_id': doctor_id, 'start': when}, 'doctor_id': doctor_id, 'start': when,
+            'end': when + datetime.timedelta(minutes=plan['slot_minutes']),
+            'patient_id': patient_id, 'appointment_id': appt_id, 'created_at': booked}]
+
+    paid = status == 'accepted' and when < plan['anchor'] and rng.random() < 0.85
+    paid_at = when + datetime.timedelta(hours=rng.randint(1, 72)) if paid else None
+    bill = {'_id': oid(seed, 'billing', i), 'patient_id': patient_id, 'doctor_id': doctor_id,
+            'doctor_name': f'doctor{d}', 'amount': 500, 'status': 'Paid' if paid else 'Unpaid',
+            'description': f'Consultation for {problem}', 'problem': problem, 'specialty': specialty,
+            'date': booked, 'appointment_datetime': when, 'created_at': booked,
+            'updated_at': paid_at or booked}
+    if paid:
+        bill['paid_at'] = paid_at
+    docs['billing'] = [bill]
+
+    if status == 'accepted' and when < plan['anchor'] and rng.random() < 0.7:
+        docs['prescriptions'] = [{
+            '_id': oid(seed, 'prescriptions', i), 'patient_id': patient_id, 'doctor_id': doctor_id,
+            'doctor_name': f'{first} {last}', 'specialization': specialty, 'diagnosis': problem,
+            'medicines': ', '.join(rng.sample(MEDICINES, rng.randint(1, 3))),
+            'instructions': rng.choice(['Twice daily after meals', 'Once daily at night', 'Rest and fluids']),
+            'created_at': when + datetime.timedelta(minutes=plan['slot_minutes'])}]
+    return docs
+
+
+def _schedule(plan, i, rng):
+    d, p = rng.randrange(plan['counts']['doctors']), rng.randrange(plan['counts']['patients'])
+    day = plan['anchor'] + datetime.timedelta(days=rng.randint(-60, 30))
+    return {'schedules': [{
+        '_id': oid(plan['seed'], 'schedules', i), 'doctor': f'doctor{d}', 'patient': f'patient{p}',
+        'date': day.strftime('%Y-%m-%d'), 'time': f'{rng.randint(9, 16):02d}:{rng.choice(["00", "30"])}',
+        'status': 'Completed' if day < plan['anchor'] else rng.choice(['Scheduled', 'Scheduled', 'Cancelled'])}]}
+
+
+def _nurse_shift(plan, i, rng):
+    nurses = max(1, plan['counts'].get('nurses', 0))
+    day = plan['anchor'] + datetime.timedelta(days=i // nurses - 30)
+    return {'nurse_schedule': [{
+        '_id': oid(plan['seed'], 'nurse_schedule', i), 'nurse_id': str(oid(plan['seed'], 'nurse', i % nurses)),
+        'date': day.strftime('%Y-%m-%d'), 'time': rng.choice(['07:00-15:00', '15:00-23:00', '23:00-07:00'])}]}
+
+
+def _call_log(plan, i, rng):
+    first, last = person_name(rng.randrange(400))
+    return {'calllogs': [{
+        '_id': oid(plan['seed'], 'calllogs', i), 'caller_name': f'{first} {last}',
+        'phone': f'+1-555-{rng.randint(0, 9999):04d}',
+        'note': rng.choice(['Appointment enquiry', 'Billing question', 'Report request', 'Reschedule'])}]}
+
+
+# table -> (count key, builder); admin is a single fixed account
+TABLES = {
+    'admin': (None, lambda plan, i, rng: {'users': [_user(plan, 'admin', i, rng)]}),
+    'doctors': ('doctors', _accounts('doctor', 'doctors')),
+    'nurses': ('nurses', _accounts('nurse', 'nurses')),
+    'receptionists': ('receptionists', _accounts('receptionist', 'receptionists')),
+    'patients': ('patients', _accounts('patient', 'patients')),
+    'appointments': ('appointments', _appointment),
+    'schedules': ('schedules', _schedule),
+    'nurse_schedule': ('nurse_shifts', _nurse_shift),
+    'calllogs': ('call_logs', _call_log),
+}
+
+
+def tasks(plan):
+    """(table, start, stop) work units covering the whole plan."""
+    size = plan['batch_size'] * CHUNK_BATCHES
+    for table, (key, _) in TABLES.items():
+        total = 1 if key is None else plan['counts'].get(key, 0)
+        for start in range(0, total, size):
+            yield table, start, min(start + size, total)
+
+
+# ---------------- Writing ---------------- #
+def _flush(db, collection, docs):
+    """Unordered insert; duplicates (a re-run of the same plan) are counted, not fatal."""
+    try:
+        return len(db[collection].insert_many(docs, ordered=False).inserted_ids), 0
+    except BulkWriteError as e:
+        duplicates = sum(1 for err in e.details.get('writeErrors', []) if err.get('code') == 11000)
+        if duplicates != len(e.details.get('writeErrors', [])):
+            raise
+        return e.details.get('nInserted', 0), duplicates
+
+
+def build_chunk(db, plan, table, start, stop):
+    """Generate and insert one work unit. Returns {collection: [inserted, duplicates]}."""
+    _, builder = TABLES[table]
+    rng = random.Random(f"{plan['seed']}:{table}:{start}")
+    pending, totals = {}, {}
+
+    def flush(collection):
+        inserted, duplicates = _flush(db, collection, pending.pop(collection))
+        counts = totals.setdefault(collection, [0, 0])
+        counts[0] += inserted
+        counts[1] += duplicates
+
+    for i in range(start, stop):
+        for collection, docs in builder(plan, i, rng).items():
+            batch = pending.setdefault(collection, [])
+            batch.extend(docs)
+            if len(batch) >= plan['batch_size']:
+                flush(collection)
+    for collection in list(pending):
+        flush(collection)
+    return totals
+
+
+_worker_db = None
+
+
+def _init_worker(uri, options):
+    global _worker_db
+    _worker_db = MongoClient(uri, **options).get_default_database()
+
+
+def _run_chunk(plan, table, start, stop):
+    return build_chunk(_worker_db, plan, table, start, stop)
+
+
+def generate(db, plan, workers=0, uri=None, options=None, progress=None):
+    """
+    Build the whole plan into `db`. With workers > 0 the chunks are spread over that many
+    processes, each with its own client for `uri`; otherwise they run inline on `db`.
+    Returns {collection: [inserted, duplicates]}.
+    """
+    totals = {}
+
+    def add(result, table, stop):
+        for collection, (inserted, duplicates) in result.items():
+            counts = totals.setdefault(collection, [0, 0])
+            counts[0] += inserted
+            counts[1] += duplicates
+        if progress:
+            progress(table, stop)
+
+    units = list(tasks(plan))
+    if not workers:
+        for table, start, stop in units:
+            add(build_chunk(db, plan, table, start, stop), table, stop)
+        return totals
+
+    # spawn: workers must not inherit the parent's MongoClient sockets
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(uri, options or {})) as pool:
+        futures = {pool.submit(_run_chunk, plan, *unit): unit for unit in units}
+        for future in as_completed(futures):
+            table, _, stop = futures[future]
+            add(future.result(), table, stop)
+    return totals
+
+
+def drop_generated(db):
+    for collection in ('users', 'patients', 'doctors', 'nurses', 'receptionists', 'appointments',
+                       'slot_reservations', 'billing', 'prescriptions', 'schedules', 'nurse_schedule',
+                       'calllogs', 'stats', 'revenue_monthly', 'rollup_state'):
+        db.drop_collection(collection)
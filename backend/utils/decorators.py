@@ -38,3 +38,16 @@ def roles_required(*roles):
             return fn(*args, **kwargs)
         return wrapper
     return decorator
+
+
+def mongo_budget(commands):
+    """
+    Declare the most Mongo commands one request to this view may issue, independent of data size.
+    Checked by the test client in backend/utils/query_budget.py; no effect at runtime.
+    Example:
+        @mongo_budget(3)
+    """
+    def decorator(fn):
+        fn.mongo_budget = commands
+        return fn
+    return decorator
@@ -0,0 +1,80 @@
+import threading
+import time
+from flask import current_app, has_app_context
+from .availability import doctor_display_name
+
+# Process-local directory of doctors for the booking and billing paths.
+# Writers bump a version counter in `cache_versions`; each worker checks it at most
+# every `check_seconds` and reloads the (compact) directory only when it changed.
+VERSION_ID = 'doctor_directory'
+
+
+def bump_doctor_directory(db):
+    """Call after any write that can change a doctor's name, specialty or existence."""
+    db.cache_versions.update_one({'_id': VERSION_ID}, {'$inc': {'version': 1}}, upsert=True)
+    # this worker sees its own write immediately; others within check_seconds
+    directory = getattr(current_app, 'doctor_directory', None) if has_app_context() else None
+    if directory is not None:
+        directory.invalidate()
+
+
+class DoctorDirectory:
+    def __init__(self, check_seconds=5):
+        self.check_seconds = check_seconds
+        self._records = []
+        self._by_id = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.reloads = 0
+
+    def _refresh(self, db):
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            doc = db.cache_versions.find_one({'_id': VERSION_ID}, {'version': 1})
+            version = doc.get('version', 0) if doc else 0
+            if version != self._version:
+                # version read first, so a write racing with the load triggers another reload
+                records = []
+                for d in db.users.find({'role': 'doctor'}, {'username': 1, 'name': 1, 'profile': 1, 'specialization': 1}):
+                    profile = d.get('profile') or {}
+                    records.append({
+                        '_id': d['_id'],
+                        'id': str(d['_id']),
+                        'name': doctor_display_name(d),
+                        'username': d.get('username'),
+                        'specialty': profile.get('specialty') or d.get('specialization') or '',
+                    })
+                records.sort(key=lambda r: r['name'].lower())
+                self._records = records
+                self._by_id = {r['id']: r for r in records}
+                self._version = version
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+
+    def all(self, db):
+        self.reads += 1
+        self._refresh(db)
+        return self._records
+
+    def get(self, db, doctor_id):
+        self.reads += 1
+        self._refresh(db)
+        return self._by_id.get(str(doctor_id))
+
+    def invalidate(self):
+        """Force a version check on the next read (used by writers in this process)."""
+        self._checked_at = 0.0
+
+    def stats(self):
+        """Reads served from the local copy vs. reads that had to reload it."""
+        return {
+            'reads': self.reads,
+            'reloads': self.reloads,
+            'size': len(self._records),
+            'hit_rate': round(1 - self.reloads / self.reads, 4) if self.reads else 0.0,
+        }
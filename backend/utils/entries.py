@@ -0,0 +1,250 @@
+import collections
+import datetime
+import hmac
+import json
+import os
+import threading
+import time
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure, PyMongoError
+from .decorators import mongo_budget
+
+# Biometric / door entry ingestion.
+# Terminals POST batches of events. A request only validates them and appends them to a
+# bounded per-process buffer; one background thread drains it with unordered insert_many
+# of up to `batch_size` events, so many small requests become few large writes. When Mongo
+# slows down the buffer fills, and requests that do not fit are refused whole (the view
+# answers 503 + Retry-After) instead of queueing without limit. Terminals resend those.
+# A batch that fails on a transient error goes back to the front of the buffer.
+# Delivery is at least once, and a 202 means buffered, not written:
+#  - events a worker acknowledged but had not flushed are lost if it dies without a graceful
+#    shutdown (which flushes for up to 5 s). That is at most `max_pending` events, normally
+#    those of the last `flush_interval`.
+#  - a terminal that resends after a lost response writes its events twice, because a
+#    time-series collection has no unique index to reject them. Readers that need exact
+#    counts treat (terminal, user, action, timestamp) as an event's identity.
+# The request itself issues no Mongo commands (@mongo_budget(0)); each flush is budgeted
+# on EntryWriter._write instead.
+# `entries` is a time-series collection (timeField `timestamp`, metaField `terminal`) whose
+# buckets expire after the TTL; servers without time-series get a TTL index instead.
+COLLECTION = 'entries'
+FIELD_MAX_LENGTH = 200
+
+
+def ensure_entries_collection(db, ttl_seconds, logger=None):
+    """Create `entries` as an expiring time-series collection, or add a TTL index where that is unavailable."""
+    try:
+        db.create_collection(COLLECTION, timeseries={'timeField': 'timestamp', 'metaField': 'terminal',
+                                                     'granularity': 'seconds'},
+                             expireAfterSeconds=ttl_seconds)
+        return
+    except CollectionInvalid:
+        # already exists: a time-series collection keeps its expireAfterSeconds; a plain one
+        # (created before ingestion, or on an older server) needs the TTL index below
+        options = db[COLLECTION].options()
+        if 'timeseries' in options:
+            return
+    except (OperationFailure, NotImplementedError) as e:
+        if logger:
+            logger.warning("Time-series collections unavailable (%s); using a TTL index on %s", e, COLLECTION)
+    db[COLLECTION].create_index([('timestamp', ASCENDING)], name='timestamp_ttl', expireAfterSeconds=ttl_seconds)
+
+
+def parse_tokens(spec):
+    """'lobby:secret1,ward-3:secret2' -> {'secret1': 'lobby', 'secret2': 'ward-3'}."""
+    tokens = {}
+    for part in (spec or '').split(','):
+        name, _, token = part.strip().partition(':')
+        if name and token:
+            tokens[token] = name
+    return tokens
+
+
+def terminal_for(tokens, authorization):
+    """Name of the terminal presenting `Authorization: Bearer <token>`, or None."""
+    scheme, _, presented = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not presented:
+        return None
+    found = None
+    for token, name in tokens.items():
+        # compare against every token so timing does not reveal which one matched a prefix
+        if hmac.compare_digest(token.encode('utf-8'), presented.strip().encode('utf-8')):
+            found = name
+    return found
+
+
+def _timestamp(value, now):
+    if value is None:
+        return now
+    if isinstance(value, bool):
+        raise ValueError('timestamp must be ISO 8601 or epoch seconds')
+    if isinstance(value, (int, float)):
+        try:
+            return datetime.datetime.utcfromtimestamp(value)
+        except (OverflowError, OSError):
+            raise ValueError('timestamp out of range')
+    if isinstance(value, str):
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return parsed
+    raise ValueError('timestamp must be ISO 8601 or epoch seconds')
+
+
+def _text(event, field, required):
+    value = event.get(field)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    if not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise ValueError(f'{field} must be a string')
+    value = str(value)
+    if len(value) > FIELD_MAX_LENGTH:
+        raise ValueError(f'{field} is longer than {FIELD_MAX_LENGTH} characters')
+    return value
+
+
+def entry_doc(event, terminal, now):
+    """Document for one event {user, action, timestamp?, door?}; raises ValueError when invalid."""
+    if not isinstance(event, dict):
+        raise ValueError('event must be an object')
+    doc = {
+        'timestamp': _timestamp(event.get('timestamp'), now),
+        'terminal': terminal,
+        'user': _text(event, 'user', True),
+        'action': _text(event, 'action', True),
+        'received_at': now,
+    }
+    door = _text(event, 'door', False)
+    if door is not None:
+        doc['door'] = door
+    return doc
+
+
+def read_events(request, max_events):
+    """
+    Events of an ingest request: NDJSON (one object per line, read incrementally) or a JSON
+    array / {"entries": [...]}. Raises ValueError for a malformed body, OverflowError past max_events.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        events = []
+        for number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+            if len(events) >= max_events:
+                raise OverflowError(max_events)
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f'line {number} is not valid JSON')
+        return events
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('entries')
+    if not isinstance(body, list):
+        raise ValueError('expected a JSON array of events, {"entries": [...]} or NDJSON')
+    if len(body) > max_events:
+        raise OverflowError(max_events)
+    return body
+
+
+class EntryWriter:
+    def __init__(self, get_db, batch_size=1000, max_pending=50000, flush_interval=0.2, retry_seconds=1.0,
+                 logger=None):
+        self.get_db = get_db
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.retry_seconds = retry_seconds
+        self.logger = logger
+        self.written = self.failed = self.rejected = 0
+        self._pending = collections.deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ---- request side ----
+    def submit(self, docs):
+        """Queue docs for writing. Returns False, queueing none of them, when the buffer lacks room."""
+        self._ensure_writer()
+        with self._cond:
+            if len(self._pending) + len(docs) > self.max_pending:
+                self.rejected += len(docs)
+                return False
+            self._pending.extend(docs)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def stats(self):
+        return {'pending': len(self._pending), 'written': self.written, 'failed': self.failed,
+                'rejected': self.rejected}
+
+    # ---- writer side (background thread) ----
+    def _ensure_writer(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # a forked child must not write the events its parent buffered
+                self._pending = collections.deque()
+                self._cond = threading.Condition()
+                self._stopping = False
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='entry-writer', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        with self._cond:
+            if len(self._pending) < self.batch_size and not self._stopping:
+                self._cond.wait(self.flush_interval)
+            count = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)], self._stopping
+
+    def _run(self):
+        db = self.get_db()
+        while True:
+            batch, stopping = self._next_batch()
+            if not batch:
+                if stopping:
+                    return
+                continue
+            if not self._write(db, batch):
+                with self._cond:
+                    self._pending.extendleft(reversed(batch))
+                if stopping:
+                    return
+                time.sleep(self.retry_seconds)
+
+    @mongo_budget(1)
+    def _write(self, db, batch):
+        """Insert one batch (one insert_many whatever its size); False when it should be retried."""
+        try:
+            db[COLLECTION].insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except BulkWriteError as e:
+            # the valid documents were written; the rejected ones (e.g. a retried batch's
+            # duplicates) are counted and dropped
+            errors = e.details.get('writeErrors', [])
+            self.written += e.details.get('nInserted', 0)
+            self.failed += len(errors)
+            if self.logger and errors:
+                self.logger.warning("%d of %d entries rejected: %s", len(errors), len(batch), errors[0].get('errmsg'))
+        except PyMongoError as e:
+            if self.logger:
+                self.logger.warning("Entry batch of %d not written, retrying: %s", len(batch), e)
+            return False
+        return True
+
+    def stop(self, timeout=5):
+        """Write what is buffered (within `timeout`) and stop this process's writer thread."""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            thread.join(timeout)
+        self._thread = self._pid = None
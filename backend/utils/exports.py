@@ -0,0 +1,110 @@
+import csv
+import datetime
+import io
+import json
+import zlib
+from bson.objectid import ObjectId
+
+# Streaming exports.
+# Rows come from one `_id`-ordered cursor fetched in batches and are written through a
+# generator into ~64 KB chunks, so memory stays flat however many documents match.
+# Every row starts with the document's _id; an interrupted download resumes by passing
+# the last id received as `after`. Date range and status filters narrow the scan.
+CHUNK_BYTES = 64 * 1024
+
+# collection -> the field date ranges apply to, and the exported columns (after `id`)
+EXPORTS = {
+    'billing': {
+        'date_field': 'date',
+        'columns': ('patient_id', 'doctor_id', 'doctor_name', 'amount', 'status', 'description', 'problem',
+                    'specialty', 'date', 'appointment_datetime', 'paid_at', 'created_at'),
+    },
+    'appointments': {
+        'date_field': 'datetime',
+        'columns': ('patient_id', 'doctor_id', 'problem', 'status', 'datetime', 'created_at'),
+    },
+    'prescriptions': {
+        'date_field': 'created_at',
+        'columns': ('patient_id', 'doctor_id', 'doctor_name', 'specialization', 'diagnosis', 'medicines',
+                    'instructions', 'created_at'),
+    },
+}
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def export_query(collection, start=None, end=None, statuses=None, after=None):
+    """Filter for an export: [start, end) on the collection's date field, status in `statuses`, _id > after."""
+    spec = EXPORTS[collection]
+    query = {}
+    if start or end:
+        bounds = {}
+        if start:
+            bounds['$gte'] = start
+        if end:
+            bounds['$lt'] = end
+        query[spec['date_field']] = bounds
+    if statuses:
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': list(statuses)}
+    if after:
+        query['_id'] = {'$gt': after}
+    return query
+
+
+def _value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_rows(columns, docs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('id',) + columns)
+    for doc in docs:
+        writer.writerow([_value(doc['_id'])] + [_value(doc.get(c, '')) for c in columns])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_rows(columns, docs):
+    chunk = []
+    size = 0
+    for doc in docs:
+        row = {'id': _value(doc['_id'])}
+        row.update((c, _value(doc.get(c))) for c in columns)
+        line = json.dumps(row, default=str) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(chunk).encode('utf-8')
+            chunk, size = [], 0
+    yield ''.join(chunk).encode('utf-8')
+
+
+def _gzipped(chunks, level=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def stream_export(db, collection, fmt='csv', query=None, batch_size=1000, gzip=False):
+    """Generator of encoded export chunks; the cursor is closed however the download ends."""
+    columns = EXPORTS[collection]['columns']
+    cursor = db[collection].find(query or {}, dict.fromkeys(columns, 1)).sort('_id', 1).batch_size(batch_size)
+    rows = _csv_rows if fmt == 'csv' else _ndjson_rows
+    chunks = rows(columns, cursor)
+    try:
+        yield from (_gzipped(chunks) if gzip else chunks)
+    finally:
+        cursor.close()
@@ -0,0 +1,64 @@
+import concurrent.futures
+import contextvars
+import pymongo
+from flask import current_app, flash
+
+# Runs independent Mongo reads concurrently on a bounded, app-wide thread pool.
+# The callables share the app's MongoClient (which is thread-safe), so no extra
+# connections are opened beyond the client's own pool.
+# The pool is sized for every request thread fanning out at once (QUERY_FANOUT_WORKERS),
+# so a read never queues behind another request's. Each read also runs under
+# pymongo.timeout(deadline): cancel() cannot stop a read that already started, but the
+# server abandons it (maxTimeMS) instead of holding a pool thread past the deadline.
+
+DEGRADED_MESSAGE = "Some of this page could not be loaded in time and may be incomplete. Please refresh."
+
+
+def make_pool(max_workers):
+    return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='query-fanout')
+
+
+def _bounded(fn, timeout):
+    def run():
+        with pymongo.timeout(timeout):
+            return fn()
+    return run
+
+
+def fan_out(queries, timeout=None, default=None):
+    """
+    Run {name: zero-arg callable} in parallel and return {name: result}.
+    A query that raises or misses the deadline yields `default` (or default[name] if a dict)
+    and is logged, and the page gets a warning flash that it is incomplete, so one slow or
+    failing read neither breaks the page nor silently renders as empty.
+    """
+    app = current_app._get_current_object()
+    pool = app.query_pool
+    timeout = app.config['QUERY_FANOUT_TIMEOUT'] if timeout is None else timeout
+
+    # each query runs in a copy of the caller's context, so context-local state
+    # (e.g. per-request instrumentation) follows it onto the pool thread
+    futures = {pool.submit(contextvars.copy_context().run, _bounded(fn, timeout)): name
+               for name, fn in queries.items()}
+    done, pending = concurrent.futures.wait(futures, timeout=timeout)
+
+    def fallback(name):
+        return default.get(name) if isinstance(default, dict) else default
+
+    results, degraded = {}, False
+    for future, name in futures.items():
+        if future in pending:
+            future.cancel()
+            app.logger.warning("Query '%s' exceeded %ss fan-out deadline", name, timeout)
+            results[name] = fallback(name)
+            degraded = True
+            continue
+        try:
+            results[name] = future.result()
+        except Exception:
+            app.logger.exception("Query '%s' failed during fan-out", name)
+            results[name] = fallback(name)
+            degraded = True
+    if degraded:
+        flash(DEGRADED_MESSAGE, 'warning')
+    return results
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from pymongo import UpdateOne
+
+# Per-user rendered page cache.
+# Each user has a data version in `cache_versions` ({_id: 'user:<id>', version}); writes that
+# change what a user's cached pages show call bump_user_versions(). A cached GET costs one
+# version read: the page is served from the per-process LRU when (endpoint, user, version,
+# query) is present, and answered with 304 when the client's ETag already names that version.
+# Entries also expire after `ttl`, which bounds staleness from writes that do not bump
+# (e.g. a renamed patient shown on a doctor's page).
+
+
+def _version_id(user_id):
+    return f'user:{user_id}'
+
+
+def user_version(db, user_id):
+    doc = db.cache_versions.find_one({'_id': _version_id(user_id)}, {'version': 1})
+    return doc.get('version', 0) if doc else 0
+
+
+def bump_user_versions(db, *user_ids):
+    """Invalidate every cached page of these users (one round trip)."""
+    ids = {str(u) for u in user_ids if u}
+    if ids:
+        db.cache_versions.bulk_write(
+            [UpdateOne({'_id': _version_id(u)}, {'$inc': {'version': 1}}, upsert=True) for u in sorted(ids)],
+            ordered=False
+        )
+
+
+def release_id(root):
+    """Changes whenever a template or module under `root` changes, so ETags do not outlive a deploy."""
+    newest = 0.0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(('.py', '.html')):
+                newest = max(newest, os.path.getmtime(os.path.join(dirpath, name)))
+    return hashlib.sha1(repr(newest).encode()).hexdigest()[:8]
+
+
+
+def asset_release():
+    """CACHE_RELEASE plus the loaded asset manifest's digest: pages embed hashed static URLs."""
+    assets = getattr(current_app, 'assets', None)
+    return f"{current_app.config.get('CACHE_RELEASE')}.{getattr(assets, 'digest', '')}"
+
+
+class FragmentCache:
+    """LRU of rendered bodies bounded by total bytes, with a TTL."""
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, body)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key):
+        _, body = self._data.pop(key)
+        self.bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'size': len(self._data),
+            'bytes': self.bytes,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def cached_per_user(fn):
+    """
+    Serve GETs of this view from the per-user cache (place below login/role checks).
+    Requests carrying flashed messages are always rendered, and never stored.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        cache = getattr(current_app, 'fragment_cache', None)
+        if cache is None or request.method != 'GET' or session.get('_flashes'):
+            return fn(*args, **kwargs)
+
+        user_id = current_user.get_id()
+        version = user_version(current_app.db, user_id)
+        query = request.query_string.decode('utf-8', 'replace')
+        release = asset_release()
+        etag = hashlib.sha1(
+            f"{release}|{request.endpoint}|{user_id}|{version}|{query}".encode()
+        ).hexdigest()
+
+        # weak comparison: the compression middleware weakens ETags of encoded bodies
+        if request.if_none_match.contains_weak(etag):
+            cache.not_modified += 1
+            response = current_app.response_class(status=304)
+        else:
+            key = (release, request.endpoint, user_id, version, query)
+            body = cache.get(key)
+            if body is None:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200 or response.mimetype != 'text/html':
+                    return response
+                cache.put(key, response.get_data())
+            else:
+                response = current_app.response_class(body, mimetype='text/html')
+        response.set_etag(etag)
+        # browsers must revalidate, shared caches must not store
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,30 @@
+from bson.objectid import ObjectId
+
+
+def as_oid(value):
+    """Convert a stored reference to an ObjectId when possible, else return it unchanged."""
+    if isinstance(value, ObjectId) or value is None:
+        return value
+    try:
+        return ObjectId(value)
+    except Exception:
+        return value
+
+
+def lookup_map(collection, ids, fields=None, key='_id'):
+    """
+    Resolve every referenced document with a single `$in` query.
+    Returns a dict {key value: document}. `fields` limits the projection.
+    """
+    wanted = {as_oid(i) for i in ids if i is not None}
+    if not wanted:
+        return {}
+
+    projection = None
+    if fields:
+        projection = {f: 1 for f in fields}
+        projection[key] = 1
+
+    docs = collection.find({key: {'$in': list(wanted)}}, projection)
+    return {d[key]: d for d in docs}
+
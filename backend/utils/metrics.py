@@ -0,0 +1,225 @@
+import contextvars
+import hmac
+import ipaddress
+import threading
+import time
+from pymongo import monitoring
+
+# Per-request Mongo instrumentation and a Prometheus text endpoint, without extra dependencies.
+# The command listener only does work while a request is being traced: it looks up the
+# request's RequestTrace in a ContextVar (fan_out copies it onto its pool threads) and adds
+# the command's count and duration to it. At the end of the request the trace becomes a
+# Server-Timing header and feeds the per-endpoint histograms below.
+# Figures are per process; with several gunicorn workers each one reports its own.
+# /metrics answers only clients in the allowed networks or presenting the scrape token.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+def parse_networks(spec):
+    """'127.0.0.1/32, 10.0.0.0/8' -> ip_network list; raises ValueError for a malformed entry."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in (spec or '').split(',') if part.strip()]
+
+
+def scrape_allowed(networks, token, remote_addr, authorization):
+    """True for a client address in `networks`, or one presenting `Authorization: Bearer <token>`."""
+    if token:
+        scheme, _, presented = (authorization or '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(token.encode('utf-8'),
+                                                              presented.strip().encode('utf-8')):
+            return True
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+class RequestTrace:
+    """Mongo commands issued on behalf of one request: count and time, per collection."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.commands = 0
+        self.mongo_seconds = 0.0
+        self.collections = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def command_started(self, request_id, collection):
+        with self._lock:
+            self._inflight[request_id] = collection
+
+    def command_finished(self, request_id, seconds):
+        with self._lock:
+            collection = self._inflight.pop(request_id, None) or 'other'
+            self.commands += 1
+            self.mongo_seconds += seconds
+            entry = self.collections.setdefault(collection, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def server_timing(self, max_collections=5):
+        """Server-Timing header value: total mongo time plus the costliest collections."""
+        parts = [f'mongo;dur={self.mongo_seconds * 1000:.2f};desc="{self.commands} commands"']
+        ranked = sorted(self.collections.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (count, seconds) in ranked[:max_collections]:
+            parts.append(f'mongo-{_token(name)};dur={seconds * 1000:.2f};desc="{count} commands"')
+        parts.append(f'app;dur={(time.perf_counter() - self.started) * 1000:.2f}')
+        return ', '.join(parts)
+
+
+def _token(name):
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+class CommandTracer(monitoring.CommandListener):
+    """Attributes each command to the request traced in the calling context (no-op otherwise)."""
+    def started(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            collection = event.command.get(event.command_name)
+            trace.command_started(event.request_id, collection if isinstance(collection, str) else None)
+
+    def succeeded(self, event):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.command_finished(event.request_id, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+class PoolTracker(monitoring.ConnectionPoolListener):
+    """Live connection counts for this process's pools."""
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.wait_timeouts = 0
+        self._lock = threading.Lock()
+
+    def _add(self, attr, delta):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + delta)
+
+    def connection_created(self, event):
+        self._add('open', 1)
+
+    def connection_closed(self, event):
+        self._add('open', -1)
+
+    def connection_checked_out(self, event):
+        self._add('checked_out', 1)
+
+    def connection_checked_in(self, event):
+        self._add('checked_out', -1)
+
+    def connection_check_out_failed(self, event):
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            self._add('wait_timeouts', 1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+class Metrics:
+    """Per-endpoint request latency histograms and Mongo totals, rendered in Prometheus text format."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.pool = PoolTracker()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def listeners(self):
+        return [CommandTracer(), self.pool]
+
+    def start_request(self):
+        """Begin tracing the current request; returns the token for finish_request."""
+        return _current_trace.set(RequestTrace())
+
+    def finish_request(self, token, endpoint, method):
+        """Record the traced request under (endpoint, method) and stop tracing."""
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        if trace is None:
+            return
+        elapsed = time.perf_counter() - trace.started
+        with self._lock:
+            series = self._endpoints.get((endpoint, method))
+            if series is None:
+                series = self._endpoints[(endpoint, method)] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                    'mongo_commands': 0, 'mongo_seconds': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if elapsed <= bound:
+                    series['buckets'][i] += 1
+                    break
+            series['count'] += 1
+            series['sum'] += elapsed
+            series['mongo_commands'] += trace.commands
+            series['mongo_seconds'] += trace.mongo_seconds
+
+    def render(self, gauges=()):
+        """Prometheus exposition text. `gauges` is an iterable of (name, help, {labels: value})."""
+        with self._lock:
+            snapshot = {key: dict(series, buckets=list(series['buckets']))
+                        for key, series in self._endpoints.items()}
+        lines = []
+
+        def header(name, kind, text):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        header('http_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+        for (endpoint, method), series in sorted(snapshot.items()):
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {series["count"]}')
+
+        header('mongo_commands_total', 'counter', 'Mongo commands issued while serving each endpoint.')
+        for (endpoint, method), series in sorted(snapshot.items()):
+            lines.append(f'mongo_commands_total{{endpoint="{endpoint}",method="{method}"}} {series["mongo_commands"]}')
+        header('mongo_command_seconds_total', 'counter', 'Time spent in Mongo commands per endpoint.')
+        for (endpoint, method), series in sorted(snapshot.items()):
+            lines.append(f'mongo_command_seconds_total{{endpoint="{endpoint}",method="{method}"}} '
+                         f'{series["mongo_seconds"]:.6f}')
+
+        pool = self.pool
+        for name, text, value in (
+                ('mongo_pool_connections_open', 'Open connections in this process.', pool.open),
+                ('mongo_pool_connections_checked_out', 'Connections currently in use.', pool.checked_out),
+                ('mongo_pool_wait_timeouts_total', 'Checkouts that timed out waiting for a connection.',
+                 pool.wait_timeouts)):
+            header(name, 'counter' if name.endswith('_total') else 'gauge', text)
+            lines.append(f'{name} {value}')
+
+        for name, text, samples in gauges:
+            header(name, 'gauge', text)
+            for labels, value in samples.items():
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,88 @@
+import os
+import threading
+import urllib.parse
+import weakref
+from pymongo import MongoClient
+
+# Fork-safe MongoClient management.
+# The client is created lazily on first use in each process, so nothing is
+# connected at import/create_app time, and a process that was forked after the
+# client was created (gunicorn preload_app) transparently gets its own client.
+_connections = weakref.WeakSet()
+
+
+def client_options(config):
+    """MongoClient keyword arguments derived from the Flask config."""
+    options = {
+        'maxPoolSize': config.get('MONGO_MAX_POOL_SIZE'),
+        'minPoolSize': config.get('MONGO_MIN_POOL_SIZE'),
+        'connectTimeoutMS': config.get('MONGO_CONNECT_TIMEOUT_MS'),
+        'serverSelectionTimeoutMS': config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+        'socketTimeoutMS': config.get('MONGO_SOCKET_TIMEOUT_MS'),
+        'waitQueueTimeoutMS': config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        'compressors': config.get('MONGO_COMPRESSORS') or None,
+        'appname': config.get('MONGO_APP_NAME'),
+    }
+    return {k: v for k, v in options.items() if v is not None}
+
+
+def with_database(uri, name):
+    """The same connection string pointed at another default database."""
+    parts = urllib.parse.urlsplit(uri)
+    return urllib.parse.urlunsplit(parts._replace(path='/' + name))
+
+
+class MongoConnection:
+    def __init__(self, uri, **options):
+        self.uri = uri
+        self.options = options
+        self._client = None
+        self._db = None
+        self._pid = None
+        self._lock = threading.Lock()
+        _connections.add(self)
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    # never close a client inherited across fork: its sockets belong to the parent
+                    self._client = MongoClient(self.uri, connect=False, **self.options)
+                    self._db = self._client.get_default_database()
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        self.client  # creates this process's client (and _db) if needed
+        return self._db
+
+    def reset(self):
+        """Forget the current client without closing it (use in a freshly forked child)."""
+        with self._lock:
+            self._client = self._db = None
+            self._pid = None
+
+    def close(self):
+        """Close the client owned by this process (shutdown, or the master before forking)."""
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = self._db = None
+            self._pid = None
+
+    def pool_stats(self):
+        """Connection pool options in effect, for monitoring."""
+        opts = self.client.options.pool_options
+        return {'max_pool_size': opts.max_pool_size, 'min_pool_size': opts.min_pool_size}
+
+
+def reset_after_fork():
+    for conn in list(_connections):
+        conn.reset()
+
+
+def close_all():
+    for conn in list(_connections):
+        conn.close()
@@ -0,0 +1,137 @@
+import base64
+from bson import json_util
+from flask import request, url_for
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe token for a list of sort key values."""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return values if isinstance(values, list) else None
+    except Exception:
+        return None
+
+
+def _seek(field, value, last_id, op):
+    """
+    Filter selecting rows strictly after (value, last_id) in (field, _id) order.
+    Missing and null values sort before all others, and comparison operators never match
+    them, so a null cursor value and the null rows beyond a non-null one are matched explicitly.
+    """
+    if field == '_id':
+        return {'_id': {op: last_id}}
+    if value is None:
+        if op == '$gt':
+            return {'$or': [{field: None, '_id': {op: last_id}}, {field: {'$ne': None}}]}
+        return {field: None, '_id': {op: last_id}}
+    clauses = [
+        {field: {op: value}},
+        {field: value, '_id': {op: last_id}},
+    ]
+    if op == '$lt':
+        clauses.append({field: None})
+    return {'$or': clauses}
+
+
+class Page:
+    """One page of a keyset-paginated listing plus what templates need to render the controls."""
+    def __init__(self, items, endpoint, args, sort, order, per_page, next_cursor, prev_cursor, filters):
+        self.items = items
+        self.endpoint = endpoint
+        self.args = args
+        self.sort = sort
+        self.order = order
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.filters = filters
+
+    def _url(self, **overrides):
+        args = {k: v for k, v in self.args.items() if k not in ('after', 'before')}
+        args.update(overrides)
+        return url_for(self.endpoint, **{k: v for k, v in args.items() if v not in (None, '')})
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+    def sort_url(self, field):
+        """Link for a column header: toggles direction when already sorted by this field."""
+        order = 'desc' if self.sort == field and self.order == 'asc' else 'asc'
+        return self._url(sort=field, order=order)
+
+
+def paginate(collection, query=None, projection=None, sort_fields=('_id',), default_sort='_id',
+             default_order='asc', filter_fields=(), per_page=None):
+    """
+    Keyset pagination over (sort field, _id) driven by request.args:
+    `sort`, `order`, `per_page`, `after`/`before` cursors and any of `filter_fields` (exact match).
+    Never uses skip(), so page N costs the same as page 1 given an index on the sort field.
+    """
+    args = request.args
+    sort = args.get('sort', default_sort)
+    if sort not in sort_fields:
+        sort = default_sort
+    order = args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        order = default_order
+    try:
+        per_page = int(args.get('per_page', per_page or DEFAULT_PER_PAGE))
+    except ValueError:
+        per_page = DEFAULT_PER_PAGE
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+
+    filters = {f: args[f] for f in filter_fields if args.get(f)}
+    conditions = [c for c in (query, filters) if c]
+
+    direction = 1 if order == 'asc' else -1
+    backwards = False
+    token = args.get('after')
+    if not token and args.get('before'):
+        token = args.get('before')
+        backwards = True
+    cursor_values = decode_cursor(token) if token else None
+    if cursor_values and len(cursor_values) == 2:
+        forward_op = '$gt' if direction == 1 else '$lt'
+        reverse_op = '$lt' if direction == 1 else '$gt'
+        conditions.append(_seek(sort, cursor_values[0], cursor_values[1],
+                                reverse_op if backwards else forward_op))
+    else:
+        backwards = False
+        cursor_values = None
+
+    mongo_query = {'$and': conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+    scan_direction = -direction if backwards else direction
+    sort_spec = [(sort, scan_direction)] if sort == '_id' else [(sort, scan_direction), ('_id', scan_direction)]
+
+    rows = list(collection.find(mongo_query, projection).sort(sort_spec).limit(per_page + 1))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def key(doc):
+        return encode_cursor([doc.get(sort), doc['_id']])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # Going forward there is a previous page whenever we started from a cursor;
+        # going backwards there is always a next page (the one we came from).
+        if has_more or backwards:
+            next_cursor = key(rows[-1])
+        if cursor_values and (not backwards or has_more):
+            prev_cursor = key(rows[0])
+
+    return Page(rows, request.endpoint, args.to_dict(), sort, order, per_page,
+                next_cursor, prev_cursor, filters)
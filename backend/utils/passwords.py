@@ -0,0 +1,139 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+import bcrypt
+
+# bcrypt hashing/verification off the request thread.
+# Work runs in a small process pool so a login burst is bounded to `workers` CPU-bound
+# hashes at a time; at most `queue` operations may be in flight per process, beyond
+# which callers get PasswordPoolBusy instead of piling up behind the pool. An operation
+# that does not finish within `timeout` raises PasswordPoolTimeout (a PasswordPoolBusy),
+# so views answer both with 503 + Retry-After. Batch hashing shares the same slots.
+# The pool is created lazily in the process that first uses it (i.e. after a
+# gunicorn fork), and re-created if the process has forked since.
+DEFAULT_ROUNDS = 12
+
+_settings = {'workers': 2, 'queue': 32, 'rounds': DEFAULT_ROUNDS, 'timeout': 10}
+_pool = None
+_pool_pid = None
+_slots = threading.BoundedSemaphore(_settings['queue'])
+_lock = threading.Lock()
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when too many hash/verify operations are already queued."""
+
+
+class PasswordPoolTimeout(PasswordPoolBusy):
+    """Raised when a hash/verify operation did not finish within the configured timeout."""
+
+
+def configure(workers=None, queue=None, rounds=None, timeout=None):
+    """Apply settings (workers=0 runs bcrypt inline). Takes effect for pools created afterwards."""
+    global _slots
+    for key, value in (('workers', workers), ('queue', queue), ('rounds', rounds), ('timeout', timeout)):
+        if value is not None:
+            _settings[key] = value
+    _slots = threading.BoundedSemaphore(_settings['queue'])
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, stored):
+    return bcrypt.checkpw(password, stored)
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=_settings['workers'])
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown(wait=True):
+    """Stop this process's pool (worker exit); a later call lazily starts a new one."""
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=wait)
+        _pool = _pool_pid = None
+
+
+def _submit(slots, fn, *args):
+    """Submit to the pool holding one of `slots` (already acquired) until the work is done."""
+    try:
+        future = _get_pool().submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _run(fn, *args):
+    if not _settings['workers']:
+        return fn(*args)
+    slots = _slots
+    if not slots.acquire(blocking=False):
+        raise PasswordPoolBusy()
+    future = _submit(slots, fn, *args)
+    try:
+        return future.result(timeout=_settings['timeout'])
+    except FutureTimeout:
+        raise PasswordPoolTimeout()
+
+
+def _as_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return (value or '').encode('utf-8')
+
+
+def hash_password(password, rounds=None):
+    """Return a bcrypt hash (bytes) using the configured cost factor."""
+    return _run(_hashpw, _as_bytes(password), rounds or _settings['rounds'])
+
+
+def verify_password(password, stored):
+    """Check a password against a stored bcrypt hash (bytes or str). Malformed hashes fail closed."""
+    if not stored:
+        return False
+    try:
+        return _run(_checkpw, _as_bytes(password), _as_bytes(stored))
+    except PasswordPoolBusy:
+        raise
+    except ValueError:
+        return False
+
+
+def hash_rounds(stored):
+    """Cost factor encoded in a bcrypt hash ('$2b$12$...'), or None if unreadable."""
+    try:
+        return int(_as_bytes(stored).split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(stored, rounds=None):
+    return hash_rounds(stored) != (rounds or _settings['rounds'])
+
+
+def hash_many(passwords, rounds=None):
+    """
+    Hash a batch in parallel across the pool (for seed/import scripts). Each hash holds a
+    queue slot like a request's would; the batch waits for free slots instead of failing.
+    """
+    rounds = rounds or _settings['rounds']
+    encoded = [_as_bytes(p) for p in passwords]
+    if not _settings['workers']:
+        return [_hashpw(p, rounds) for p in encoded]
+    slots = _slots
+    futures = []
+    for password in encoded:
+        slots.acquire()
+        futures.append(_submit(slots, _hashpw, password, rounds))
+    return [future.result() for future in futures]
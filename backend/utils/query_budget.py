@@ -0,0 +1,187 @@
+import contextvars
+import threading
+from flask import request
+from flask.testing import FlaskClient
+from pymongo import monitoring
+from backend.utils.mongo import MongoConnection, with_database
+
+# Mongo round-trip budgets for blueprint endpoints.
+# Views declare a ceiling with @mongo_budget(n) (backend/utils/decorators.py). In tests,
+# BudgetClient counts the commands each request issues and raises BudgetExceeded when an
+# endpoint goes over its ceiling. Commands are counted through a CommandListener against a
+# real mongod, or by wrapping the collections of an in-process mongomock stand-in; either
+# way they land in a ContextVar, which fan_out carries onto its pool threads.
+# The stand-in counts one command per collection call (getMore batches are not modelled).
+_current = contextvars.ContextVar('mongo_budget_requests', default=None)
+
+# Collection methods that cost one round trip
+ROUND_TRIPS = {
+    'find', 'find_one', 'aggregate', 'count_documents', 'estimated_document_count', 'distinct',
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one',
+    'delete_many', 'find_one_and_update', 'find_one_and_delete', 'find_one_and_replace', 'bulk_write',
+}
+
+
+# mongomock checks unique keys and then writes without a lock; a server applies each write
+# atomically, so the stand-in serializes these to keep concurrent tests meaningful
+WRITES = {
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many',
+    'find_one_and_update', 'find_one_and_delete', 'find_one_and_replace', 'bulk_write',
+}
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+def _record(command_name, collection):
+    requests = _current.get()
+    if requests:
+        requests[-1]['commands'].append((command_name, collection))
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts real wire commands into the request being measured."""
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        _record(event.command_name, collection if isinstance(collection, str) else None)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class _CountingCollection:
+    def __init__(self, collection, write_lock):
+        self._collection = collection
+        self._write_lock = write_lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in WRITES:
+            def counted(*args, **kwargs):
+                _record(name, self._collection.name)
+                with self._write_lock:
+                    return attr(*args, **kwargs)
+            return counted
+        if name in ROUND_TRIPS:
+            def counted(*args, **kwargs):
+                _record(name, self._collection.name)
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class _CountingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self._write_lock = threading.RLock()
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._db[name], self._write_lock)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if name == 'command':
+            def counted(command, *args, **kwargs):
+                _record(command if isinstance(command, str) else next(iter(command)), None)
+                return attr(command, *args, **kwargs)
+            return counted
+        if hasattr(attr, 'insert_one'):  # a collection
+            return _CountingCollection(attr, self._write_lock)
+        return attr
+
+
+class StandInConnection:
+    """Drop-in for MongoConnection backed by mongomock (optional dependency), with command counting."""
+    def __init__(self, db_name):
+        import mongomock
+        self.client = mongomock.MongoClient()
+        self.raw_db = self.client[db_name]
+        self.db = _CountingDatabase(self.raw_db)
+
+    def close(self):
+        pass
+
+
+class BudgetClient(FlaskClient):
+    """
+    Test client that checks every request against its endpoint's @mongo_budget.
+    `budgets` ({endpoint: n}) overrides or adds ceilings; `last_requests` holds
+    [{'endpoint', 'commands': [(command, collection), ...]}] for the latest call.
+    """
+    budgets = None
+    observed = None  # {endpoint: max commands seen}, shared across clients of the app
+
+    def open(self, *args, **kwargs):
+        requests = []
+        token = _current.set(requests)
+        try:
+            response = super().open(*args, **kwargs)
+        finally:
+            _current.reset(token)
+        self.last_requests = requests
+        for entry in requests:
+            self._check(entry)
+        return response
+
+    def _check(self, entry):
+        endpoint, count = entry['endpoint'], len(entry['commands'])
+        if endpoint is None:
+            return
+        if self.observed is not None:
+            self.observed[endpoint] = max(count, self.observed.get(endpoint, 0))
+        budget = budget_for(self.application, endpoint, self.budgets)
+        if budget is not None and count > budget:
+            detail = ', '.join(f'{cmd} {coll or ""}'.strip() for cmd, coll in entry['commands'])
+            raise BudgetExceeded(f'{endpoint} issued {count} Mongo commands (budget {budget}): {detail}')
+
+
+def count_commands(fn, *args, **kwargs):
+    """Call fn outside any request and return (result, [(command, collection), ...]) it issued."""
+    requests = [{'endpoint': None, 'commands': []}]
+    token = _current.set(requests)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _current.reset(token)
+    return result, requests[0]['commands']
+
+
+def budget_for(app, endpoint, overrides=None):
+    if overrides and endpoint in overrides:
+        return overrides[endpoint]
+    view = app.view_functions.get(endpoint)
+    return getattr(view, 'mongo_budget', None)
+
+
+def build_app(mongo_uri=None, db_name='hospital_budget_test', observed=None, budgets=None):
+    """
+    App wired for budget checks: a throwaway database on `mongo_uri`'s server when given,
+    otherwise the in-process stand-in. Hashing runs inline at a low cost factor.
+    """
+    from backend.app import create_app
+    app = create_app({'TESTING': True, 'ENSURE_INDEXES': False, 'PASSWORD_POOL_WORKERS': 0,
+                      'BCRYPT_ROUNDS': 4, 'SLOW_QUERY_MS': 0})
+    if mongo_uri:
+        options = dict(app.mongo.options)
+        options['event_listeners'] = list(options.get('event_listeners', [])) + [CommandCounter()]
+        app.mongo = MongoConnection(with_database(mongo_uri, db_name), **options)
+        app.mongo.client.drop_database(db_name)
+    else:
+        app.mongo = StandInConnection(db_name)
+    return install(app, observed=observed, budgets=budgets)
+
+
+def install(app, observed=None, budgets=None):
+    """Make app.test_client() a BudgetClient and tag each request with its endpoint."""
+    @app.before_request
+    def _tag_endpoint():
+        requests = _current.get()
+        if requests is not None:
+            requests.append({'endpoint': request.endpoint, 'commands': []})
+
+    app.test_client_class = type('AppBudgetClient', (BudgetClient,), {'observed': observed, 'budgets': budgets})
+    return app
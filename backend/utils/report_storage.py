@@ -0,0 +1,184 @@
+import datetime
+import hashlib
+import os
+import tempfile
+from flask import current_app, request, send_file
+from werkzeug.wsgi import wrap_file
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Report file storage.
+# Files are content-addressed: an upload is streamed in CHUNK_BYTES pieces while its
+# SHA-256 is computed, and the digest becomes the report's `file_ref`, so identical
+# uploads share one stored copy. Two backends:
+#   DiskStorage   - <root>/ab/cd/<sha256>; downloads go through send_file, which uses the
+#                   server's sendfile (or X-Sendfile with USE_X_SENDFILE) for the body
+#   GridFSStorage - the `report_files` bucket, one file per digest (unique metadata.sha256)
+# Both answer HTTP Range and If-None-Match / If-Modified-Since requests.
+# The stored content type comes from the uploader, so only PDFs and raster images are served
+# inline under it; anything else is an application/octet-stream attachment. Every download
+# also carries nosniff and a sandboxing CSP, so an uploaded page never runs in the app's origin.
+CHUNK_BYTES = 1024 * 1024
+INLINE_TYPES = frozenset({'application/pdf', 'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/avif',
+                          'image/bmp', 'image/tiff'})
+
+
+def served_as(mimetype, as_attachment):
+    """(mimetype, as_attachment) to send a stored file with: uploader-chosen types only where safe."""
+    mimetype = (mimetype or '').split(';')[0].strip().lower()
+    if mimetype in INLINE_TYPES:
+        return mimetype, as_attachment
+    return 'application/octet-stream', True
+
+
+def _harden(response):
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+def _chunks(stream, max_bytes):
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_BYTES)
+        if not chunk:
+            return
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise FileTooLarge(f'file exceeds {max_bytes} bytes')
+        yield chunk
+
+
+class DiskStorage:
+    name = 'disk'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def save(self, stream, max_bytes=None):
+        """Store the stream's bytes; returns (sha256, size, deduplicated)."""
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        sha, size = hashlib.sha256(), 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in _chunks(stream, max_bytes):
+                    sha.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            digest = sha.hexdigest()
+            path = self._path(digest)
+            if os.path.exists(path):
+                return digest, size, True
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)  # atomic: readers never see a partial file
+            tmp = None
+            return digest, size, False
+        finally:
+            if tmp is not None:
+                os.unlink(tmp)
+
+    def send(self, digest, mimetype, download_name, as_attachment):
+        path = self._path(digest)
+        mimetype, as_attachment = served_as(mimetype, as_attachment)
+        response = send_file(path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             conditional=True, etag=digest, last_modified=os.path.getmtime(path))
+        response.cache_control.private = True
+        return _harden(response)
+
+
+class GridFSStorage:
+    name = 'gridfs'
+    bucket = 'report_files'
+
+    def __init__(self, get_db):
+        self.get_db = get_db
+
+    def _fs(self):
+        import gridfs
+        return gridfs.GridFSBucket(self.get_db(), bucket_name=self.bucket, chunk_size_bytes=255 * 1024)
+
+    def save(self, stream, max_bytes=None):
+        """Stream into a new GridFS file, then keep it only if no file with the same digest exists."""
+        fs = self._fs()
+        files = self.get_db()[f'{self.bucket}.files']
+        sha, size = hashlib.sha256(), 0
+        upload = fs.open_upload_stream('pending')
+        try:
+            for chunk in _chunks(stream, max_bytes):
+                sha.update(chunk)
+                size += len(chunk)
+                upload.write(chunk)
+        except Exception:
+            upload.abort()
+            raise
+        upload.close()
+        digest = sha.hexdigest()
+        if files.find_one({'metadata.sha256': digest}, {'_id': 1}):
+            fs.delete(upload._id)
+            return digest, size, True
+        try:
+            files.update_one({'_id': upload._id}, {'$set': {'filename': digest, 'metadata': {'sha256': digest}}})
+        except DuplicateKeyError:
+            fs.delete(upload._id)  # a concurrent identical upload won
+            return digest, size, True
+        return digest, size, False
+
+    def send(self, digest, mimetype, download_name, as_attachment):
+        from gridfs.errors import NoFile
+        try:
+            grid_out = self._fs().open_download_stream_by_name(digest)
+        except NoFile:
+            raise FileNotFoundError(digest)
+        mimetype, as_attachment = served_as(mimetype, as_attachment)
+        response = current_app.response_class(wrap_file(request.environ, grid_out, CHUNK_BYTES),
+                                              mimetype=mimetype, direct_passthrough=True)
+        response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                             filename=download_name)
+        response.last_modified = grid_out.upload_date
+        response.cache_control.no_cache = True
+        response.cache_control.private = True
+        response.set_etag(digest)
+        _harden(response)
+        # seeks the GridFS stream for Range requests, 304/412 for conditional ones
+        return response.make_conditional(request.environ, accept_ranges=True, complete_length=grid_out.length)
+
+
+def make_storages(app):
+    """Both backends by name; reports record which one holds their file."""
+    return {'disk': DiskStorage(app.config['REPORT_STORAGE_DIR']), 'gridfs': GridFSStorage(lambda: app.db)}
+
+
+def can_access_patient(db, user, patient_id):
+    """Patients see their own files, admins everyone's, doctors those of patients they have an appointment with."""
+    role = (user.role or '').lower()
+    if role == 'admin':
+        return True
+    if role == 'patient':
+        return str(patient_id) == user.get_id()
+    if role == 'doctor':
+        return db.appointments.find_one({'doctor_id': ObjectId(user.get_id()), 'patient_id': patient_id},
+                                        {'_id': 1}) is not None
+    return False
+
+
+def new_report(patient_id, digest, size, storage, filename, content_type, report_type, notes, uploaded_by):
+    return {
+        'patient_id': patient_id,
+        'type': report_type,
+        'file_ref': digest,
+        'storage': storage,
+        'filename': filename,
+        'content_type': content_type,
+        'size': size,
+        'notes': notes,
+        'uploaded_by': uploaded_by,
+        'created_at': datetime.datetime.utcnow(),
+    }
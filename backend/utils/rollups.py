@@ -0,0 +1,111 @@
+import datetime
+
+# Pre-aggregated revenue lives in `revenue_monthly`, one row per (by, key, month):
+#   {by: 'total'|'doctor'|'specialty'|'problem', key: ..., month: 'YYYY-MM', total, bills}
+# Only months touched by bills paid/changed since the stored watermark are regrouped.
+ROLLUP_STATE_ID = 'revenue_monthly'
+DIMENSIONS = {
+    'total': None,
+    'doctor': '$doctor_id',
+    'specialty': '$specialty',
+    'problem': '$problem',
+}
+# Bills written within this window may still be in flight; pick them up next run
+WATERMARK_LAG = datetime.timedelta(seconds=5)
+
+_PAID_AT = {'$ifNull': ['$paid_at', '$date']}
+
+
+def _next_month(dt):
+    return datetime.datetime(dt.year + (dt.month == 12), dt.month % 12 + 1, 1)
+
+
+def _month_filter(months):
+    """Match paid bills whose payment time (paid_at, or date for legacy bills) falls in `months`."""
+    ranges = []
+    for start in months:
+        window = {'$gte': start, '$lt': _next_month(start)}
+        ranges.append({'paid_at': window})
+        ranges.append({'paid_at': {'$exists': False}, 'date': window})
+    return {'status': 'Paid', '$or': ranges}
+
+
+def _regroup(db, match):
+    """Recompute every dimension for the matched bills and upsert the rows via $merge."""
+    for by, key in DIMENSIONS.items():
+        db.billing.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'key': {'$ifNull': [key, 'Unknown']} if key else 'all',
+                    'month': {'$dateToString': {'format': '%Y-%m', 'date': _PAID_AT}},
+                },
+                'total': {'$sum': '$amount'},
+                'bills': {'$sum': 1},
+            }},
+            {'$project': {
+                '_id': 0, 'by': by, 'key': '$_id.key', 'month': '$_id.month',
+                'total': 1, 'bills': 1,
+            }},
+            {'$merge': {
+                'into': 'revenue_monthly',
+                'on': ['by', 'key', 'month'],
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert',
+            }},
+        ])
+
+
+def refresh_revenue_rollups(db, now=None):
+    """
+    Bring `revenue_monthly` up to date. The first run groups all paid bills; later runs
+    find the months touched by bills updated since the watermark and regroup only those.
+    Returns the number of months regrouped (None for a full rebuild).
+    """
+    high = (now or datetime.datetime.utcnow()) - WATERMARK_LAG
+    state = db.rollup_state.find_one({'_id': ROLLUP_STATE_ID})
+    watermark = state.get('watermark') if state else None
+
+    if watermark is None:
+        _regroup(db, {'status': 'Paid'})
+        regrouped = None
+    else:
+        touched = db.billing.aggregate([
+            {'$match': {'updated_at': {'$gt': watermark, '$lte': high}, 'status': 'Paid'}},
+            {'$group': {'_id': {'$dateToString': {'format': '%Y-%m', 'date': _PAID_AT}}}},
+        ])
+        months = [datetime.datetime.strptime(t['_id'], '%Y-%m') for t in touched if t.get('_id')]
+        if months:
+            _regroup(db, _month_filter(months))
+        regrouped = len(months)
+
+    db.rollup_state.update_one(
+        {'_id': ROLLUP_STATE_ID}, {'$set': {'watermark': high}}, upsert=True
+    )
+    return regrouped
+
+
+def rollup_watermark(db):
+    """When `revenue_monthly` was last brought up to date (None if never)."""
+    state = db.rollup_state.find_one({'_id': ROLLUP_STATE_ID}, {'watermark': 1})
+    return state.get('watermark') if state else None
+
+
+def revenue_series(db, by='total', key='all'):
+    """Monthly rows for one dimension value, oldest first: [{label: 'YYYY-MM', total}]."""
+    rows = db.revenue_monthly.find(
+        {'by': by, 'key': key}, {'_id': 0, 'month': 1, 'total': 1}
+    ).sort('month', 1)
+    return [{'label': r['month'], 'total': r.get('total', 0)} for r in rows]
+
+
+def revenue_breakdown(db, by, month=None):
+    """Totals per doctor/specialty/problem, for one month or summed across all months."""
+    match = {'by': by}
+    if month:
+        match['month'] = month
+    return list(db.revenue_monthly.aggregate([
+        {'$match': match},
+        {'$group': {'_id': '$key', 'total': {'$sum': '$total'}, 'bills': {'$sum': '$bills'}}},
+        {'$sort': {'total': -1}},
+    ]))
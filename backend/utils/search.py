@@ -0,0 +1,226 @@
+import re
+import unicodedata
+from flask import current_app, has_app_context, request
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from backend.utils.pagination import Page, encode_cursor, decode_cursor, DEFAULT_PER_PAGE, MAX_PER_PAGE
+
+# User search.
+# Every user document carries `search_keys`: lowercased, accent-free forms of its username,
+# email, full name and each name word, plus phone digits. The multikey indexes
+# (search_keys, _id) and (role, search_keys, _id) answer a prefix as one index range, and
+# the scan is consumed in index order, so a page costs about one page of documents at
+# any collection size. A user is listed once, at its smallest matching key; continuation
+# cursors are (key, _id) and users already passed at a smaller key are skipped.
+# Write paths keep the keys in sync (user_search_keys / set_user_fields);
+# `flask reindex-search` backfills existing users.
+MAX_KEY = 64
+# fields the keys are derived from
+SEARCH_SOURCE_FIELDS = {'username': 1, 'email': 1, 'name': 1, 'phone': 1, 'profile': 1}
+# the values within them that the keys read, which a keyed write checks are unchanged
+_KEYED_VALUES = ('username', 'email', 'name', 'phone',
+                 'profile.first_name', 'profile.last_name', 'profile.name', 'profile.phone')
+SET_ATTEMPTS = 3
+RESULT_FIELDS = {'username': 1, 'email': 1, 'role': 1, 'name': 1, 'phone': 1,
+                 'profile.first_name': 1, 'profile.last_name': 1}
+_PHONE_QUERY = re.compile(r'^\+?[\d\s().-]+$')
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace: 'José  Núñez' -> 'jose nunez'."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return ' '.join(text.split())
+
+
+def _digits(text):
+    return ''.join(c for c in str(text) if c.isdigit())
+
+
+def user_search_keys(user, phones=()):
+    profile = user.get('profile') or {}
+    keys = set()
+    for value in (user.get('username'), user.get('email')):
+        if value:
+            keys.add(normalize(value))
+    full_name = ' '.join(filter(None, (profile.get('first_name'), profile.get('last_name'))))
+    for value in (user.get('name'), profile.get('name'), full_name):
+        name = normalize(value) if value else ''
+        if name:
+            keys.add(name)
+            keys.update(name.split())
+    for value in (user.get('phone'), profile.get('phone'), *phones):
+        digits = _digits(value or '')
+        if len(digits) >= 3:
+            keys.add(digits)
+            if len(digits) > 7:
+                keys.add(digits[-7:])  # local number, without area/country code
+    return sorted({k[:MAX_KEY] for k in keys if k})
+
+
+def updated_search_keys(before, changes):
+    """Keys after applying top-level `changes` (as in a $set) to the `before` document."""
+    return user_search_keys({**(before or {}), **changes})
+
+
+def _known_value(doc, field):
+    value = doc
+    for part in field.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def set_user_fields(db, user_id, changes, known=None, extra_fields=None):
+    """
+    $set top-level `changes` on a user together with the search_keys they imply, in one write.
+    The keys are computed from `changes` plus `known`: the user's other source fields, e.g.
+    the logged-in user's cached document. The write only applies while those fields (and
+    `extra_fields`) still hold the known values. When nothing is known, or another write
+    changed them first, the user is read and the update retried.
+    Returns the document the keys were computed from, or None when the user does not exist.
+    """
+    fields = dict(SEARCH_SOURCE_FIELDS, **dict.fromkeys(extra_fields or (), 1))
+    for attempt in range(SET_ATTEMPTS):
+        if known is None:
+            known = db.users.find_one({'_id': user_id}, fields)
+            if known is None:
+                return None
+        guard = {'_id': user_id}
+        if attempt < SET_ATTEMPTS - 1:  # the last attempt writes what it read, unchecked
+            for field in _KEYED_VALUES + tuple(extra_fields or ()):
+                if field.split('.')[0] not in changes:
+                    guard[field] = _known_value(known, field)
+        update = {'$set': dict(changes, search_keys=updated_search_keys(known, changes))}
+        if db.users.update_one(guard, update).matched_count:
+            return known
+        known = None
+    return None
+
+
+def query_tokens(text):
+    """Normalized tokens of a search box query, longest first; phone-like input becomes one digit run."""
+    text = (text or '').strip()[:2 * MAX_KEY]
+    if _PHONE_QUERY.match(text) and len(_digits(text)) >= 3:
+        return [_digits(text)]
+    return sorted({t[:MAX_KEY] for t in normalize(text).split()}, key=len, reverse=True)
+
+
+def _successor(prefix):
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _prefix(token, low=None):
+    return {'search_keys': {'$elemMatch': {'$gte': max(token, low or token), '$lt': _successor(token)}}}
+
+
+def search_users(db, text, role=None, after=None, limit=DEFAULT_PER_PAGE, projection=None):
+    """
+    Users having a key that starts with each query token, optionally of one role.
+    `after` is a (key, _id) cursor from a previous call. Returns (users, next_cursor).
+    """
+    tokens = query_tokens(text)
+    if not tokens:
+        return [], None
+    lead, high = tokens[0], _successor(tokens[0])
+    seek = tuple(after) if after else None
+
+    query = {'role': role} if role else {}
+    query.update(_prefix(lead, seek[0] if seek else None))
+    if tokens[1:]:
+        query['$and'] = [_prefix(t) for t in tokens[1:]]
+    fields = dict(projection or RESULT_FIELDS, search_keys=1)
+    # the hint pins the scan to index order, which lets it stop after a page
+    index = 'role_search_keys' if role else 'search_keys'
+    try:
+        rows = _scan(db.users.find(query, fields).hint(index).batch_size(limit + 1), lead, high, seek, limit)
+    except OperationFailure as e:
+        # the index is missing (e.g. ensure-indexes not run yet): every match has to be read
+        if has_app_context():
+            current_app.logger.warning("User search without index %s: %s", index, e)
+        rows = _scan(db.users.find(query, fields), lead, high, seek, None)
+
+    rows.sort(key=lambda row: row[0])
+    next_cursor = list(rows[limit - 1][0]) if len(rows) > limit else None
+    return [doc for _, doc in rows[:limit]], next_cursor
+
+
+def _scan(cursor, lead, high, seek, limit):
+    """(position, doc) of the matches after `seek`; stops past `limit` (index order only)."""
+    rows = []
+    try:
+        for doc in cursor:
+            position = (min(k for k in doc.pop('search_keys') if lead <= k < high), doc['_id'])
+            if seek and position <= seek:
+                continue  # listed on an earlier page under a smaller key
+            rows.append((position, doc))
+            if limit is not None and len(rows) > limit:
+                break
+    finally:
+        cursor.close()
+    return rows
+
+
+def search_page(db, text, role=None, per_page=None, projection=None):
+    """search_users() driven by request.args (`after`, `per_page`), as a forward-only Page."""
+    args = request.args
+    try:
+        per_page = int(args.get('per_page', per_page or DEFAULT_PER_PAGE))
+    except ValueError:
+        per_page = DEFAULT_PER_PAGE
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    after = decode_cursor(args['after']) if args.get('after') else None
+    users, next_cursor = search_users(db, text, role=role, after=after if after and len(after) == 2 else None,
+                                      limit=per_page, projection=projection)
+    filters = {'q': text, 'role': role} if role else {'q': text}
+    return Page(users, request.endpoint, args.to_dict(), args.get('sort', 'username'), args.get('order', 'asc'),
+                per_page, encode_cursor(next_cursor) if next_cursor else None, None, filters)
+
+
+def search_records(db, collection, text, query=None, after=None, limit=DEFAULT_PER_PAGE, projection=None):
+    """
+    Full-text search over a collection's text index, best match first.
+    `after` is a (score, _id) cursor from a previous call. Returns (docs, next_cursor).
+    """
+    pipeline = [
+        {'$match': {'$text': {'$search': text}, **(query or {})}},
+        {'$addFields': {'score': {'$meta': 'textScore'}}},
+    ]
+    if after:
+        score, last_id = after
+        pipeline.append({'$match': {'$or': [{'score': {'$lt': score}}, {'score': score, '_id': {'$gt': last_id}}]}})
+    pipeline += [{'$sort': {'score': -1, '_id': 1}}, {'$limit': limit + 1}]
+    if projection:
+        pipeline.append({'$project': dict(projection, score=1)})
+    docs = list(db[collection].aggregate(pipeline))
+    next_cursor = [docs[limit - 1]['score'], docs[limit - 1]['_id']] if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def reindex_search_keys(db, batch_size=1000):
+    """Recompute search_keys for every user, first copying patients' phones onto their user documents."""
+    updated = 0
+    batch = []
+
+    def flush():
+        phones = {p['user_id']: p.get('phone') for p in db.patients.find(
+            {'user_id': {'$in': [u['_id'] for u in batch if u.get('role') == 'patient']}},
+            {'user_id': 1, 'phone': 1})}
+        requests = []
+        for user in batch:
+            changes = {}
+            if phones.get(user['_id']) and not user.get('phone'):
+                changes['phone'] = phones[user['_id']]
+            changes['search_keys'] = updated_search_keys(user, changes)
+            requests.append(UpdateOne({'_id': user['_id']}, {'$set': changes}))
+        db.users.bulk_write(requests, ordered=False)
+        return len(batch)
+
+    for user in db.users.find({}, dict(SEARCH_SOURCE_FIELDS, role=1)).sort('_id', 1).batch_size(batch_size):
+        batch.append(user)
+        if len(batch) >= batch_size:
+            updated += flush()
+            batch = []
+    if batch:
+        updated += flush()
+    return updated
@@ -1,15 +1,15 @@
 # minimal seeding script to create an admin and sample users
 from pymongo import MongoClient
 from bson.objectid import ObjectId
-import bcrypt
 import os
 from config import Config
+from utils.passwords import hash_password
 
 def seed():
     client = MongoClient(Config.MONGO_URI)
     db = client.get_default_database()
     if db.users.count_documents({'role':'admin'}) == 0:
-        admin_pw = bcrypt.hashpw("AdminPass123!".encode('utf-8'), bcrypt.gensalt())
+        admin_pw = hash_password("AdminPass123!")
         db.users.insert_one({
             'username': 'admin',
             'email': 'admin@hospital.example',
@@ -24,7 +24,7 @@ def seed():
 
     # add sample doctor
     if db.users.count_documents({'username':'drsmith'}) == 0:
-        pw = bcrypt.hashpw("Doctor123!".encode('utf-8'), bcrypt.gensalt())
+        pw = hash_password("Doctor123!")
         db.users.insert_one({
             'username': 'drsmith',
             'email': 'drsmith@hospital.example',
@@ -37,7 +37,7 @@ def seed():
 
     # sample patient
     if db.users.count_documents({'username':'patient1'}) == 0:
-        pw = bcrypt.hashpw("Patient123!".encode('utf-8'), bcrypt.gensalt())
+        pw = hash_password("Patient123!")
         db.users.insert_one({
             'username': 'patient1',
             'email': 'patient1@hospital.example',
@@ -0,0 +1,83 @@
+import datetime
+from pymongo.errors import DuplicateKeyError
+
+# Appointment slot reservations. Each document is keyed by
+#   _id = {doctor_id, start}
+# so the always-present unique _id index makes reserving a slot a single atomic insert:
+# two concurrent bookings for the same doctor and slot cannot both succeed.
+# Every reserve/release is also appended to the `slot_reservations` document in
+# `cache_versions` (a version counter plus the last RECENT_CHANGES changes), from which
+# each worker's availability index replays the other workers' bookings.
+ACTIVE_STATUSES = ('pending', 'accepted')
+VERSION_ID = 'slot_reservations'
+RECENT_CHANGES = 500
+
+
+def slot_start(dt, minutes):
+    """Floor a datetime to the beginning of its slot (slots are aligned to midnight)."""
+    midnight = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = (dt - midnight) // datetime.timedelta(minutes=minutes)
+    return midnight + offset * datetime.timedelta(minutes=minutes)
+
+
+def _key(doctor_id, start):
+    return {'doctor_id': doctor_id, 'start': start}
+
+
+def record_slot_change(db, doctor_id, start, booked):
+    """Publish a reserved (booked=True) or released slot to every worker's availability index."""
+    change = {'doctor_id': doctor_id, 'start': start, 'booked': booked}
+    db.cache_versions.update_one(
+        {'_id': VERSION_ID},
+        {'$inc': {'version': 1}, '$push': {'recent': {'$each': [change], '$slice': -RECENT_CHANGES}}},
+        upsert=True
+    )
+
+
+def reserve_slot(db, doctor_id, start, minutes, patient_id, appointment_id):
+    """Claim a slot. Returns True on success, False if it is already taken."""
+    try:
+        db.slot_reservations.insert_one({
+            '_id': _key(doctor_id, start),
+            'doctor_id': doctor_id,
+            'start': start,
+            'end': start + datetime.timedelta(minutes=minutes),
+            'patient_id': patient_id,
+            'appointment_id': appointment_id,
+            'created_at': datetime.datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return False
+    record_slot_change(db, doctor_id, start, True)
+    return True
+
+
+def release_slot(db, appointment):
+    """Free the slot held by an appointment (no-op if it holds none)."""
+    if not appointment or not appointment.get('slot_start'):
+        return
+    result = db.slot_reservations.delete_one({
+        '_id': _key(appointment['doctor_id'], appointment['slot_start']),
+        'appointment_id': appointment['_id']
+    })
+    if result.deleted_count:
+        record_slot_change(db, appointment['doctor_id'], appointment['slot_start'], False)
+
+
+def backfill_reservations(db, minutes):
+    """Create reservations for active appointments booked before slots existed. Returns (reserved, conflicts)."""
+    reserved = conflicts = 0
+    cursor = db.appointments.find(
+        {'status': {'$in': list(ACTIVE_STATUSES)}, 'slot_start': {'$exists': False}},
+        {'doctor_id': 1, 'patient_id': 1, 'datetime': 1}
+    )
+    for appt in cursor:
+        if not isinstance(appt.get('datetime'), datetime.datetime):
+            continue
+        start = slot_start(appt['datetime'], minutes)
+        if reserve_slot(db, appt['doctor_id'], start, minutes, appt.get('patient_id'), appt['_id']):
+            db.appointments.update_one({'_id': appt['_id']}, {'$set': {'slot_start': start}})
+            reserved += 1
+        else:
+            conflicts += 1
+    return reserved, conflicts
@@ -0,0 +1,245 @@
+import copy
+import datetime
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from flask import has_request_context, request
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+from backend.models.indexes import _stages
+
+# Slow Mongo command recorder.
+# A CommandListener notes every command it sees, keeping only the fields a shape or an
+# explain needs (filter, sort, pipeline, ..., never inserted documents or update bodies).
+# When one takes longer than the threshold it queues a copy of them with the endpoint and
+# duration for a background thread that appends it to the capped `slow_queries`
+# collection. For a sample of slow reads the thread also runs explain("executionStats")
+# on the same command (at most once per shape per `explain_interval`), so the admin page
+# can show COLLSCANs and keys/docs examined. Pipelines that write ($merge / $out) are
+# never explained.
+# Nothing is written from the request thread; when the queue is full records are dropped.
+COLLECTION = 'slow_queries'
+EXPLAINABLE = ('find', 'aggregate', 'count', 'distinct')
+WRITE_STAGES = ('$merge', '$out')
+# command fields kept while a command is in flight (everything else is dropped)
+_KEPT_FIELDS = ('filter', 'sort', 'projection', 'hint', 'skip', 'limit', 'collation', 'pipeline', 'cursor',
+                'let', 'query', 'key', 'collection')
+IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'buildInfo', 'endSessions', 'explain',
+                    'saslStart', 'saslContinue', 'authenticate', 'getnonce', 'killCursors'}
+
+
+def _shape(value):
+    """Replace literal values with their type name, keeping operators and field names."""
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in / $nin lists collapse to one element so list length does not split shapes
+        shapes = []
+        for item in value:
+            s = _shape(item)
+            if s not in shapes:
+                shapes.append(s)
+        return shapes
+    return type(value).__name__
+
+
+def query_shape(command_name, command):
+    """Normalized, value-free description of a command, e.g. find on appointments by doctor_id."""
+    collection = command.get('collection' if command_name == 'getMore' else command_name)
+    shape = {'op': command_name, 'collection': collection if isinstance(collection, str) else None}
+    if command_name == 'find':
+        shape['filter'] = _shape(command.get('filter', {}))
+        if command.get('sort'):
+            shape['sort'] = dict(command['sort'])
+    elif command_name == 'aggregate':
+        shape['pipeline'] = [{stage: _shape(spec) if stage == '$match' else '...'}
+                             for step in command.get('pipeline', []) for stage, spec in step.items()]
+    elif command_name in ('count', 'distinct'):
+        shape['filter'] = _shape(command.get('query', {}))
+        if command_name == 'distinct':
+            shape['key'] = command.get('key')
+    elif command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        shape['filter'] = _shape(statements[0].get('q', {}))
+    elif command_name == 'findAndModify':
+        shape['filter'] = _shape(command.get('query', {}))
+    return shape
+
+
+def _essentials(command_name, command):
+    """The parts of `command` that query_shape and explain read; update/delete keep only their first filter."""
+    body = {command_name: command.get(command_name)}
+    body.update((k, command[k]) for k in _KEPT_FIELDS if k in command)
+    if command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        body['updates' if command_name == 'update' else 'deletes'] = [{'q': statements[0].get('q', {})}]
+    return body
+
+
+def _writes(command):
+    return any(stage in step for step in command.get('pipeline', ()) for stage in WRITE_STAGES)
+
+
+def shape_key(shape):
+    text = json.dumps(shape, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16], text
+
+
+def summarize_explain(result):
+    """The parts of an executionStats explain worth keeping."""
+    stats = result.get('executionStats') or {}
+    planner = result.get('queryPlanner') or {}
+    if not stats and 'stages' in result:  # aggregate: plan lives in the $cursor stage
+        for stage in result['stages']:
+            cursor = stage.get('$cursor') if isinstance(stage, dict) else None
+            if cursor:
+                stats = cursor.get('executionStats') or {}
+                planner = cursor.get('queryPlanner') or {}
+                break
+    stages = sorted(set(_stages(planner.get('winningPlan', {}))))
+    return {
+        'stages': stages,
+        'collscan': 'COLLSCAN' in stages,
+        'keys_examined': stats.get('totalKeysExamined'),
+        'docs_examined': stats.get('totalDocsExamined'),
+        'returned': stats.get('nReturned'),
+        'execution_ms': stats.get('executionTimeMillis'),
+    }
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    def __init__(self, get_db, threshold_ms=100, explain_sample=0.1, explain_interval=300,
+                 cap_bytes=16 * 1024 * 1024, queue_size=1000, logger=None):
+        self.get_db = get_db
+        self.threshold = threshold_ms * 1000  # micros, as reported by pymongo
+        self.explain_sample = explain_sample
+        self.explain_interval = explain_interval
+        self.cap_bytes = cap_bytes
+        self.logger = logger
+        self.dropped = 0
+        self._inflight = {}
+        self._explained = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    # ---- listener side (request threads) ----
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS or threading.current_thread() is self._thread:
+            return
+        endpoint = (request.endpoint or 'unmatched') if has_request_context() else 'background'
+        self._inflight[(event.connection_id, event.request_id)] = (
+            _essentials(event.command_name, event.command), event.database_name, endpoint, datetime.datetime.utcnow())
+
+    def succeeded(self, event):
+        entry = self._inflight.pop((event.connection_id, event.request_id), None)
+        if entry is not None and event.duration_micros >= self.threshold:
+            self._submit(event, entry)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+    def _submit(self, event, entry):
+        command, database, endpoint, started = entry
+        self._ensure_writer()
+        try:
+            # copied: the request thread may reuse the filter or pipeline objects it passed in
+            self._queue.put_nowait((started, event.command_name, copy.deepcopy(command),
+                                    database, endpoint, event.duration_micros / 1000))
+        except queue.Full:
+            self.dropped += 1
+
+    # ---- writer side (background thread) ----
+    def _ensure_writer(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # a forked child inherits the queue but not the thread
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='slow-query-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        db = self.get_db()
+        try:
+            db.create_collection(COLLECTION, capped=True, size=self.cap_bytes)
+        except CollectionInvalid:
+            pass  # already exists
+        except Exception as e:
+            if self.logger:
+                self.logger.warning("Could not create capped %s collection: %s", COLLECTION, e)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._record(db, *item)
+            except Exception:
+                # never let one bad record stop the writer
+                if self.logger:
+                    self.logger.exception("Failed to record slow query")
+
+    def _record(self, db, ts, command_name, command, database, endpoint, duration_ms):
+        shape = query_shape(command_name, command)
+        shape_id, shape_text = shape_key(shape)
+        doc = {'ts': ts, 'endpoint': endpoint, 'op': command_name, 'collection': shape['collection'],
+               'shape_id': shape_id, 'shape': shape_text, 'duration_ms': round(duration_ms, 3),
+               'explain': None}
+        if command_name in EXPLAINABLE and not _writes(command) and self._should_explain(shape_id):
+            try:
+                result = db.client[database].command('explain', command, verbosity='executionStats')
+                doc['explain'] = summarize_explain(result)
+            except Exception as e:
+                doc['explain'] = {'error': str(e)}
+        db[COLLECTION].insert_one(doc)
+
+    def _should_explain(self, shape_id):
+        now = time.monotonic()
+        last = self._explained.get(shape_id)
+        if last is not None and now - last < self.explain_interval:
+            return False
+        if random.random() >= self.explain_sample:
+            return False
+        self._explained[shape_id] = now
+        return True
+
+    def stop(self, timeout=5):
+        """Flush queued records and stop this process's writer thread."""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        self._thread = self._pid = None
+
+
+def worst_shapes(db, since=None, limit=50):
+    """Query shapes ordered by total time spent, with their latest explain summary."""
+    match = {'ts': {'$gte': since}} if since else {}
+    return list(db[COLLECTION].aggregate([
+        {'$match': match},
+        {'$sort': {'ts': 1}},
+        {'$group': {
+            '_id': '$shape_id',
+            'shape': {'$last': '$shape'},
+            'op': {'$last': '$op'},
+            'collection': {'$last': '$collection'},
+            'endpoints': {'$addToSet': '$endpoint'},
+            'count': {'$sum': 1},
+            'total_ms': {'$sum': '$duration_ms'},
+            'max_ms': {'$max': '$duration_ms'},
+            'avg_ms': {'$avg': '$duration_ms'},
+            'last_seen': {'$last': '$ts'},
+            # newest non-null explain: BSON null sorts below any document, documents by ts first
+            'explain': {'$max': {'$cond': [{'$ne': ['$explain', None]},
+                                           {'ts': '$ts', 'summary': '$explain'}, None]}},
+        }},
+        {'$sort': {'total_ms': -1}},
+        {'$limit': limit},
+    ]))
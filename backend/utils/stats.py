@@ -0,0 +1,71 @@
+import datetime
+
+# Materialized dashboard counters live in a single document of the `stats` collection:
+# {_id: 'dashboard', roles: {doctor: n, ...}, appointments: n, reconciled_at: datetime}
+STATS_ID = 'dashboard'
+ROLES = ('admin', 'doctor', 'patient', 'nurse', 'receptionist')
+
+
+def bump_role(db, role, delta=1):
+    """Adjust the materialized count for a role after a user insert/delete/role change."""
+    if role:
+        db.stats.update_one({'_id': STATS_ID}, {'$inc': {f'roles.{role}': delta}}, upsert=True)
+
+
+def bump_appointments(db, delta=1):
+    db.stats.update_one({'_id': STATS_ID}, {'$inc': {'appointments': delta}}, upsert=True)
+
+
+def compute_stats(db):
+    """
+    Compute role counts and doctor salaries in one $facet aggregation, plus the appointment
+    count from collection metadata: two round trips whatever the collection sizes.
+    """
+    result = next(db.users.aggregate([
+        {'$facet': {
+            'roles': [{'$group': {'_id': '$role', 'n': {'$sum': 1}}}],
+            'salaries': [
+                {'$match': {'role': 'doctor'}},
+                {'$project': {'username': 1, 'salary': 1}},
+            ],
+        }},
+    ]), {})
+
+    roles = {role: 0 for role in ROLES}
+    for r in result.get('roles', []):
+        if r.get('_id'):
+            roles[r['_id']] = r['n']
+    return {
+        'roles': roles,
+        'appointments': db.appointments.estimated_document_count(),
+        'salaries': result.get('salaries', []),
+    }
+
+
+def reconcile_stats(db):
+    """
+    Recompute the counters from scratch and $set them on the materialized document.
+    Only the computed fields are written, so fields other writers maintain survive; a
+    bump that lands between the count and the write is corrected by the next run.
+    """
+    fresh = compute_stats(db)
+    counters = {f'roles.{role}': n for role, n in fresh['roles'].items()}
+    counters.update(appointments=fresh['appointments'], reconciled_at=datetime.datetime.utcnow())
+    db.stats.update_one({'_id': STATS_ID}, {'$set': counters}, upsert=True)
+    return fresh
+
+
+def get_dashboard_stats(db, max_age):
+    """
+    Return {'roles', 'appointments', 'salaries' (or None)} for the admin dashboard.
+    Reads the materialized document; falls back to the one-shot aggregation (and rewrites
+    the document) when it is missing or older than `max_age` seconds.
+    """
+    doc = db.stats.find_one({'_id': STATS_ID})
+    reconciled_at = doc.get('reconciled_at') if doc else None
+    if not reconciled_at or (datetime.datetime.utcnow() - reconciled_at).total_seconds() > max_age:
+        return reconcile_stats(db)
+
+    roles = {role: 0 for role in ROLES}
+    roles.update(doc.get('roles') or {})
+    return {'roles': roles, 'appointments': doc.get('appointments', 0), 'salaries': None}
@@ -0,0 +1,67 @@
+import datetime
+import heapq
+from itertools import islice
+from bson.objectid import ObjectId
+from backend.utils.pagination import encode_cursor, decode_cursor
+
+# Patient timeline.
+# Each source collection is read through a cursor sorted newest first on its
+# (patient_id, time, _id) index and limited to one page, and heapq.merge interleaves
+# them lazily, so a page of N events reads at most N + 1 documents per collection
+# however long the patient's history is. Ties on time are broken by source order,
+# then _id, which makes (time, source, _id) a total order for the continuation token.
+# (kind, collection, time field, projection)
+SOURCES = (
+    ('appointment', 'appointments', 'datetime', {'problem': 1, 'status': 1, 'doctor_id': 1}),
+    ('prescription', 'prescriptions', 'created_at', {'diagnosis': 1, 'medicines': 1, 'doctor_name': 1}),
+    ('bill', 'billing', 'date', {'description': 1, 'amount': 1, 'status': 1, 'doctor_name': 1}),
+    ('report', 'reports', 'created_at', {'type': 1, 'notes': 1, 'filename': 1}),
+)
+
+
+def _after(time_field, rank, token):
+    """Filter for this source's events that sort strictly after the token in (time, rank, _id) descending order."""
+    if token is None:
+        return {time_field: {'$type': 'date'}}
+    last_time, last_rank, last_id = token
+    if rank < last_rank:
+        return {time_field: {'$type': 'date', '$lte': last_time}}
+    if rank > last_rank:
+        return {time_field: {'$type': 'date', '$lt': last_time}}
+    return {'$or': [{time_field: {'$type': 'date', '$lt': last_time}}, {time_field: last_time, '_id': {'$lt': last_id}}]}
+
+
+def _valid_token(values):
+    """A decoded token is [time, rank, _id]; anything else (tampered, stale format) restarts at the newest."""
+    return (isinstance(values, list) and len(values) == 3 and isinstance(values[0], datetime.datetime)
+            and type(values[1]) is int and 0 <= values[1] < len(SOURCES) and isinstance(values[2], ObjectId))
+
+
+def _events(cursor, kind, time_field, rank):
+    for doc in cursor:
+        yield (doc[time_field], rank, doc['_id']), kind, doc
+
+
+def patient_timeline(db, patient_id, token=None, limit=20):
+    """
+    Newest-first events of one patient across all sources.
+    Returns ([{'kind', 'time', 'doc'}], next_token); pass next_token back for older events.
+    """
+    after = decode_cursor(token) if token else None
+    if not _valid_token(after):
+        after = None
+    cursors, streams = [], []
+    for rank, (kind, collection, time_field, fields) in enumerate(SOURCES):
+        query = {'patient_id': patient_id, **_after(time_field, rank, after)}
+        cursor = (db[collection].find(query, dict(fields, **{time_field: 1}))
+                  .sort([(time_field, -1), ('_id', -1)]).limit(limit + 1).batch_size(limit + 1))
+        cursors.append(cursor)
+        streams.append(_events(cursor, kind, time_field, rank))
+    try:
+        page = list(islice(heapq.merge(*streams, key=lambda e: e[0], reverse=True), limit + 1))
+    finally:
+        for cursor in cursors:
+            cursor.close()
+
+    next_token = encode_cursor(list(page[limit - 1][0])) if len(page) > limit else None
+    return [{'kind': kind, 'time': key[0], 'doc': doc} for key, kind, doc in page[:limit]], next_token
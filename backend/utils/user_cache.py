@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# The fields User.__init__ reads plus the other search key sources, so profile writes can
+# compute search_keys from the logged-in user; keeps the password hash out of the hot path
+USER_LOADER_FIELDS = {'username': 1, 'email': 1, 'role': 1, 'profile': 1, 'name': 1, 'phone': 1}
+
+# Cross-worker invalidation. Writers bump `cache_versions` {_id: 'users'}: the version counter
+# and the id appended to `recent` (the last RECENT_IDS ids) in one atomic update. A background
+# thread in each worker reads that document every `check_seconds` and evicts the ids written
+# since its last look, or everything when it fell more than RECENT_IDS writes behind. So a
+# demoted or deleted user keeps a stale role in other workers for at most ~check_seconds,
+# and the request path never pays for the check.
+VERSION_ID = 'users'
+RECENT_IDS = 200
+
+
+class UserCache:
+    """
+    Per-process LRU cache with a TTL, used by the Flask-Login user_loader.
+    Entries are dropped through invalidate() in the writing worker and by the version
+    watcher in every other one.
+    """
+    def __init__(self, maxsize=1024, ttl=60, get_db=None, check_seconds=2, logger=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.get_db = get_db
+        self.check_seconds = check_seconds
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+
+    def get(self, key):
+        self._ensure_watcher()
+        key = str(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        key = str(key)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(str(key), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    # ---- version watcher (background thread) ----
+    def _ensure_watcher(self):
+        if self.get_db is None or (self._watcher is not None and self._watcher_pid == os.getpid()):
+            return
+        with self._lock:
+            if self._watcher is None or self._watcher_pid != os.getpid():
+                # a forked child inherits the cache but not the thread
+                self._data.clear()
+                self._version = None
+                self._stop = threading.Event()
+                self._watcher_pid = os.getpid()
+                self._watcher = threading.Thread(target=self._watch, name='user-cache-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            try:
+                self.apply_versions(self.get_db().cache_versions.find_one({'_id': VERSION_ID}))
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning("User cache version check failed: %s", e)
+            if self._stop.wait(self.check_seconds):
+                return
+
+    def apply_versions(self, doc):
+        """Evict the users written since the last check according to the version document."""
+        version = doc.get('version', 0) if doc else 0
+        recent = doc.get('recent', []) if doc else []
+        if self._version is None or version < self._version or version - self._version > len(recent):
+            # first look (entries may predate it), a reset counter, or too far behind
+            self.clear()
+        else:
+            for user_id in recent[len(recent) - (version - self._version):]:
+                self.invalidate(user_id)
+        self._version = version
+
+    def stop(self, timeout=5):
+        watcher = self._watcher
+        if watcher is not None and self._watcher_pid == os.getpid():
+            self._stop.set()
+            watcher.join(timeout)
+        self._watcher = self._watcher_pid = None
+
+
+def bump_user_version(db, user_id):
+    """Record a write to a user so every worker's watcher evicts it."""
+    db.cache_versions.update_one(
+        {'_id': VERSION_ID},
+        {'$inc': {'version': 1}, '$push': {'recent': {'$each': [str(user_id)], '$slice': -RECENT_IDS}}},
+        upsert=True
+    )
+
+
+def invalidate_user(user_id):
+    """
+    Drop a user from the loader cache after writing to it: at once in this worker,
+    within USER_CACHE_CHECK_SECONDS in the others.
+    """
+    if not user_id:
+        return
+    cache = getattr(current_app, 'user_cache', None)
+    if cache is not None:
+        cache.invalidate(user_id)
+    bump_user_version(current_app.db, user_id)
@@ -0,0 +1,128 @@
+"""
+Response compression benchmark.
+
+Seeds a synthetic hospital (same generator and options as load_test.py), renders
+the large table pages once per endpoint, then reports for each encoder/level the CPU
+time spent compressing one response against the bytes it saves, plus end-to-end
+request latency with and without Accept-Encoding through the real middleware.
+
+    python benchmarks/compression_bench.py --standin --patients 5000 --call-logs 20000 \\
+        --output bench-results/compression.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import build_app, seed, login, percentiles, git_revision  # noqa: E402
+
+# (role, endpoint label, path)
+ENDPOINTS = [
+    ('admin', 'admin.manage_users', '/admin/manage_users'),
+    ('admin', 'admin.entries', '/admin/entries'),
+    ('receptionist', 'receptionist.call_logs_page', '/receptionist/call_logs'),
+    ('receptionist', 'receptionist.schedule_page', '/receptionist/schedule'),
+]
+
+
+def encoder_grid():
+    from backend.utils import compression
+    grid = [('gzip', level) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        grid += [('br', quality) for quality in (1, 4, 11)]
+    return grid
+
+
+def compress_cost(body, encoding, level, repeat):
+    """CPU seconds per response and compressed size, using the middleware's streaming encoder."""
+    from backend.utils.compression import encoder
+    started = time.process_time()
+    for _ in range(repeat):
+        z = encoder(encoding, level=level, brotli_quality=level)
+        size = len(z.compress(body)) + len(z.finish())
+    return (time.process_time() - started) / repeat, size
+
+
+def timed_requests(client, path, headers, n):
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        resp = client.get(path, headers=headers)
+        resp.get_data()
+        samples.append(time.perf_counter() - started)
+        resp.close()
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--call-logs', type=int, default=5000)
+    parser.add_argument('--bcrypt-rounds', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-name', default='hospital_bench', help='database dropped and re-seeded')
+    parser.add_argument('--standin', action='store_true', help='use in-process mongomock instead of mongod')
+    parser.add_argument('--repeat', type=int, default=20, help='compressions per encoder/level')
+    parser.add_argument('--requests', type=int, default=20, help='end-to-end requests per endpoint and encoding')
+    parser.add_argument('--output', help='write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    app = build_app(args)
+    from backend.utils import passwords
+    passwords.configure(rounds=args.bcrypt_rounds)
+    accounts = seed(app.mongo.db, args)
+    clients = {}
+    for role in ('admin', 'receptionist'):
+        clients[role] = app.test_client()
+        login(clients[role], accounts[role]['username'], role)
+
+    endpoints = {}
+    for role, label, path in ENDPOINTS:
+        client = clients[role]
+        resp = client.get(path)
+        body = resp.get_data()
+        if resp.status_code != 200:
+            endpoints[label] = {'error': resp.status_code}
+            continue
+        encoders = {}
+        for encoding, level in encoder_grid():
+            cpu, size = compress_cost(body, encoding, level, args.repeat)
+            saved = len(body) - size
+            encoders[f'{encoding}-{level}'] = {
+                'bytes': size,
+                'saved_bytes': saved,
+                'ratio': round(size / len(body), 4),
+                'cpu_ms': round(cpu * 1000, 3),
+                'cpu_us_per_kb_saved': round(cpu * 1e6 / (saved / 1024), 2) if saved > 0 else None,
+            }
+        endpoints[label] = {
+            'identity_bytes': len(body),
+            'encoders': encoders,
+            'latency_identity': timed_requests(client, path, {}, args.requests),
+            'latency_gzip': timed_requests(client, path, {'Accept-Encoding': 'gzip'}, args.requests),
+        }
+
+    report = {
+        'revision': git_revision(),
+        'backend': 'mongomock' if args.standin else 'mongod',
+        'dataset': {'doctors': args.doctors, 'patients': args.patients,
+                    'appointments': args.appointments, 'call_logs': args.call_logs},
+        'middleware': {k: app.config[k] for k in ('COMPRESSION_MIN_SIZE', 'COMPRESSION_LEVEL',
+                                                  'COMPRESSION_BROTLI_QUALITY')},
+        'endpoints': endpoints,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            fh.write(text + '\n')
+    app.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+End-to-end load benchmark for each role's hot endpoints.
+
+Boots create_app() in-process against a MongoDB (default: a throwaway database on
+MONGO_URI's server) or, with --standin, an in-process mongomock database, seeds
+a synthetic hospital, logs in one session per role and drives a weighted mix of
+requests through Flask test clients from --concurrency threads.
+
+Reports per-endpoint p50/p95/p99 latency, throughput, error count and Mongo
+commands per request (wire commands against mongod, collection calls with --standin),
+and writes the report as JSON (--output) so runs can be diffed across commits.
+
+    python benchmarks/load_test.py --doctors 500 --patients 200000 --appointments 5000000 \\
+        --duration 60 --concurrency 8 --output bench-results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BENCH_PASSWORD = 'bench-password'
+PROBLEMS = ['Fever', 'Chest Pain', 'Skin Rash', 'Headache', 'Stomach Pain', 'Joint Pain', 'Back Pain']
+
+# (role, endpoint label, method, path, weight); {doctor_id} is filled per request
+WORKLOAD = [
+    ('doctor', 'doctor.dashboard', 'GET', '/doctor/', 10),
+    ('doctor', 'doctor.doctor_appointments', 'GET', '/doctor/appointments', 6),
+    ('doctor', 'doctor.patients', 'GET', '/doctor/patients', 4),
+    ('doctor', 'doctor.view_prescriptions', 'GET', '/doctor/view_prescriptions', 4),
+    ('patient', 'patient.dashboard', 'GET', '/patient/', 10),
+    ('patient', 'patient.book_appointment', 'GET', '/patient/book', 6),
+    ('patient', 'patient.book_appointment[POST]', 'POST', '/patient/book', 3),
+    ('patient', 'patient.billing', 'GET', '/patient/billing', 3),
+    ('patient', 'patient.prescriptions', 'GET', '/patient/prescriptions', 3),
+    ('anonymous', 'auth.login', 'POST', '/login', 4),
+    ('admin', 'admin.dashboard', 'GET', '/admin/', 2),
+    ('admin', 'admin.manage_users', 'GET', '/admin/manage_users', 1),
+    ('nurse', 'nurse.dashboard', 'GET', '/nurse/', 3),
+    ('receptionist', 'receptionist.call_logs_page', 'GET', '/receptionist/call_logs', 2),
+]
+
+
+# ---------------- Seeding ---------------- #
+def seed(db, args):
+    """Create a synthetic hospital with the shared generator; returns the benchmark login accounts."""
+    from backend.utils import datagen
+    counts = {'doctors': args.doctors, 'nurses': max(1, args.doctors // 2),
+              'receptionists': max(1, args.doctors // 20), 'patients': args.patients,
+              'appointments': args.appointments, 'call_logs': args.call_logs}
+    plan = datagen.make_plan(counts, seed=args.seed, password=BENCH_PASSWORD, rounds=args.bcrypt_rounds)
+    datagen.generate(db, plan)
+    # the benchmark logs in as the first account of each role
+    return {'doctor': {'username': 'doctor0'}, 'patient': {'username': 'patient0'},
+            'admin': {'username': 'admin'}, 'nurse': {'username': 'nurse0'},
+            'receptionist': {'username': 'receptionist0'},
+            'doctor_ids': [datagen.oid(args.seed, 'doctor', i) for i in range(args.doctors)]}
+
+
+# ---------------- Driving traffic ---------------- #
+def login(client, username, role):
+    resp = client.post('/login', data={'username': username, 'password': BENCH_PASSWORD,
+                                       'expected_role': role})
+    if resp.status_code != 302:
+        raise RuntimeError(f'login failed for {username}')
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+            'max_ms': round(ordered[-1] * 1000, 3)}
+
+
+def worker(app, accounts, args, deadline, results, lock, seed_value):
+    from backend.utils.query_budget import count_commands
+    rng = random.Random(seed_value)
+    clients = {}
+    for role in ('doctor', 'patient', 'admin', 'nurse', 'receptionist'):
+        client = app.test_client()
+        login(client, accounts[role]['username'], role)
+        clients[role] = client
+    clients['anonymous'] = app.test_client()
+
+    weights = [w[4] for w in WORKLOAD]
+    local = {}
+    while time.perf_counter() < deadline:
+        role, label, method, path, _ = rng.choices(WORKLOAD, weights)[0]
+        client = clients[role]
+        data = None
+        if label == 'auth.login':
+            data = {'username': accounts['patient']['username'], 'password': BENCH_PASSWORD}
+        elif method == 'POST':
+            when = datetime.datetime.now() + datetime.timedelta(days=rng.randint(1, 60), minutes=30 * rng.randint(0, 47))
+            data = {'problem': rng.choice(PROBLEMS), 'doctor': str(rng.choice(accounts['doctor_ids'])),
+                    'date': when.strftime('%Y-%m-%d'), 'time': when.strftime('%H:%M')}
+
+        commands = []
+        started = time.perf_counter()
+        try:
+            resp, commands = count_commands(client.open, path, method=method, data=data)
+            ok = resp.status_code < 400
+            resp.close()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+
+        stats = local.setdefault(label, {'latencies': [], 'errors': 0, 'commands': 0})
+        stats['latencies'].append(elapsed)
+        stats['commands'] += len(commands)
+        if not ok:
+            stats['errors'] += 1
+
+    with lock:
+        for label, stats in local.items():
+            merged = results.setdefault(label, {'latencies': [], 'errors': 0, 'commands': 0})
+            merged['latencies'].extend(stats['latencies'])
+            merged['errors'] += stats['errors']
+            merged['commands'] += stats['commands']
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def build_app(args):
+    from backend.app import create_app
+    from backend.models.indexes import ensure_indexes
+    from backend.utils.mongo import MongoConnection, with_database
+    from backend.utils.query_budget import CommandCounter, StandInConnection
+
+    app = create_app({'TESTING': True, 'ENSURE_INDEXES': False})
+    if args.standin:
+        app.mongo = StandInConnection(args.db_name)
+    else:
+        # same client settings, pointed at the throwaway database, with command counting
+        # (the stand-in counts its collection calls itself)
+        options = dict(app.mongo.options)
+        options['event_listeners'] = list(options.get('event_listeners', [])) + [CommandCounter()]
+        app.mongo = MongoConnection(with_database(app.config['MONGO_URI'], args.db_name), **options)
+        app.mongo.client.drop_database(args.db_name)
+        ensure_indexes(app.mongo.db, app.logger)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--appointments', type=int, default=20000)
+    parser.add_argument('--call-logs', type=int, default=5000)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of traffic')
+    parser.add_argument('--concurrency', type=int, default=4, help='client threads')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db-name', default='hospital_bench', help='database dropped and re-seeded')
+    parser.add_argument('--standin', action='store_true', help='use in-process mongomock instead of mongod')
+    parser.add_argument('--output', help='write the JSON report here as well as stdout')
+    args = parser.parse_args()
+
+    app = build_app(args)
+    from backend.utils import passwords
+    passwords.configure(rounds=args.bcrypt_rounds)
+    seed_started = time.perf_counter()
+    accounts = seed(app.mongo.db, args)
+    seed_seconds = time.perf_counter() - seed_started
+
+    results, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=worker, args=(app, accounts, args, deadline, results, lock, args.seed + i))
+               for i in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    endpoints = {}
+    for label, stats in sorted(results.items()):
+        n = len(stats['latencies'])
+        endpoints[label] = dict(
+            requests=n,
+            errors=stats['errors'],
+            throughput_rps=round(n / args.duration, 2),
+            mongo_commands_per_request=round(stats['commands'] / n, 2),
+            **percentiles(stats['latencies'])
+        )
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+        'backend': 'mongomock' if args.standin else 'mongod',
+        'dataset': {'doctors': args.doctors, 'patients': args.patients,
+                    'appointments': args.appointments, 'call_logs': args.call_logs},
+        'seed_seconds': round(seed_seconds, 2),
+        'duration_s': args.duration,
+        'concurrency': args.concurrency,
+        'endpoints': endpoints,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as fh:
+            fh.write(text + '\n')
+    app.shutdown()
+
+
+if __name__ == '__main__':
+    main()
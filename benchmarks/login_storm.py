@@ -0,0 +1,101 @@
+"""
+Login storm benchmark.
+
+Measures latency of a cheap non-login endpoint (default /health) first on an idle
+server, then while `--concurrency` clients hammer POST /login, and reports login
+throughput. Run against a server started with gunicorn_config.py, e.g.
+
+    python benchmarks/login_storm.py --base-url http://127.0.0.1:8000 \\
+        --username patient1 --password password123 --concurrency 32 --duration 20
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {'count': len(ordered), 'p50_ms': pick(0.50), 'p95_ms': pick(0.95),
+            'p99_ms': pick(0.99), 'mean_ms': round(statistics.mean(ordered) * 1000, 2)}
+
+
+def probe(url, stop, samples, interval):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            urllib.request.urlopen(url, timeout=30).read()
+            samples.append(time.perf_counter() - started)
+        except urllib.error.URLError:
+            pass
+        time.sleep(interval)
+
+
+def login_client(url, body, stop, counter, lock):
+    opener = urllib.request.build_opener(_NoRedirect)
+    while not stop.is_set():
+        try:
+            opener.open(urllib.request.Request(url, data=body, method='POST'), timeout=30).read()
+        except urllib.error.HTTPError:
+            pass  # 302 after login is surfaced as HTTPError with redirects disabled
+        except urllib.error.URLError:
+            continue
+        with lock:
+            counter[0] += 1
+
+
+def run_phase(args, storm):
+    stop = threading.Event()
+    samples = []
+    logins = [0]
+    lock = threading.Lock()
+    threads = [threading.Thread(target=probe, args=(args.base_url + args.probe_path, stop, samples, args.probe_interval))]
+    if storm:
+        body = urllib.parse.urlencode({'username': args.username, 'password': args.password}).encode()
+        threads += [threading.Thread(target=login_client, args=(args.base_url + '/login', body, stop, logins, lock))
+                    for _ in range(args.concurrency)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=35)
+    result = {'probe': _percentiles(samples)}
+    if storm:
+        result['logins'] = logins[0]
+        result['logins_per_second'] = round(logins[0] / args.duration, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--probe-path', default='/health')
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    args = parser.parse_args()
+
+    report = {'idle': run_phase(args, storm=False), 'login_storm': run_phase(args, storm=True)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
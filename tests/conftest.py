@@ -0,0 +1,33 @@
+import io
+import pytest
+from backend.utils import datagen
+from backend.utils.report_storage import new_report
+
+pytest_plugins = ['backend.pytest_plugin']
+
+SEED = 7
+COUNTS = {'doctors': 3, 'nurses': 2, 'receptionists': 1, 'patients': 5, 'appointments': 40,
+          'schedules': 10, 'nurse_shifts': 5, 'call_logs': 5}
+# the login fixture's default password is the generator's default
+ACCOUNTS = {'admin': 'admin', 'doctor': 'doctor0', 'nurse': 'nurse0', 'receptionist': 'receptionist0',
+            'patient': 'patient0'}
+
+
+@pytest.fixture
+def hospital(budget_db):
+    """A small synthetic hospital (backend.utils.datagen) in the budget app's database."""
+    plan = datagen.make_plan(COUNTS, seed=SEED, rounds=4)
+    datagen.generate(budget_db, plan)
+    return plan
+
+
+@pytest.fixture
+def report_id(budget_app, budget_db, hospital, tmp_path):
+    """A report of patient0 whose file is stored on disk under tmp_path."""
+    storage = budget_app.report_storages['disk']
+    storage.root = str(tmp_path)
+    digest, size, _ = storage.save(io.BytesIO(b'%PDF-1.4 report'))
+    patient = budget_db.users.find_one({'username': ACCOUNTS['patient']})
+    doc = new_report(patient['_id'], digest, size, storage.name, 'report.pdf', 'application/pdf',
+                     'Blood test', '', patient['_id'])
+    return budget_db.reports.insert_one(doc).inserted_id
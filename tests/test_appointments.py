@@ -0,0 +1,61 @@
+import datetime
+import threading
+from backend.utils import datagen
+from conftest import SEED
+
+BOOKINGS = 200
+
+
+def test_parallel_bookings_of_one_slot_have_one_winner(budget_app, budget_db, hospital, login):
+    doctor_id = datagen.oid(SEED, 'doctor', 0)
+    # well past the generated calendar, so the slot starts out free
+    day = (hospital['anchor'] + datetime.timedelta(days=400)).date().isoformat()
+    form = {'problem': 'Fever', 'doctor': str(doctor_id), 'date': day, 'time': '10:00'}
+
+    clients = []
+    for i in range(BOOKINGS):
+        client = budget_app.test_client()
+        login(client, f'patient{i % 5}', 'patient')
+        clients.append(client)
+    start = threading.Barrier(BOOKINGS)
+    statuses, errors = [], []
+
+    def book(client):
+        start.wait()
+        try:
+            statuses.append(client.post('/patient/book', data=form).status_code)
+        except Exception as e:  # surfaced below; a thread would swallow it
+            errors.append(e)
+
+    threads = [threading.Thread(target=book, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert statuses == [302] * BOOKINGS
+    slot = datetime.datetime.fromisoformat(f'{day}T10:00')
+    assert budget_db.appointments.count_documents({'doctor_id': doctor_id, 'slot_start': slot}) == 1
+    assert budget_db.slot_reservations.count_documents({'doctor_id': doctor_id, 'start': slot}) == 1
+    assert budget_db.billing.count_documents({'doctor_id': doctor_id, 'appointment_datetime': slot}) == 1
+
+
+def test_cancelled_appointment_cannot_be_accepted(budget_app, budget_db, hospital, login):
+    doctor_id = datagen.oid(SEED, 'doctor', 0)
+    appt = budget_db.appointments.find_one({'doctor_id': doctor_id, 'status': 'pending'})
+    patient = budget_db.users.find_one({'_id': appt['patient_id']})
+
+    patient_client = budget_app.test_client()
+    login(patient_client, patient['username'], 'patient')
+    patient_client.post(f"/patient/cancel/{appt['_id']}")
+    assert budget_db.slot_reservations.count_documents({'appointment_id': appt['_id']}) == 0
+
+    doctor_client = budget_app.test_client()
+    login(doctor_client, 'doctor0', 'doctor')
+    doctor_client.post(f"/doctor/appointments/{appt['_id']}/status", data={'status': 'Accepted'})
+    assert budget_db.appointments.find_one({'_id': appt['_id']})['status'] == 'cancelled'
+
+    # and a second cancel does not release a slot someone else may hold by now
+    patient_client.post(f"/patient/cancel/{appt['_id']}")
+    assert budget_db.appointments.find_one({'_id': appt['_id']})['status'] == 'cancelled'
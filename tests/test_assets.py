@@ -0,0 +1,78 @@
+import os
+
+from backend.utils.assets import StaticAssets, build
+from conftest import ACCOUNTS
+
+
+def _static(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'css').mkdir(parents=True)
+    (static / 'images').mkdir()
+    (static / 'images' / 'bg.png').write_bytes(b'not really a png')
+    (static / 'css' / 'main.css').write_text(
+        "body { background: url('../images/bg.png?v=1') }\n"
+        ".x { background: url(data:image/gif;base64,AAAA) }\n"
+        ".y { background: url(https://cdn.example.com/y.png) }\n")
+    return static
+
+
+def test_css_urls_point_at_hashed_assets(tmp_path):
+    static = _static(tmp_path)
+    out = tmp_path / 'build'
+    manifest = build(str(static), str(out))
+    css = (out / manifest['css/main.css']['path']).read_text()
+    hashed_bg = os.path.basename(manifest['images/bg.png']['path'])
+    assert f"url('../images/{hashed_bg}?v=1')" in css
+    assert 'url(data:image/gif;base64,AAAA)' in css
+    assert 'url(https://cdn.example.com/y.png)' in css
+
+    # a changed image changes the stylesheet's hash too
+    (static / 'images' / 'bg.png').write_bytes(b'another image')
+    rebuilt = build(str(static), str(out))
+    assert rebuilt['css/main.css']['path'] != manifest['css/main.css']['path']
+
+
+def test_rebuild_replaces_the_directory_whole(tmp_path):
+    static = _static(tmp_path)
+    out = tmp_path / 'build'
+    out.mkdir()
+    (out / 'stale.txt').write_text('from an older build')
+    build(str(static), str(out))
+    assert not (out / 'stale.txt').exists()
+    assert (out / 'manifest.json').exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['build', 'static']
+
+
+def test_pages_use_picture_for_images(budget_app):
+    response = budget_app.test_client().get('/')
+    assert response.status_code == 200
+    assert b'<picture>' in response.data
+    assert b'images/hero-hospital' in response.data
+
+
+def test_rebuild_keeps_the_previous_builds_files(tmp_path):
+    static = _static(tmp_path)
+    out = tmp_path / 'build'
+    paths = []
+    for n in range(4):
+        (static / 'images' / 'bg.png').write_bytes(f'image {n}'.encode())
+        paths.append(build(str(static), str(out), keep=2)['images/bg.png']['path'])
+    # the current build and the two before it are on disk, the oldest is pruned
+    assert [(out / p).exists() for p in paths] == [False, True, True, True]
+
+    assets = StaticAssets(str(out))
+    assert all(assets.serves(p) for p in paths[1:])
+    assert not assets.serves(paths[0])
+
+
+def test_page_etags_follow_the_asset_manifest(budget_app, budget_client, hospital, login):
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    etag = budget_client.get('/patient/prescriptions').headers['ETag']
+    assert budget_client.get('/patient/prescriptions', headers={'If-None-Match': etag}).status_code == 304
+    budget_app.assets.digest = 'rebuilt'
+    try:
+        response = budget_client.get('/patient/prescriptions', headers={'If-None-Match': etag})
+    finally:
+        budget_app.assets.reload()
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
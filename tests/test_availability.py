@@ -0,0 +1,73 @@
+import datetime
+import threading
+
+from backend.utils.availability import AvailabilityIndex
+from backend.utils.slots import VERSION_ID, RECENT_CHANGES, reserve_slot, release_slot
+
+HOURS = (datetime.time(9), datetime.time(17))
+
+
+def _index():
+    # no get_db: the tests drive apply_changes themselves instead of a watcher thread
+    return AvailabilityIndex(30, HOURS)
+
+
+def _next_morning():
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    return datetime.datetime.combine(tomorrow, datetime.time(0))
+
+
+def test_bookings_of_other_workers_are_replayed(budget_db, hospital):
+    here, there = _index(), _index()
+    here.ensure_fresh(budget_db)
+    there.ensure_fresh(budget_db)
+    start, cal = there.next_free('', _next_morning(), 1)[0]
+
+    # booked and then released by "there"; "here" only learns of it from the change log
+    assert reserve_slot(budget_db, cal.doctor_id, start, 30, None, 'appt')
+    assert here.apply_changes(budget_db.cache_versions.find_one({'_id': VERSION_ID}))
+    assert (start, cal.doctor_id) not in [(s, c.doctor_id) for s, c in here.next_free('', start, 50)]
+
+    release_slot(budget_db, {'_id': 'appt', 'doctor_id': cal.doctor_id, 'slot_start': start})
+    assert here.apply_changes(budget_db.cache_versions.find_one({'_id': VERSION_ID}))
+    assert here.next_free('', start, 1)[0][0] == start
+
+
+def test_too_far_behind_asks_for_a_rebuild(budget_db, hospital):
+    index = _index()
+    index.ensure_fresh(budget_db)
+    doc = budget_db.cache_versions.find_one({'_id': VERSION_ID}) or {}
+    ahead = {'version': doc.get('version', 0) + RECENT_CHANGES + 1, 'recent': [{}] * RECENT_CHANGES}
+    assert not index.apply_changes(ahead)
+
+
+def test_first_build_is_single_flight(budget_db, hospital, monkeypatch):
+    index = _index()
+    builds = []
+    rebuild = index.rebuild
+    monkeypatch.setattr(index, 'rebuild', lambda db: builds.append(1) or rebuild(db))
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        index.ensure_fresh(budget_db)
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert builds == [1]
+
+
+def test_timezone_aware_after_matches_its_local_time(budget_client, budget_db, hospital, login):
+    login(budget_client, 'patient0', 'patient')
+    specialty = budget_db.users.find_one({'role': 'doctor'})['profile']['specialty']
+    local = _next_morning() + datetime.timedelta(hours=10)
+    aware = local.astimezone().astimezone(datetime.timezone(datetime.timedelta(hours=5, minutes=30)))
+
+    def slots(after):
+        response = budget_client.get('/patient/availability',
+                                     query_string={'specialty': specialty, 'after': after.isoformat()})
+        assert response.status_code == 200
+        return response.get_json()['slots']
+    assert slots(aware) == slots(local) != []
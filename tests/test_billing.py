@@ -0,0 +1,15 @@
+from conftest import ACCOUNTS
+
+
+def test_paying_a_paid_bill_keeps_its_payment_time(budget_app, budget_client, budget_db, hospital, login):
+    patient = budget_db.users.find_one({'username': ACCOUNTS['patient']})
+    bill = budget_db.billing.find_one({'patient_id': patient['_id'], 'status': 'Unpaid'})
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+
+    budget_client.post(f"/patient/billing/pay/{bill['_id']}")
+    paid = budget_db.billing.find_one({'_id': bill['_id']})
+    assert paid['status'] == 'Paid'
+
+    budget_client.post(f"/patient/billing/pay/{bill['_id']}")
+    again = budget_db.billing.find_one({'_id': bill['_id']})
+    assert (again['paid_at'], again['updated_at']) == (paid['paid_at'], paid['updated_at'])
@@ -0,0 +1,71 @@
+import gzip
+from werkzeug.wsgi import FileWrapper
+
+from backend.utils.compression import CompressionMiddleware
+
+
+class ClosingBody:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def _app(body, headers):
+    def app(environ, start_response):
+        start_response('200 OK', headers)
+        return body
+    return app
+
+
+def _call(middleware, encoding='gzip'):
+    seen = {}
+
+    def start_response(status, headers, exc_info=None):
+        seen.update(status=status, headers=dict(headers))
+    result = middleware({'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': encoding}, start_response)
+    return result, seen['headers']
+
+
+def test_pass_through_returns_the_apps_iterable(tmp_path):
+    path = tmp_path / 'scan.png'
+    path.write_bytes(b'\x89PNG' * 1000)
+    body = FileWrapper(open(path, 'rb'))
+    middleware = CompressionMiddleware(_app(body, [('Content-Type', 'image/png')]), min_size=10)
+    result, headers = _call(middleware)
+    assert result is body
+    assert 'Content-Encoding' not in headers
+    body.close()
+
+
+def test_compressed_body_is_closed_without_iterating():
+    body = ClosingBody([b'x' * 2000])
+    middleware = CompressionMiddleware(_app(body, [('Content-Type', 'text/csv')]), min_size=10)
+    result, headers = _call(middleware)
+    assert headers['Content-Encoding'] == 'gzip'
+    result.close()
+    assert body.closed
+
+
+def test_streamed_body_is_compressed_and_closed():
+    body = ClosingBody([b'a,b\n'] * 500)
+    middleware = CompressionMiddleware(_app(body, [('Content-Type', 'text/csv')]), min_size=100)
+    result, headers = _call(middleware)
+    assert gzip.decompress(b''.join(result)) == b'a,b\n' * 500
+    result.close()
+    assert body.closed
+
+
+def test_small_body_is_sent_as_is():
+    body = ClosingBody([b'ok'])
+    middleware = CompressionMiddleware(_app(body, [('Content-Type', 'text/plain')]), min_size=100)
+    result, headers = _call(middleware)
+    assert b''.join(result) == b'ok'
+    assert 'Content-Encoding' not in headers
+    result.close()
+    assert body.closed
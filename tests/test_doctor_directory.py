@@ -0,0 +1,40 @@
+import pytest
+
+from backend.utils import datagen
+from backend.utils.doctor_directory import VERSION_ID
+from conftest import SEED
+
+
+def _version(db):
+    doc = db.cache_versions.find_one({'_id': VERSION_ID})
+    return doc.get('version', 0) if doc else 0
+
+
+def _update(kind, i, role):
+    return {'action': 'update', 'user_id': str(datagen.oid(SEED, kind, i)), 'username': f'{kind}{i}',
+            'email': f'{kind}{i}@example.com', 'role': role, 'salary': '1000'}
+
+
+@pytest.mark.parametrize('form, bumps', [
+    (_update('nurse', 0, 'nurse'), False),
+    (_update('nurse', 0, 'doctor'), True),
+    (_update('doctor', 1, 'doctor'), True),
+    (_update('doctor', 1, 'nurse'), True),
+    ({'action': 'delete', 'user_id': str(datagen.oid(SEED, 'nurse', 1))}, False),
+    ({'action': 'delete', 'user_id': str(datagen.oid(SEED, 'doctor', 1))}, True),
+    ({'action': 'create', 'username': 'newnurse', 'email': 'nn@example.com', 'role': 'nurse'}, False),
+    ({'action': 'create', 'username': 'newdoc', 'email': 'nd@example.com', 'role': 'doctor'}, True),
+], ids=['nurse', 'nurse-to-doctor', 'doctor', 'doctor-to-nurse', 'delete-nurse', 'delete-doctor',
+        'create-nurse', 'create-doctor'])
+def test_directory_bumped_only_for_doctors(budget_client, budget_db, login, hospital, form, bumps):
+    login(budget_client, 'admin', 'admin')
+    before = _version(budget_db)
+    assert budget_client.post('/admin/manage_users', data=form).status_code == 302
+    assert (_version(budget_db) > before) == bumps
+
+
+def test_admin_profile_does_not_bump_directory(budget_client, budget_db, login, hospital):
+    login(budget_client, 'admin', 'admin')
+    before = _version(budget_db)
+    budget_client.post('/admin/profile', data={'username': 'admin', 'email': 'admin@example.com'})
+    assert _version(budget_db) == before
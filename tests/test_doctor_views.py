@@ -0,0 +1,50 @@
+import datetime
+import pytest
+from bson.objectid import ObjectId
+from backend.utils import datagen
+from conftest import SEED
+
+ROWS = 300
+# page -> whether it lists patient names
+PAGES = {'/doctor/': False, '/doctor/appointments': True, '/doctor/patients': True,
+         '/doctor/view_prescriptions': True}
+
+
+def _commands(app, client, url):
+    app.user_cache.clear()
+    app.fragment_cache.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    return len(client.last_requests[-1]['commands']), response.get_data(as_text=True)
+
+
+def _add_rows(db, doctor_id, patient_id, count):
+    """Appointments and prescriptions of the patient, half of them referencing it by string id."""
+    now = datetime.datetime.utcnow()
+    refs = [patient_id if i % 2 else str(patient_id) for i in range(count)]
+    db.appointments.insert_many([{'doctor_id': doctor_id, 'patient_id': ref, 'status': 'accepted', 'problem': 'Fever',
+                                  'datetime': now + datetime.timedelta(days=500, minutes=30 * i)}
+                                 for i, ref in enumerate(refs)])
+    db.prescriptions.insert_many([{'doctor_id': doctor_id, 'patient_id': ref, 'diagnosis': 'Flu',
+                                   'medicines': 'Rest', 'created_at': now - datetime.timedelta(minutes=i)}
+                                  for i, ref in enumerate(refs)])
+
+
+@pytest.mark.parametrize('url', PAGES)
+def test_doctor_page_commands_do_not_grow_with_rows(budget_app, budget_client, budget_db, hospital, login, url):
+    doctor_id = datagen.oid(SEED, 'doctor', 0)
+    patient_id = ObjectId()
+    budget_db.users.insert_one({'_id': patient_id, 'username': 'zquinn', 'name': 'Zelda Quinn', 'role': 'patient',
+                                'email': 'zquinn@hospital.example'})
+    budget_db.patients.insert_one({'_id': patient_id, 'user_id': patient_id, 'name': 'Zelda Quinn'})
+    _add_rows(budget_db, doctor_id, patient_id, 2)
+    login(budget_client, 'doctor0', 'doctor')
+    before, _ = _commands(budget_app, budget_client, url)
+
+    _add_rows(budget_db, doctor_id, patient_id, ROWS)
+    after, html = _commands(budget_app, budget_client, url)
+
+    assert after == before
+    if PAGES[url]:
+        # string and ObjectId references both resolve to the patient
+        assert html.count('Zelda Quinn') >= ROWS
@@ -0,0 +1,80 @@
+import datetime
+import io
+
+from backend.utils.entries import EntryWriter, COLLECTION
+from backend.utils.query_budget import count_commands
+
+
+def _events(n):
+    now = datetime.datetime.utcnow()
+    return [{'timestamp': now, 'terminal': 'lobby', 'user': f'u{i}', 'action': 'in', 'received_at': now}
+            for i in range(n)]
+
+
+def test_flush_is_within_its_budget(budget_db):
+    writer = EntryWriter(lambda: budget_db, batch_size=1000)
+    ok, commands = count_commands(writer._write, budget_db, _events(1000))
+    assert ok
+    assert len(commands) <= EntryWriter._write.mongo_budget
+    assert budget_db[COLLECTION].count_documents({}) == 1000
+
+
+def test_ingest_is_accepted_and_written_by_the_writer(budget_app, budget_db):
+    budget_app.entry_tokens = {'secret': 'lobby'}
+    client = budget_app.test_client()
+    response = client.post('/entries/ingest', json=[{'user': 'u1', 'action': 'in'}, {'action': 'out'}],
+                           headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 202
+    assert response.get_json()['accepted'] == 1 and response.get_json()['rejected'] == 1
+    assert client.last_requests[0]['commands'] == []
+
+    budget_app.entry_writer.stop()
+    assert budget_db[COLLECTION].count_documents({'terminal': 'lobby'}) == 1
+
+
+def _ingest(app, body, token='secret', **kwargs):
+    app.entry_tokens = {'secret': 'lobby'}
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/x-ndjson'}
+    return app.test_client().post('/entries/ingest', data=body, headers=headers, **kwargs)
+
+
+def test_ingest_rejects_an_unknown_token(budget_app):
+    response = _ingest(budget_app, b'{"user": "u1", "action": "in"}\n', token='guess')
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_ingest_parses_ndjson(budget_app, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(budget_app.entry_writer, 'submit', lambda docs: submitted.extend(docs) or True)
+    body = (b'{"user": "u1", "action": "in", "timestamp": "2026-03-01T09:30:00Z"}\n\n'
+            b'{"user": "u2", "action": "out", "timestamp": 1772357400}\n'
+            b'{"action": "in"}\n')
+    response = _ingest(budget_app, body)
+    assert response.status_code == 202
+    assert [error['index'] for error in response.get_json()['errors']] == [2]
+    assert [(d['user'], d['action'], d['terminal']) for d in submitted] == [('u1', 'in', 'lobby'),
+                                                                             ('u2', 'out', 'lobby')]
+    assert submitted[0]['timestamp'] == datetime.datetime(2026, 3, 1, 9, 30)
+
+    response = _ingest(budget_app, b'{"user": "u1", "action": "in"}\nnot json\n')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'line 2 is not valid JSON'
+
+
+def test_ingest_asks_to_retry_when_the_buffer_is_full(budget_app, monkeypatch):
+    monkeypatch.setattr(budget_app.entry_writer, 'submit', lambda docs: False)
+    response = _ingest(budget_app, b'{"user": "u1", "action": "in"}\n')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(budget_app.config['ENTRY_RETRY_AFTER'])
+
+
+def test_ingest_limits_chunked_bodies(budget_app):
+    budget_app.config['ENTRY_MAX_BYTES'] = 1024
+    line = b'{"user": "u1", "action": "in"}\n'
+    # no Content-Length: the server hands over a terminated (de-chunked) stream
+    response = _ingest(budget_app, None, input_stream=io.BytesIO(line * 100),
+                       environ_overrides={'HTTP_TRANSFER_ENCODING': 'chunked', 'wsgi.input_terminated': True})
+    assert response.status_code == 413
+    response = _ingest(budget_app, line * 100)
+    assert response.status_code == 413
@@ -0,0 +1,101 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+from backend.utils import exports
+from backend.utils.exports import EXPORTS, stream_export
+from conftest import ACCOUNTS
+
+
+def _export(client, collection, **args):
+    response = client.get(f'/admin/export/{collection}', query_string=args)
+    assert response.status_code == 200
+    return response
+
+
+def _csv(data):
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+    return rows[0], rows[1:]
+
+
+def test_csv_columns_match_the_registry(budget_client, budget_db, hospital, login):
+    login(budget_client, ACCOUNTS['admin'], 'admin')
+    header, rows = _csv(_export(budget_client, 'appointments').data)
+    columns = EXPORTS['appointments']['columns']
+    assert header == ['id', *columns]
+    assert len(rows) == budget_db.appointments.count_documents({})
+    doc = budget_db.appointments.find_one({}, sort=[('_id', 1)])
+    assert rows[0][0] == str(doc['_id'])
+    assert rows[0][columns.index('status') + 1] == doc['status']
+    assert rows[0][columns.index('patient_id') + 1] == str(doc['patient_id'])
+
+
+def test_after_resumes_past_the_rows_already_sent(budget_client, budget_db, hospital, login):
+    login(budget_client, ACCOUNTS['admin'], 'admin')
+    _, rows = _csv(_export(budget_client, 'appointments').data)
+    ids = [row[0] for row in rows]
+    _, resumed = _csv(_export(budget_client, 'appointments', after=ids[9]).data)
+    assert [row[0] for row in resumed] == ids[10:]
+
+
+def test_date_and_status_filters_are_applied(budget_client, budget_db, hospital, login):
+    login(budget_client, ACCOUNTS['admin'], 'admin')
+    budget_db.appointments.delete_many({})
+    day = datetime.datetime(2026, 3, 1)
+    budget_db.appointments.insert_many([
+        {'status': status, 'datetime': day + datetime.timedelta(days=offset, hours=10)}
+        for offset in range(-2, 4) for status in ('accepted', 'pending', 'rejected')])
+    response = _export(budget_client, 'appointments', format='ndjson', status='accepted,pending',
+                       **{'from': '2026-03-01', 'to': '2026-03-03'})
+    rows = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+    assert sorted((row['datetime'], row['status']) for row in rows) == [
+        ('2026-03-01T10:00:00', 'accepted'), ('2026-03-01T10:00:00', 'pending'),
+        ('2026-03-02T10:00:00', 'accepted'), ('2026-03-02T10:00:00', 'pending')]
+
+
+def test_gzip_export_is_a_valid_gzip_stream(budget_client, hospital, login):
+    login(budget_client, ACCOUNTS['admin'], 'admin')
+    plain = _export(budget_client, 'appointments').data
+    response = _export(budget_client, 'appointments', gzip='1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'].endswith('.csv.gz"')
+    assert gzip.decompress(response.data) == plain
+
+
+class _Cursor:
+    """Records close() on a real cursor."""
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.closed = False
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def batch_size(self, size):
+        self.cursor = self.cursor.batch_size(size)
+        return self
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def close(self):
+        self.closed = True
+        self.cursor.close()
+
+
+def test_cursor_is_closed_when_the_client_disconnects(budget_db, hospital, monkeypatch):
+    monkeypatch.setattr(exports, 'CHUNK_BYTES', 64)
+    cursors = []
+
+    class _Collection:
+        def find(self, *args):
+            cursors.append(_Cursor(budget_db.appointments.find(*args)))
+            return cursors[-1]
+
+    chunks = stream_export({'appointments': _Collection()}, 'appointments')
+    assert next(chunks).startswith(b'id,')
+    assert not cursors[0].closed
+    chunks.close()  # what the WSGI server does when the client goes away
+    assert cursors[0].closed
@@ -0,0 +1,26 @@
+import threading
+from flask import get_flashed_messages
+
+from backend.utils.fanout import fan_out, DEGRADED_MESSAGE
+
+
+def test_pool_fits_every_request_thread_fanning_out(budget_app):
+    config = budget_app.config
+    assert config['QUERY_FANOUT_WORKERS'] >= 4 * config['QUERY_FANOUT_WIDTH']
+    assert budget_app.query_pool._max_workers == config['QUERY_FANOUT_WORKERS']
+
+
+def test_missed_deadline_warns_instead_of_rendering_empty(budget_app):
+    release = threading.Event()
+    with budget_app.test_request_context('/'):
+        data = fan_out({'slow': lambda: release.wait(5) and ['late'], 'fast': lambda: ['ok']},
+                       timeout=0.05, default=[])
+        release.set()
+        assert data == {'slow': [], 'fast': ['ok']}
+        assert get_flashed_messages(with_categories=True) == [('warning', DEGRADED_MESSAGE)]
+
+
+def test_complete_page_has_no_warning(budget_app):
+    with budget_app.test_request_context('/'):
+        assert fan_out({'a': lambda: 1, 'b': lambda: 2}) == {'a': 1, 'b': 2}
+        assert get_flashed_messages() == []
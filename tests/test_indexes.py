@@ -0,0 +1,37 @@
+from pymongo import ASCENDING
+from backend.blueprints import auth, receptionist
+from backend.models.indexes import INDEXES, ensure_indexes
+
+
+def test_ensure_indexes_builds_the_registry_and_keeps_other_indexes(budget_db):
+    budget_db.appointments.create_index([('patient_id', ASCENDING)], name='patient_id')
+    assert ensure_indexes(budget_db) == []
+    assert ensure_indexes(budget_db) == []
+    names = set(budget_db.appointments.index_information())
+    assert {model.document['name'] for model in INDEXES['appointments']} <= names
+    assert 'patient_id' in names
+
+
+def test_register_race_on_username_flashes(budget_app, budget_client, budget_db, monkeypatch):
+    ensure_indexes(budget_db)
+    real_hash = auth.hash_password
+
+    def hash_while_someone_registers(password):
+        # the same username is taken between register's lookup and its insert
+        budget_db.users.insert_one({'username': 'alex', 'role': 'patient'})
+        return real_hash(password)
+
+    monkeypatch.setattr(auth, 'hash_password', hash_while_someone_registers)
+    response = budget_client.post('/register', data={'username': 'alex', 'email': 'alex@example.com',
+                                                     'password': 'pw', 'role': 'patient'})
+    assert response.status_code == 200
+    assert 'Username already exists' in response.get_data(as_text=True)
+    assert budget_db.users.count_documents({'username': 'alex'}) == 1
+
+
+def test_receptionist_columns_lead_an_index():
+    def leading(collection):
+        return {next(iter(model.document['key'])) for model in INDEXES[collection]} | {'_id'}
+    fields = set(receptionist.SCHEDULE_SORT_FIELDS) | set(receptionist.SCHEDULE_FILTER_FIELDS)
+    assert fields <= leading('schedules')
+    assert set(receptionist.CALL_LOG_SORT_FIELDS) <= leading('calllogs')
@@ -0,0 +1,18 @@
+def test_metrics_served_to_loopback(budget_app):
+    response = budget_app.test_client().get('/metrics')
+    assert response.status_code == 200
+
+
+def test_metrics_refused_to_other_networks(budget_app):
+    response = budget_app.test_client().get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'})
+    assert response.status_code == 403
+
+
+def test_metrics_served_with_the_scrape_token(budget_app):
+    budget_app.config['METRICS_TOKEN'] = 'scrape-secret'
+    client = budget_app.test_client()
+    remote = {'REMOTE_ADDR': '203.0.113.9'}
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 403
@@ -0,0 +1,97 @@
+import pytest
+from backend.utils import datagen
+from backend.utils.query_budget import budget_for
+from conftest import ACCOUNTS, SEED
+
+# (role, endpoint, url) for every budgeted route that answers GET
+ROUTES = [
+    ('admin', 'admin.dashboard', '/admin/'),
+    ('admin', 'admin.entries', '/admin/entries'),
+    ('admin', 'admin.export', '/admin/export/billing?format=ndjson'),
+    ('admin', 'admin.exports', '/admin/exports'),
+    ('admin', 'admin.manage_users', '/admin/manage_users'),
+    ('admin', 'admin.profile', '/admin/profile'),
+    ('admin', 'admin.rules', '/admin/rules'),
+    ('admin', 'admin.slow_queries', '/admin/slow_queries'),
+    ('admin', 'search.users', '/search/users?q=pat'),
+    ('doctor', 'search.records', '/search/records?scope=prescriptions&q=fever'),
+    ('doctor', 'doctor.dashboard', '/doctor/'),
+    ('doctor', 'doctor.doctor_appointments', '/doctor/appointments'),
+    ('doctor', 'doctor.patients', '/doctor/patients'),
+    ('doctor', 'doctor.profile', '/doctor/profile'),
+    ('doctor', 'doctor.salary', '/doctor/salary'),
+    ('doctor', 'doctor.view_prescriptions', '/doctor/view_prescriptions'),
+    ('doctor', 'doctor.add_prescription', '/doctor/add_prescription/{patient_id}'),
+    ('nurse', 'nurse.dashboard', '/nurse/'),
+    ('nurse', 'nurse.leave', '/nurse/leave'),
+    ('nurse', 'nurse.profile', '/nurse/profile'),
+    ('nurse', 'nurse.salary', '/nurse/salary'),
+    ('nurse', 'nurse.schedule', '/nurse/schedule'),
+    ('patient', 'patient.dashboard', '/patient/'),
+    ('patient', 'patient.availability', '/patient/availability'),
+    ('patient', 'patient.billing', '/patient/billing'),
+    ('patient', 'patient.book_appointment', '/patient/book'),
+    ('patient', 'patient.prescriptions', '/patient/prescriptions'),
+    ('patient', 'patient.profile', '/patient/profile'),
+    ('patient', 'patient.reports', '/patient/reports'),
+    ('patient', 'patient.timeline', '/patient/timeline'),
+    ('patient', 'reports.download', '/reports/{report_id}/file'),
+    ('receptionist', 'receptionist.call_logs_page', '/receptionist/call_logs'),
+    ('receptionist', 'receptionist.dashboard', '/receptionist/dashboard'),
+    ('receptionist', 'receptionist.profile', '/receptionist/profile'),
+    ('receptionist', 'receptionist.salary_page', '/receptionist/salary'),
+    ('receptionist', 'receptionist.schedule_page', '/receptionist/schedule'),
+    ('anonymous', 'auth.login', '/login'),
+    ('anonymous', 'auth.register', '/register'),
+]
+
+# $text search is not implemented by mongomock
+REAL_MONGO_ONLY = {'search.records'}
+
+
+def test_every_budgeted_get_route_is_covered(budget_app):
+    budgeted = {rule.endpoint for rule in budget_app.url_map.iter_rules()
+                if 'GET' in rule.methods and budget_for(budget_app, rule.endpoint) is not None}
+    assert budgeted == {endpoint for _, endpoint, _ in ROUTES}
+
+
+@pytest.mark.parametrize('role, endpoint, url', ROUTES, ids=[endpoint for _, endpoint, _ in ROUTES])
+def test_route_within_budget(request, budget_app, budget_client, login, hospital, report_id, role, endpoint, url):
+    if endpoint in REAL_MONGO_ONLY and not request.config.getoption('mongo_uri'):
+        pytest.skip('needs a real mongod (--mongo-uri)')
+    if role != 'anonymous':
+        login(budget_client, ACCOUNTS[role], role)
+    # a cold worker: the user_loader read counts against the budget
+    budget_app.user_cache.clear()
+    budget_app.fragment_cache.clear()
+    url = url.format(patient_id=datagen.oid(SEED, 'patient', 0), report_id=report_id)
+    # buffered, so commands issued while a streamed body is generated are counted too
+    response = budget_client.get(url, buffered=True)
+    assert response.status_code == 200, response.get_data(as_text=True)[:500]
+    assert budget_client.last_requests[-1]['endpoint'] == endpoint
+
+
+# (role, endpoint, url, form) for the budgeted writes that change users
+POST_ROUTES = [
+    ('patient', 'patient.profile', '/patient/profile',
+     {'name': 'Pat Doe', 'email': 'pat@example.com', 'phone': '555 0100', 'address': '1 Main St'}),
+    ('doctor', 'doctor.profile', '/doctor/profile', {'first_name': 'Ada', 'last_name': 'Byrne', 'specialty': 'Cardiology'}),
+    ('nurse', 'nurse.profile', '/nurse/profile',
+     {'name': 'Nia Park', 'email': 'nia@example.com', 'phone': '555 0101', 'address': '2 Main St'}),
+    ('admin', 'admin.profile', '/admin/profile', {'username': 'admin', 'email': 'admin@example.com'}),
+    ('admin', 'admin.manage_users', '/admin/manage_users',
+     {'action': 'update', 'user_id': str(datagen.oid(SEED, 'doctor', 1)), 'username': 'doctor1',
+      'email': 'd1@example.com', 'role': 'nurse', 'salary': '1000'}),
+    ('admin', 'admin.manage_users', '/admin/manage_users',
+     {'action': 'delete', 'user_id': str(datagen.oid(SEED, 'nurse', 1))}),
+]
+
+
+@pytest.mark.parametrize('role, endpoint, url, form', POST_ROUTES,
+                         ids=[f"{endpoint}-{form.get('action', 'update')}" for _, endpoint, _, form in POST_ROUTES])
+def test_user_write_within_budget(budget_app, budget_client, login, hospital, role, endpoint, url, form):
+    login(budget_client, ACCOUNTS[role], role)
+    budget_app.user_cache.clear()
+    response = budget_client.post(url, data=form)
+    assert response.status_code in (200, 302)
+    assert budget_client.last_requests[0]['endpoint'] == endpoint
@@ -0,0 +1,36 @@
+import pytest
+from bson import ObjectId
+
+from backend.utils.pagination import paginate
+
+# some users (like those of seed_users.py) have no email at all, one has a null one
+USERS = ([{'username': f'noemail{i}'} for i in range(3)] + [{'username': 'nullemail', 'email': None}]
+         + [{'username': f'user{i}', 'email': f'u{i}@example.com'} for i in range(4)])
+
+
+def _page(app, collection, order, **cursor):
+    query = f'/admin/?sort=email&order={order}&per_page=2'
+    query += ''.join(f'&{name}={token}' for name, token in cursor.items())
+    with app.test_request_context(query):
+        return paginate(collection, sort_fields=('email', '_id'))
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_sort_by_a_field_some_rows_lack(budget_app, budget_db, order):
+    collection = budget_db.pagination_users
+    collection.insert_many([dict(user, _id=ObjectId()) for user in USERS])
+    direction = 1 if order == 'asc' else -1
+    expected = [doc['_id'] for doc in collection.find().sort([('email', direction), ('_id', direction)])]
+
+    page = _page(budget_app, collection, order)
+    forward = [doc['_id'] for doc in page.items]
+    while page.next_cursor:
+        page = _page(budget_app, collection, order, after=page.next_cursor)
+        forward += [doc['_id'] for doc in page.items]
+    assert forward == expected
+
+    backward = [doc['_id'] for doc in page.items]
+    while page.prev_cursor:
+        page = _page(budget_app, collection, order, before=page.prev_cursor)
+        backward = [doc['_id'] for doc in page.items] + backward
+    assert backward == expected
@@ -0,0 +1,48 @@
+import pytest
+
+from backend.blueprints import auth
+from backend.utils import passwords
+from backend.utils.passwords import PasswordPoolTimeout
+
+
+def _timeout(*args, **kwargs):
+    raise PasswordPoolTimeout()
+
+
+def test_login_timeout_is_503_not_invalid_credentials(budget_app, budget_client, hospital, monkeypatch):
+    monkeypatch.setattr(auth, 'verify_password', _timeout)
+    response = budget_client.post('/login', data={'username': 'patient0', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(budget_app.config['PASSWORD_RETRY_AFTER'])
+    assert b'Invalid username or password' not in response.data
+
+
+def test_register_timeout_is_503(budget_app, budget_client, monkeypatch):
+    monkeypatch.setattr(auth, 'hash_password', _timeout)
+    response = budget_client.post('/register', data={'username': 'newcomer', 'email': 'n@example.com',
+                                                     'password': 'password123'})
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert budget_app.mongo.raw_db.users.find_one({'username': 'newcomer'}) is None
+
+
+@pytest.fixture
+def small_pool():
+    passwords.configure(workers=1, queue=2)
+    yield
+    passwords.shutdown()
+    passwords.configure(workers=0, queue=32)
+
+
+def test_hash_many_takes_queue_slots(small_pool, monkeypatch):
+    held = []
+    submit = passwords._submit
+
+    def tracking(slots, fn, *args):
+        held.append(2 - slots._value)
+        return submit(slots, fn, *args)
+    monkeypatch.setattr(passwords, '_submit', tracking)
+
+    hashes = passwords.hash_many(['a', 'b', 'c'], rounds=4)
+    assert [passwords.verify_password(p, h) for p, h in zip('abc', hashes)] == [True] * 3
+    assert held and all(1 <= n <= 2 for n in held)
@@ -0,0 +1,167 @@
+import io
+import os
+
+import gridfs
+import mongomock.gridfs
+import pytest
+from bson import ObjectId
+
+from backend.utils.report_storage import DiskStorage, GridFSStorage, new_report
+from conftest import ACCOUNTS
+
+mongomock.gridfs.enable_gridfs_integration()
+
+PDF = b'%PDF-1.4 blood test results'
+
+
+def _bucket(db):
+    fs = gridfs.GridFSBucket(db, bucket_name=GridFSStorage.bucket, chunk_size_bytes=255 * 1024)
+    fs._timeout = None  # mongomock clients have no options.timeout for pymongo's CSOT wrapper
+    return fs
+
+
+@pytest.fixture(params=['disk', 'gridfs'])
+def storage(request, budget_app, tmp_path):
+    """Each backend in turn as the upload target; GridFS runs on the stand-in's raw database."""
+    if request.param == 'disk':
+        storage = DiskStorage(str(tmp_path))
+    else:
+        raw = budget_app.mongo.raw_db
+        raw['report_files.files'].create_index([('metadata.sha256', 1)], name='sha256_unique', unique=True,
+                                               partialFilterExpression={'metadata.sha256': {'$exists': True}})
+        storage = GridFSStorage(lambda: raw)
+        storage._fs = lambda: _bucket(raw)
+    budget_app.report_storages[storage.name] = storage
+    budget_app.report_storage = storage
+    return storage
+
+
+def _user(db, role):
+    return db.users.find_one({'username': ACCOUNTS[role]})
+
+
+def _report(db, storage, data=PDF, content_type='application/pdf', filename='result.pdf'):
+    digest, size, _ = storage.save(io.BytesIO(data))
+    patient = _user(db, 'patient')
+    doc = new_report(patient['_id'], digest, size, storage.name, filename, content_type, 'Lab', '', patient['_id'])
+    return db.reports.insert_one(doc).inserted_id, digest
+
+
+def _upload(client, data, content_type='application/pdf', filename='result.pdf'):
+    return client.post(f'/reports/upload?filename={filename}&type=Lab', data=data, content_type=content_type)
+
+
+def _stored_files(budget_app, storage):
+    if storage.name == 'gridfs':
+        return budget_app.mongo.raw_db['report_files.files'].count_documents({})
+    return sum(len(files) for root, _, files in os.walk(storage.root) if os.path.basename(root) != 'tmp')
+
+
+# ---- content-hash deduplication ----
+def test_identical_uploads_are_stored_once(budget_app, budget_client, login, hospital, storage):
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    first = _upload(budget_client, PDF).get_json()
+    second = _upload(budget_client, PDF, filename='again.pdf').get_json()
+    assert (first['deduplicated'], second['deduplicated']) == (False, True)
+    assert first['file_ref'] == second['file_ref']
+    assert first['id'] != second['id']
+    assert _stored_files(budget_app, storage) == 1
+
+
+class _RacingDatabase:
+    """Database whose files lookup misses a copy stored concurrently, as in a race between uploads."""
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        collection = self._db[name]
+
+        class Missing:
+            def find_one(self, *args, **kwargs):
+                return None
+
+            def __getattr__(self, attr):
+                return getattr(collection, attr)
+        return Missing()
+
+
+def test_gridfs_concurrent_identical_upload_is_deduplicated(budget_app, storage):
+    if storage.name != 'gridfs':
+        pytest.skip('GridFS only')
+    raw = budget_app.mongo.raw_db
+    digest, _, deduplicated = storage.save(io.BytesIO(PDF))
+    assert not deduplicated
+
+    racing = GridFSStorage(lambda: _RacingDatabase(raw))
+    racing._fs = lambda: _bucket(raw)
+    assert racing.save(io.BytesIO(PDF)) == (digest, len(PDF), True)
+    # the losing upload's file was deleted, not left behind as 'pending'
+    assert raw['report_files.files'].count_documents({}) == 1
+
+
+# ---- size limit ----
+def test_oversized_upload_is_refused(budget_app, budget_client, budget_db, login, hospital, storage):
+    budget_app.config['REPORT_MAX_BYTES'] = 10
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    response = _upload(budget_client, PDF)
+    assert response.status_code == 413
+    assert budget_db.reports.count_documents({}) == 0
+    assert _stored_files(budget_app, storage) == 0
+
+
+# ---- Range and conditional requests ----
+def test_range_and_conditional_downloads(budget_client, budget_db, login, hospital, storage):
+    report_id, digest = _report(budget_db, storage)
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    url = f'/reports/{report_id}/file'
+
+    partial = budget_client.get(url, headers={'Range': 'bytes=5-8'})
+    assert partial.status_code == 206
+    assert partial.data == PDF[5:9]
+    assert partial.headers['Content-Range'] == f'bytes 5-8/{len(PDF)}'
+
+    assert budget_client.get(url, headers={'If-None-Match': f'"{digest}"'}).status_code == 304
+
+
+# ---- content types ----
+def test_uploaded_html_is_never_rendered(budget_client, budget_db, login, hospital, storage):
+    report_id, _ = _report(budget_db, storage, b'<script>alert(document.cookie)</script>', 'text/html', 'x.html')
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    response = budget_client.get(f'/reports/{report_id}/file')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/octet-stream'
+    assert response.headers['Content-Disposition'].startswith('attachment')
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.headers['Content-Security-Policy'] == 'sandbox'
+
+
+def test_pdf_opens_inline(budget_client, budget_db, login, hospital, storage):
+    report_id, _ = _report(budget_db, storage)
+    login(budget_client, ACCOUNTS['patient'], 'patient')
+    response = budget_client.get(f'/reports/{report_id}/file')
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'].startswith('inline')
+    assert response.headers['Content-Security-Policy'] == 'sandbox'
+
+
+# ---- who may read ----
+@pytest.mark.parametrize('username, role, status', [
+    ('patient0', 'patient', 200),
+    ('patient1', 'patient', 403),
+    ('admin', 'admin', 200),
+    ('doctor0', 'doctor', 200),
+    ('doctor1', 'doctor', 403),
+])
+def test_access_to_a_patients_reports(budget_app, budget_db, login, hospital, tmp_path, username, role, status):
+    storage = DiskStorage(str(tmp_path))
+    budget_app.report_storages['disk'] = storage
+    report_id, _ = _report(budget_db, storage)
+    patient, doctor0, doctor1 = (_user(budget_db, 'patient'), budget_db.users.find_one({'username': 'doctor0'}),
+                                 budget_db.users.find_one({'username': 'doctor1'}))
+    # doctor0 has seen patient0, doctor1 never has
+    budget_db.appointments.delete_many({'patient_id': patient['_id'], 'doctor_id': doctor1['_id']})
+    budget_db.appointments.insert_one({'_id': ObjectId(), 'patient_id': patient['_id'], 'doctor_id': doctor0['_id'],
+                                       'status': 'accepted'})
+    client = budget_app.test_client()
+    login(client, username, role)
+    assert client.get(f'/reports/{report_id}/file').status_code == status
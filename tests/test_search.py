@@ -0,0 +1,58 @@
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from backend.utils.search import set_user_fields, search_users, user_search_keys
+
+
+def test_keys_follow_a_write_the_known_document_missed(budget_db):
+    user_id = ObjectId()
+    budget_db.users.insert_one({'_id': user_id, 'username': 'jdoe', 'email': 'j@example.com'})
+    cached = budget_db.users.find_one({'_id': user_id})
+    # renamed by someone else after the user was cached
+    budget_db.users.update_one({'_id': user_id}, {'$set': {'username': 'jsmith'}})
+
+    set_user_fields(budget_db, user_id, {'phone': '555-0100 22'}, known=cached)
+    user = budget_db.users.find_one({'_id': user_id})
+    assert user['search_keys'] == user_search_keys(user)
+    assert 'jsmith' in user['search_keys'] and 'jdoe' not in user['search_keys']
+
+
+def test_keys_keep_the_fields_not_written(budget_db):
+    user_id = ObjectId()
+    budget_db.users.insert_one({'_id': user_id, 'username': 'ana', 'profile': {'first_name': 'Ana', 'last_name': 'Ruiz'}})
+    known = budget_db.users.find_one({'_id': user_id})
+    assert set_user_fields(budget_db, user_id, {'email': 'ana@example.com'}, known=known) is known
+    keys = budget_db.users.find_one({'_id': user_id})['search_keys']
+    assert {'ana', 'ruiz', 'ana ruiz', 'ana@example.com'} <= set(keys)
+
+
+class _NoIndexUsers:
+    """users collection of a database where the hinted index does not exist."""
+    def __init__(self, users):
+        self._users = users
+
+    def find(self, *args, **kwargs):
+        cursor = self._users.find(*args, **kwargs)
+
+        class Cursor:
+            def hint(self, index):
+                raise OperationFailure(f'hint provided does not correspond to an existing index: {index}')
+
+            def __getattr__(self, name):
+                return getattr(cursor, name)
+
+            def __iter__(self):
+                return iter(cursor)
+        return Cursor()
+
+
+def test_search_without_its_index_still_answers(budget_db, budget_app):
+    for name in ('maria', 'mario', 'marta'):
+        budget_db.users.insert_one({'username': name, 'search_keys': user_search_keys({'username': name})})
+
+    class Db:
+        users = _NoIndexUsers(budget_db.users)
+    with budget_app.app_context():
+        users, next_cursor = search_users(Db, 'mar', limit=2)
+    assert [u['username'] for u in users] == ['maria', 'mario']
+    assert next_cursor is not None
@@ -0,0 +1,53 @@
+import datetime
+from types import SimpleNamespace
+from backend.utils.slow_queries import COLLECTION, SlowQueryRecorder
+
+
+def _recorder(monkeypatch, **kwargs):
+    recorder = SlowQueryRecorder(lambda: None, threshold_ms=100, **kwargs)
+    monkeypatch.setattr(recorder, '_ensure_writer', lambda: None)  # inspect the queue instead
+    return recorder
+
+
+def _run(recorder, name, command, duration_ms, request_id=1):
+    event = SimpleNamespace(command_name=name, command=command, database_name='hospital', connection_id=('h', 1),
+                            request_id=request_id, duration_micros=int(duration_ms * 1000))
+    recorder.started(event)
+    entry = recorder._inflight[(event.connection_id, event.request_id)]
+    recorder.succeeded(event)
+    return entry
+
+
+def test_in_flight_commands_keep_only_what_shapes_need(monkeypatch):
+    recorder = _recorder(monkeypatch)
+    documents = [{'blob': 'x' * 1000} for _ in range(100)]
+    command, *_ = _run(recorder, 'insert', {'insert': 'entries', 'documents': documents, 'ordered': False}, 1)
+    assert command == {'insert': 'entries'}
+
+    updates = [{'q': {'_id': i}, 'u': {'$set': {'blob': 'x' * 1000}}} for i in range(100)]
+    command, *_ = _run(recorder, 'update', {'update': 'users', 'updates': updates, 'lsid': {}}, 1)
+    assert command == {'update': 'users', 'updates': [{'q': {'_id': 0}}]}
+    assert recorder._inflight == {} and recorder._queue.empty()
+
+
+def test_slow_commands_are_queued_as_copies(monkeypatch):
+    recorder = _recorder(monkeypatch)
+    query = {'doctor_id': 1, 'status': {'$in': ['pending']}}
+    _run(recorder, 'find', {'find': 'appointments', 'filter': query, 'sort': {'datetime': 1}, '$db': 'hospital'}, 250)
+    query['status']['$in'].append('accepted')  # the caller reuses its filter
+    started, name, command, database, endpoint, duration_ms = recorder._queue.get_nowait()
+    assert (name, database, endpoint, duration_ms) == ('find', 'hospital', 'background', 250)
+    assert isinstance(started, datetime.datetime)
+    assert command == {'find': 'appointments', 'filter': {'doctor_id': 1, 'status': {'$in': ['pending']}},
+                       'sort': {'datetime': 1}}
+
+
+def test_writing_pipelines_are_never_explained(budget_db, monkeypatch):
+    recorder = _recorder(monkeypatch, explain_sample=1)
+    now = datetime.datetime.utcnow()
+    for i, stage in enumerate(({'$merge': {'into': 'revenue_monthly'}}, {'$out': 'copy'}, {'$limit': 1})):
+        command = {'aggregate': 'billing', 'pipeline': [{'$match': {'status': 'paid'}}, stage], 'cursor': {}}
+        recorder._record(budget_db, now, 'aggregate', command, budget_db.name, 'admin.dashboard', 500 + i)
+    explains = [doc['explain'] for doc in budget_db[COLLECTION].find().sort('duration_ms', 1)]
+    assert explains[:2] == [None, None]
+    assert explains[2] is not None  # attempted (mongomock has no explain command)
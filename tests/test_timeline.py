@@ -0,0 +1,110 @@
+import datetime
+import pytest
+from bson.objectid import ObjectId
+from backend.utils.pagination import encode_cursor
+from backend.utils.timeline import SOURCES, patient_timeline
+
+PATIENT = ObjectId()
+NOON = datetime.datetime(2026, 3, 1, 12)
+
+
+class _Reads:
+    """Database proxy counting the documents each collection's cursors hand out."""
+    def __init__(self, db):
+        self.db = db
+        self.docs = {}
+
+    def __getitem__(self, name):
+        return _Collection(self, name)
+
+
+class _Collection:
+    def __init__(self, reads, name):
+        self.reads, self.name = reads, name
+
+    def find(self, *args, **kwargs):
+        return _Cursor(self.reads, self.name, self.reads.db[self.name].find(*args, **kwargs))
+
+
+class _Cursor:
+    def __init__(self, reads, name, cursor):
+        self.reads, self.name, self.cursor = reads, name, cursor
+
+    def sort(self, *args):
+        self.cursor = self.cursor.sort(*args)
+        return self
+
+    def limit(self, n):
+        self.cursor = self.cursor.limit(n)
+        return self
+
+    def batch_size(self, n):
+        self.cursor = self.cursor.batch_size(n)
+        return self
+
+    def __iter__(self):
+        for doc in self.cursor:
+            self.reads.docs[self.name] = self.reads.docs.get(self.name, 0) + 1
+            yield doc
+
+    def close(self):
+        self.cursor.close()
+
+
+def _seed(db, per_source, times):
+    """`per_source` events in every source collection of PATIENT, the i-th one at times(i)."""
+    for _, collection, time_field, _ in SOURCES:
+        db[collection].insert_many([{'patient_id': PATIENT, time_field: times(i)} for i in range(per_source)])
+
+
+def _walk(db, limit):
+    pages, token = [], None
+    while True:
+        events, token = patient_timeline(db, PATIENT, token, limit=limit)
+        pages.append(events)
+        if token is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 5, 7])
+def test_same_time_events_are_paged_exactly_once(budget_db, limit):
+    # every event of every source at the same instant, so most page boundaries split a tie
+    _seed(budget_db, 4, lambda i: NOON)
+    pages = _walk(budget_db, limit)
+    seen = [event['doc']['_id'] for page in pages for event in page]
+    assert len(seen) == len(set(seen)) == 4 * len(SOURCES)
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_interleaved_ties_keep_newest_first_order(budget_db):
+    _seed(budget_db, 6, lambda i: NOON - datetime.timedelta(hours=i // 2))
+    events = [event for page in _walk(budget_db, 4) for event in page]
+    assert len(events) == 6 * len(SOURCES)
+    assert [e['time'] for e in events] == sorted((e['time'] for e in events), reverse=True)
+
+
+@pytest.mark.parametrize('token', [
+    'not a token',
+    encode_cursor([NOON, 0]),
+    encode_cursor(['x', 'y', 'z']),
+    encode_cursor([NOON, 'appointment', str(ObjectId())]),
+    encode_cursor([NOON, len(SOURCES), ObjectId()]),
+])
+def test_malformed_token_restarts_at_the_first_page(budget_db, token):
+    _seed(budget_db, 3, lambda i: NOON - datetime.timedelta(days=i))
+    first, _ = patient_timeline(budget_db, PATIENT, None, limit=5)
+    events, _ = patient_timeline(budget_db, PATIENT, token, limit=5)
+    assert [e['doc']['_id'] for e in events] == [e['doc']['_id'] for e in first]
+
+
+@pytest.mark.parametrize('limit', [1, 5, 20])
+def test_each_source_reads_at_most_limit_plus_one(budget_db, limit):
+    _seed(budget_db, 50, lambda i: NOON - datetime.timedelta(minutes=i))
+    reads = _Reads(budget_db)
+    token = None
+    for _ in range(3):
+        reads.docs.clear()
+        events, token = patient_timeline(reads, PATIENT, token, limit=limit)
+        assert len(events) == limit
+        assert set(reads.docs) == {collection for _, collection, _, _ in SOURCES}
+        assert all(count <= limit + 1 for count in reads.docs.values())
@@ -0,0 +1,27 @@
+from backend.utils.user_cache import UserCache, RECENT_IDS, bump_user_version
+
+
+def _seen(cache, db):
+    cache.apply_versions(db.cache_versions.find_one({'_id': 'users'}))
+
+
+def test_watcher_evicts_users_written_by_other_workers(budget_db):
+    cache = UserCache()
+    _seen(cache, budget_db)
+    cache.put('a', 'user a')
+    cache.put('b', 'user b')
+
+    bump_user_version(budget_db, 'a')  # e.g. an admin demoting `a` in another worker
+    _seen(cache, budget_db)
+    assert cache.get('a') is None
+    assert cache.get('b') == 'user b'
+
+
+def test_watcher_clears_when_too_far_behind(budget_db):
+    cache = UserCache()
+    _seen(cache, budget_db)
+    cache.put('b', 'user b')
+    for i in range(RECENT_IDS + 1):
+        bump_user_version(budget_db, f'other{i}')
+    _seen(cache, budget_db)
+    assert cache.get('b') is None